@@ -1,6 +1,7 @@
-from marshmallow import fields as f, Schema
+from marshmallow import fields as f
+from TEMPLATE.api.serialization import CompiledSchema
 
 
-class UserSchema(Schema):
+class UserSchema(CompiledSchema):
     extid = f.Str(dump_only=True)
     name = f.Str()
@@ -0,0 +1,253 @@
+"""Response caching for API views.
+
+Cache successful GET responses and answer conditional requests with 304 Not Modified:
+
+    @blp.route("")
+    class Things(MethodView):
+        @cache_response(ttl=60)
+        @blp.response(ThingSchema(many=True))
+        def get(self):
+            ...
+
+Responses are cached per user (by JWT identity) unless `public=True` is passed.
+Public responses are served from the cache without running the view's decorators, so only use it
+for views anyone may see: it raises for views wrapped by a flask_jwt_extended decorator,
+but can't tell if a view checks the JWT itself.
+The backend is set with `RESPONSE_CACHE_CLASS`; see `MemoryBackend` and `RedisBackend`.
+"""
+import base64
+import hashlib
+import json
+import re
+from abc import ABC, abstractmethod
+from functools import wraps
+from typing import Optional
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import (
+    fresh_jwt_required,
+    get_jwt_identity,
+    jwt_optional,
+    jwt_refresh_token_required,
+    jwt_required,
+    verify_jwt_in_request_optional,
+)
+from werkzeug.utils import import_string
+
+from TEMPLATE.cache import LRUCache
+from TEMPLATE.metrics import register_metrics
+
+# don't replay these from cache
+UNCACHED_HEADERS = {"content-length", "date", "set-cookie", "etag", "cache-control"}
+
+# the wrapper functions of flask_jwt_extended's view decorators
+JWT_WRAPPERS = {
+    decorator(lambda: None).__code__
+    for decorator in (
+        jwt_required,
+        jwt_optional,
+        fresh_jwt_required,
+        jwt_refresh_token_required,
+    )
+}
+
+
+class CacheBackend(ABC):
+    """Base class for response cache storage.
+
+    Entries are dicts of the response `body` (bytes), `etag` and `headers`.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """Get a cached response entry."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key: str, entry: dict, ttl: int) -> None:
+        """Cache a response entry for ttl seconds."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove all entries with keys starting with prefix."""
+        raise NotImplementedError()
+
+    def stats(self) -> dict:
+        """Get hit/miss statistics."""
+        return dict(hits=self.hits, misses=self.misses)
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.cache = LRUCache(maxsize=config["RESPONSE_CACHE_SIZE"])
+
+    def get(self, key):
+        """Get a cached response entry."""
+        return self.cache.get(key)
+
+    def set(self, key, entry, ttl):
+        """Cache a response entry for ttl seconds."""
+        self.cache.set(key, entry, ttl=ttl)
+
+    def delete_prefix(self, prefix):
+        """Remove all entries with keys starting with prefix."""
+        self.cache.delete_where(lambda key: key.startswith(prefix))
+
+    def stats(self):
+        """Get hit/miss statistics."""
+        return self.cache.stats()
+
+
+class RedisBackend(CacheBackend):
+    """Cache shared between processes in Redis (or anything with the same interface).
+
+    Connects to `RESPONSE_CACHE_REDIS_URL` using the `redis` package unless a client is given.
+    """
+
+    def __init__(self, config, client=None):
+        super().__init__(config)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(config["RESPONSE_CACHE_REDIS_URL"])
+        self.client = client
+
+    def get(self, key):
+        """Get a cached response entry."""
+        value = self.client.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = json.loads(value)
+        entry["body"] = base64.b64decode(entry["body"])
+        return entry
+
+    def set(self, key, entry, ttl):
+        """Cache a response entry for ttl seconds."""
+        body = base64.b64encode(entry["body"]).decode()
+        self.client.set(key, json.dumps(dict(entry, body=body)), ex=ttl)
+
+    def delete_prefix(self, prefix):
+        """Remove all entries with keys starting with prefix."""
+        # escape glob characters, e.g. the "?" of paths
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        for key in self.client.scan_iter(match=pattern):
+            self.client.delete(key)
+
+
+def init_response_cache(app) -> None:
+    backend_class = import_string(app.config["RESPONSE_CACHE_CLASS"])
+    backend = backend_class(app.config)
+    app.extensions["response_cache"] = backend
+    register_metrics(app, "response_cache", backend.stats)
+
+
+def get_backend() -> CacheBackend:
+    return current_app.extensions["response_cache"]
+
+
+def response_etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def cache_key(path: str, public: bool) -> str:
+    if public:
+        scope = "public"
+    else:
+        verify_jwt_in_request_optional()
+        scope = f"user:{get_jwt_identity()}"
+    return f"response:{path}:{scope}"
+
+
+def checks_jwt(view) -> bool:
+    """Check if a view is wrapped by one of flask_jwt_extended's decorators."""
+    while view is not None:
+        if getattr(view, "__code__", None) in JWT_WRAPPERS:
+            return True
+        view = getattr(view, "__wrapped__", None)
+    return False
+
+
+def invalidate_responses(path_prefix: str) -> None:
+    """Drop cached responses for all URLs under path_prefix, for all users.
+
+    Matches whole path segments: "/api/user" covers "/api/user?page=2" and "/api/user/1",
+    but not "/api/users".
+    """
+    prefix = f"response:{path_prefix}"
+    if path_prefix.endswith("/"):
+        get_backend().delete_prefix(prefix)
+        return
+    # keys are "response:<path>?<query>:<scope>"
+    for boundary in "/?:":
+        get_backend().delete_prefix(prefix + boundary)
+
+
+def cache_response(ttl: Optional[int] = None, public: bool = False):
+    """Cache successful responses to GET requests for `ttl` seconds (default `RESPONSE_CACHE_TTL`).
+
+    Apply above `blp.response` so serialized responses are cached.
+    With `public=True`, responses are shared by all users: only for views not needing a JWT.
+    """
+
+    def decorator(view):
+        if public and checks_jwt(view):
+            raise ValueError(
+                f"{view.__name__} checks the JWT, its responses can't be cached publicly."
+            )
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if request.method not in ("GET", "HEAD") or not config.get(
+                "RESPONSE_CACHE_ENABLED"
+            ):
+                return view(*args, **kwargs)
+
+            max_age = ttl if ttl is not None else config["RESPONSE_CACHE_TTL"]
+            backend = get_backend()
+            key = cache_key(request.full_path, public=public)
+            entry = backend.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                entry = dict(
+                    body=body,
+                    etag=response_etag(body),
+                    headers=[
+                        (k, v)
+                        for k, v in response.headers.items()
+                        if k.lower() not in UNCACHED_HEADERS
+                    ],
+                )
+                backend.set(key, entry, ttl=max_age)
+            else:
+                response = current_app.response_class(
+                    entry["body"], headers=entry["headers"]
+                )
+
+            response.set_etag(entry["etag"])
+            if public:
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+            else:
+                # clients must check with us before reusing
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
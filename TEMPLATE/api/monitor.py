@@ -1,19 +1,130 @@
-"""Monitoring endpoints."""
+"""Monitoring endpoints.
+
+Use `/live` for frequent liveness checks, it never touches the database.
+`/ready` checks the database at most every `HEALTH_CHECK_INTERVAL` seconds
+so probes don't keep a paused Aurora cluster awake or use up Data API calls.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import current_app
 from flask_smorest import Blueprint
 from flask.views import MethodView
-from marshmallow import fields as f, Schema
+from marshmallow import fields as f
+from TEMPLATE.api.serialization import CompiledSchema
 from TEMPLATE.db import db
+from TEMPLATE.db.instrumentation import query_budget
+from TEMPLATE.db.pool import pool_stats
+from TEMPLATE.db.readonly import read_only
+from TEMPLATE.metrics import collect_metrics
 
 blp = Blueprint("Monitoring", __name__, url_prefix="/api/monitoring")
 
 
-class MonitoringSchema(Schema):
+class DBProbe:
+    """Most recent result of checking if the database is up."""
+
+    def __init__(self):
+        self.ok: Optional[bool] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+        self._checked: Optional[float] = None  # monotonic time of last check
+        self._lock = threading.Lock()
+
+    def check(self, max_age: float) -> bool:
+        """Query the database unless it was checked less than max_age seconds ago.
+
+        Returns True if a cached result was used.
+        """
+        with self._lock:
+            if self._checked is not None and time.monotonic() - self._checked < max_age:
+                return True
+
+            start = time.perf_counter()
+            try:
+                self.ok = bool(db.engine.execute("SELECT 1").scalar())
+            except Exception as ex:
+                self.ok = False
+                self.last_error = str(ex)
+                self.last_error_at = datetime.now(timezone.utc)
+            self.latency_ms = (time.perf_counter() - start) * 1000
+            self.checked_at = datetime.now(timezone.utc)
+            self._checked = time.monotonic()
+            return False
+
+
+db_probe = DBProbe()
+
+
+def check_db() -> bool:
+    """Check the database, using the cached result if recent enough."""
+    return db_probe.check(max_age=current_app.config["HEALTH_CHECK_INTERVAL"])
+
+
+class MonitoringSchema(CompiledSchema):
     ok = f.Boolean(dump_only=True)
 
 
+class ReadinessSchema(CompiledSchema):
+    ok = f.Boolean(dump_only=True)
+    cached = f.Boolean(dump_only=True)
+    latency_ms = f.Float(dump_only=True)
+    checked_at = f.DateTime(dump_only=True)
+    last_error = f.Str(dump_only=True)
+    last_error_at = f.DateTime(dump_only=True)
+    pool = f.Dict(dump_only=True)
+
+
 @blp.route("")
 class Monitoring(MethodView):
+    @read_only
+    @query_budget(1)
     @blp.response(MonitoringSchema())
     def get(self):
         """Check if site and DB are up."""
-        return {"ok": bool(db.engine.execute("SELECT 1").scalar())}
+        check_db()
+        return {"ok": db_probe.ok}, 200 if db_probe.ok else 503
+
+
+@blp.route("live")
+class Liveness(MethodView):
+    @blp.response(MonitoringSchema())
+    def get(self):
+        """Check if the site is up, without checking the DB."""
+        return {"ok": True}
+
+
+@blp.route("ready")
+class Readiness(MethodView):
+    @read_only
+    @query_budget(1)
+    @blp.response(ReadinessSchema())
+    def get(self):
+        """Check if the site can serve requests, using a recent DB check if available."""
+        cached = check_db()
+        result = dict(
+            ok=db_probe.ok,
+            cached=cached,
+            latency_ms=db_probe.latency_ms,
+            checked_at=db_probe.checked_at,
+            last_error=db_probe.last_error,
+            last_error_at=db_probe.last_error_at,
+            pool=pool_stats(db.engine),
+        )
+        return result, 200 if db_probe.ok else 503
+
+
+class MetricsSchema(CompiledSchema):
+    metrics = f.Dict(keys=f.Str(), values=f.Dict(), dump_only=True)
+
+
+@blp.route("metrics")
+class Metrics(MethodView):
+    @blp.response(MetricsSchema())
+    def get(self):
+        """Get runtime statistics such as cache hit rates."""
+        return {"metrics": collect_metrics()}
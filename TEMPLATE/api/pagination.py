@@ -0,0 +1,93 @@
+"""Keyset pagination for list endpoints.
+
+Use in place of `blp.paginate()`, returning a query from the view:
+
+    @blp.route("")
+    class Users(MethodView):
+        @blp.response(UserSchema(many=True))
+        @keyset_paginate(User.created_at, User.id)
+        def get(self):
+            return User.query
+
+Clients pass `?page_size=50`, then follow `next_cursor` from the `X-Pagination` header
+(`?cursor=...`) until it is null. The `Link` header has the URL of the next page.
+"""
+import json
+from copy import deepcopy
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import request
+from flask_smorest import abort, Blueprint
+from flask_smorest.utils import unpack_tuple_response
+from marshmallow import fields as f, Schema, validate
+from werkzeug.datastructures import Headers
+
+from TEMPLATE.db.keyset import InvalidCursorError
+
+PAGINATION_HEADER = Blueprint.PAGINATION_HEADER_FIELD_NAME
+
+
+class KeysetPaginationHeaderSchema(Schema):
+    page_size = f.Int()
+    next_cursor = f.Str()
+
+
+def _parameters_schema(page_size: int, max_page_size: int) -> Schema:
+    fields = dict(
+        cursor=f.Str(),
+        page_size=f.Int(
+            missing=page_size, validate=validate.Range(min=1, max=max_page_size)
+        ),
+    )
+    return Schema.from_dict(fields, name="KeysetPaginationParameters")()
+
+
+def next_page_url(cursor: str) -> str:
+    args = request.args.to_dict()
+    args["cursor"] = cursor
+    return f"{request.base_url}?{urlencode(args)}"
+
+
+def keyset_paginate(
+    *columns, page_size: int = 20, max_page_size: int = 100, descending: bool = False
+):
+    """Paginate the query returned by the view, ordered by columns (default: primary key).
+
+    Columns should be unique together and have an index, e.g. `(Model.created_at, Model.id)`.
+    """
+    parameters_schema = _parameters_schema(page_size, max_page_size)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            params = Blueprint.PAGINATION_ARGUMENTS_PARSER.parse(
+                parameters_schema, request, location="query"
+            )
+            query, status, headers = unpack_tuple_response(view(*args, **kwargs))
+            try:
+                page = query.keyset_page(
+                    *columns,
+                    cursor=params.get("cursor"),
+                    page_size=params["page_size"],
+                    descending=descending,
+                )
+            except InvalidCursorError as ex:
+                abort(400, message=str(ex))
+
+            headers = Headers(headers)
+            header = KeysetPaginationHeaderSchema().dump(page)
+            headers[PAGINATION_HEADER] = json.dumps(header)
+            if page.next_cursor:
+                headers["Link"] = f'<{next_page_url(page.next_cursor)}>; rel="next"'
+            return page.items, status, headers
+
+        # document parameters the same way as blp.paginate()
+        wrapper._apidoc = deepcopy(getattr(wrapper, "_apidoc", {}))
+        wrapper._apidoc["pagination"] = {
+            "parameters": {"in": "query", "schema": parameters_schema},
+            "response": {400: "BAD_REQUEST"},
+        }
+        return wrapper
+
+    return decorator
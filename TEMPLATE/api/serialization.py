@@ -0,0 +1,205 @@
+"""Faster dumping for marshmallow schemas.
+
+Subclass `CompiledSchema` instead of `Schema` to opt in:
+
+    class ThingSchema(CompiledSchema):
+        name = f.Str()
+        kind = EnumField(ThingKind)
+        owner = f.Nested(UserSchema, dump_only=True)
+
+The first dump generates a function reading each field straight off the object,
+skipping marshmallow's per-field accessor lookups and passing through values that are
+already the right type (`str` for `Str`, `int` for `Int`, etc.).
+Anything it doesn't know how to speed up is left to the field, so the result is always
+the same as `Schema.dump`. Pre/post dump hooks still run as usual.
+
+`compile_serializers()` compiles every live instance ahead of time, e.g. when warming up.
+"""
+import weakref
+from typing import Any, Callable, List
+
+from marshmallow import fields, missing, Schema
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+from TEMPLATE.tracing import current_trace, span
+
+try:
+    from marshmallow_enum import EnumField, LoadDumpOptions
+except ImportError:  # pragma: no cover
+    EnumField = None
+
+Serializer = Callable[[Any, bool], Any]
+
+
+def _get_item(obj, key, default):
+    """Like marshmallow's `get_value` for a plain dict."""
+    value = obj.get(key, default)
+    if value is default:
+        return getattr(obj, key, default)
+    return value
+
+
+def _dump_default(field: fields.Field):
+    try:
+        return field.dump_default  # marshmallow >= 3.13
+    except AttributeError:
+        return getattr(field, "default", missing)
+
+
+def _has_dump_processors(schema: Schema) -> bool:
+    return schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP)
+
+
+def _reads_attribute(schema: Schema, field: fields.Field, attr_name: str) -> bool:
+    """Check if the value can be read with a plain getattr/dict lookup."""
+    attribute = field.attribute or attr_name
+    return (
+        field._CHECK_ATTRIBUTE
+        and type(field).get_value is fields.Field.get_value
+        and type(schema).get_attribute is Schema.get_attribute
+        and "." not in attribute
+    )
+
+
+def _nested_serializer(field: fields.Nested) -> Callable[[Any], Any]:
+    """Dump a nested value like `Nested._serialize`, resolving the schema on first use."""
+    resolved = []
+
+    def dump_nested(value):
+        if not resolved:
+            schema = field.schema
+            many = schema.many or field.many
+            if _has_dump_processors(schema):
+                resolved.append(lambda value: schema.dump(value, many=many))
+            else:
+                serializer = compile_serializer(schema)
+                resolved.append(lambda value: serializer(value, many))
+        return resolved[0](value)
+
+    return dump_nested
+
+
+def _value_expression(
+    field: fields.Field, i: int, attr_name: str, namespace: dict
+) -> str:
+    """Python expression serializing `v`, equivalent to `field._serialize(v, ...)`."""
+    field_class = type(field)
+    namespace[f"s{i}"] = field._serialize
+    fallback = f"s{i}(v, {attr_name!r}, obj)"
+
+    passthrough = None
+    if field_class._serialize is fields.String._serialize:
+        passthrough = "str"
+    elif (
+        isinstance(field, fields.Number)
+        and field_class._serialize is fields.Number._serialize
+        and field_class._format_num is fields.Number._format_num
+        and not field.as_string
+        and field.num_type in (int, float)
+    ):
+        passthrough = field.num_type.__name__
+    elif field_class._serialize is fields.Boolean._serialize:
+        passthrough = "bool"
+    if passthrough:
+        return f"v if v.__class__ is {passthrough} or v is None else {fallback}"
+
+    if EnumField is not None and field_class._serialize is EnumField._serialize:
+        member = "value" if field.dump_by == LoadDumpOptions.value else "name"
+        return f"None if v is None else v.{member}"
+
+    if field_class._serialize is fields.Nested._serialize:
+        namespace[f"n{i}"] = _nested_serializer(field)
+        return f"None if v is None else n{i}(v)"
+
+    return fallback
+
+
+def _generate(schema: Schema) -> Callable[[Any], Any]:
+    """Generate a function dumping a single object with schema."""
+    namespace = dict(
+        missing=missing,
+        dict_class=schema.dict_class,
+        get_attribute=schema.get_attribute,
+        get_item=_get_item,
+        slow=lambda obj: Schema._serialize(schema, obj),
+    )
+    lines: List[str] = [
+        "def dump_one(obj):",
+        "    if obj.__class__ is dict:",
+        "        get = get_item",
+        "    elif hasattr(obj, '__getitem__'):",
+        "        return slow(obj)",
+        "    else:",
+        "        get = getattr",
+        "    ret = dict_class()",
+    ]
+    for i, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        namespace[f"f{i}"] = field
+        if not _reads_attribute(schema, field, attr_name):
+            lines += [
+                f"    v = f{i}.serialize({attr_name!r}, obj, accessor=get_attribute)",
+                "    if v is not missing:",
+                f"        ret[{key!r}] = v",
+            ]
+            continue
+
+        attribute = field.attribute or attr_name
+        lines.append(f"    v = get(obj, {attribute!r}, missing)")
+        default = _dump_default(field)
+        if default is not missing:
+            namespace[f"d{i}"] = default
+            call = "()" if callable(default) else ""
+            lines += ["    if v is missing:", f"        v = d{i}{call}"]
+        expression = _value_expression(field, i, attr_name, namespace)
+        lines += ["    if v is not missing:", f"        ret[{key!r}] = {expression}"]
+    lines.append("    return ret")
+
+    source = "\n".join(lines)
+    code = compile(source, f"<compiled {type(schema).__name__}>", "exec")
+    exec(code, namespace)
+    return namespace["dump_one"]
+
+
+def compile_serializer(schema: Schema) -> Serializer:
+    """Get a function equivalent to `schema._serialize(obj, many=many)`.
+
+    Compiled once per schema instance, since `only`/`exclude` change the fields.
+    """
+    serializer = schema.__dict__.get("_compiled_serializer")
+    if serializer is None:
+        dump_one = _generate(schema)
+
+        def serializer(obj, many=False):
+            if many and obj is not None:
+                return [dump_one(item) for item in obj]
+            return dump_one(obj)
+
+        schema._compiled_serializer = serializer
+    return serializer
+
+
+# instances that may need compiling, mostly schemas used by views
+_instances: "weakref.WeakSet[Schema]" = weakref.WeakSet()
+
+
+class CompiledSchema(Schema):
+    """Schema using a generated function to dump objects."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _instances.add(self)
+
+    def _serialize(self, obj, *, many=False):
+        if current_trace() is None:
+            return compile_serializer(self)(obj, many)
+        with span("serialize", schema=type(self).__name__, many=many):
+            return compile_serializer(self)(obj, many)
+
+
+def compile_serializers() -> int:
+    """Compile all CompiledSchema instances in use. Returns how many there are."""
+    schemas = list(_instances)
+    for schema in schemas:
+        compile_serializer(schema)
+    return len(schemas)
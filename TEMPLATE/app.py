@@ -3,6 +3,11 @@ from .create_app import create_app
 from .api import init_views
 
 app = create_app()
-init_views()
+with app.startup_report.phase("init_views"):
+    init_views()
+app.startup_report.finish()
+
+if app.config.get("STARTUP_REPORT"):
+    print(app.startup_report.to_json())
 
 __all__ = ("app",)
@@ -0,0 +1,83 @@
+"""In-process caching."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_missing = object()
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with optional per-entry expiry.
+
+    Keeps hit/miss counts for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds, None for no expiry
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value if present and not expired."""
+        with self._lock:
+            value, expires = self._data.get(key, (_missing, None))
+            if value is _missing or (
+                expires is not None and expires <= time.monotonic()
+            ):
+                if value is not _missing:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used one if full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a value if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate) -> None:
+        """Remove all entries whose key matches predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def delete_where_value(self, predicate) -> None:
+        """Remove all entries whose value matches predicate(value)."""
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        """Remove everything."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=round(self.hits / lookups, 4) if lookups else None,
+            size=len(self),
+            maxsize=self.maxsize,
+        )
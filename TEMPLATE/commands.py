@@ -1,6 +1,7 @@
 """CLI commands."""
+import click
+
 from .db import db
-import flask_migrate
 
 
 def drop_all_tables(app):
@@ -16,8 +17,28 @@ def init_cli(app, manager):
         from TEMPLATE.db.fixtures import seed_db
 
         @app.cli.command("seed", help="Seed DB with test data")
-        def seed_db_cmd():
-            seed_db()
+        @click.option("--bulk", type=int, help="Insert this many fake users, fast.")
+        @click.option("--batch-size", type=int, help="Rows per COPY/batch insert.")
+        @click.option(
+            "--unique-passwords",
+            is_flag=True,
+            help="Give each bulk user their own password (slow to hash).",
+        )
+        @click.option("--workers", type=int, help="Processes for password hashing.")
+        def seed_db_cmd(bulk, batch_size, unique_passwords, workers):
+            if bulk:
+                from TEMPLATE.db.fixtures import DEFAULT_PASSWORD
+                from TEMPLATE.db.seed import bulk_seed_users
+
+                bulk_seed_users(
+                    bulk,
+                    password=DEFAULT_PASSWORD,
+                    batch_size=batch_size,
+                    unique_passwords=unique_passwords,
+                    workers=workers,
+                )
+            else:
+                seed_db()
 
         manager.add_command(seed_db_cmd)
 
@@ -25,11 +46,24 @@ def init_cli(app, manager):
         @app.cli.command(
             "init-db", help="Reinitialize database from scratch (deletes all data)"
         )
-        def init_db_cmd():
+        @click.option(
+            "--verify", is_flag=True, help="Check the schema matches the models."
+        )
+        def init_db_cmd(verify):
+            from TEMPLATE.db.snapshot import init_schema, verify_schema
+
             print(f"Initializing {db.engine.url}")
-            db.drop_all(app=app)
-            db.create_all(app=app)
-            print("Initialized DB")
+            url = app.config["SQLALCHEMY_DATABASE_URI"]
+            drop_all_tables(app=app)
+            how = init_schema(url, app.config.get("SCHEMA_SNAPSHOT_DIR"))
+            print(f"Initialized DB ({how})")
+            if verify:
+                diffs = verify_schema(url)
+                for diff in diffs:
+                    print(diff)
+                if diffs:
+                    raise click.ClickException("Schema doesn't match the models")
+                print("Schema matches the models")
 
         manager.add_command(init_db_cmd)
 
@@ -51,36 +85,258 @@ def init_cli(app, manager):
 
         manager.add_command(config_cmd)
 
+    @app.cli.command("startup-report", help="Show app initialization timings")
+    def startup_report_cmd():
+        print(app.startup_report)
+
+    manager.add_command(startup_report_cmd)
+
+    @app.cli.command(
+        "calibrate-password-hash",
+        help="Find the password hash cost fitting a latency budget on this machine",
+    )
+    @click.option(
+        "--target-ms", type=float, default=100, help="Time to spend per hash."
+    )
+    def calibrate_password_hash_cmd(target_ms):
+        from TEMPLATE.passwords import calibrate
+
+        print(f"Current: PASSWORD_HASH_METHOD={app.config['PASSWORD_HASH_METHOD']}")
+        print(f"For {target_ms}ms: PASSWORD_HASH_METHOD={calibrate(target_ms)}")
+
+    manager.add_command(calibrate_password_hash_cmd)
+
+    @app.cli.command("compile-config", help="Compile a stage's config into a snapshot")
+    @click.argument("stage")
+    @click.option("-o", "--output", help="Snapshot file, see CONFIG_SNAPSHOT.")
+    def compile_config_cmd(stage, output):
+        import json
+
+        from TEMPLATE.config_compiler import (
+            load_or_compile,
+            resolve_snapshot,
+            validate_config,
+        )
+
+        snapshot = load_or_compile(stage)
+        errors = validate_config(resolve_snapshot(snapshot), snapshot["types"])
+        for error in errors:
+            print(error)
+        if errors:
+            raise click.ClickException(f"{snapshot['config_class']} is not valid")
+        print(
+            f"{snapshot['config_class']}: {len(snapshot['values'])} settings, "
+            f"{len(snapshot['env'])} from environment variables"
+        )
+        if output:
+            with open(output, "w") as fh:
+                json.dump(snapshot, fh, indent=1, sort_keys=True)
+            print(f"Wrote {output}")
+
+    manager.add_command(compile_config_cmd)
+
+    @app.cli.command(
+        "diff-config", help="Compare the config of two stages or snapshots"
+    )
+    @click.argument("a")
+    @click.argument("b")
+    def diff_config_cmd(a, b):
+        from TEMPLATE.config_compiler import diff_configs, load_or_compile
+
+        for line in diff_configs(load_or_compile(a), load_or_compile(b)) or [
+            "No differences"
+        ]:
+            print(line)
+
+    manager.add_command(diff_config_cmd)
+
+    @app.cli.command("backfill", help="Run online data migrations")
+    @click.option("--status", is_flag=True, help="Show progress instead.")
+    def backfill_cmd(status):
+        from TEMPLATE.db.backfill import backfill_status, progress, run_backfills
+
+        if status:
+            for row in backfill_status(db.engine):
+                print(
+                    f"{row.name}: {progress(row):.1%} done, {row.rows} rows, {row.seconds:.1f}s"
+                )
+            return
+        for report in run_backfills(db.engine, app.config):
+            print(report)
+
+    manager.add_command(backfill_cmd)
+
+    @app.cli.command(
+        "import-report", help="Report what each Lambda function imports and excludes"
+    )
+    @click.option(
+        "-f", "--function", "functions", multiple=True, help="Only these functions."
+    )
+    @click.option("--top", default=10, help="Slowest modules to show per function.")
+    @click.option("--json", "as_json", is_flag=True, help="Print JSON instead.")
+    def import_report_cmd(functions, top, as_json):
+        import json
+
+        from TEMPLATE.import_report import (
+            format_report,
+            package_patterns,
+            report_function,
+            serverless_functions,
+        )
+
+        handlers = serverless_functions()
+        unknown = set(functions) - set(handlers)
+        if unknown:
+            raise click.ClickException(f"Unknown functions: {', '.join(unknown)}")
+        # excludes depend on what the other functions import
+        reports = [
+            report_function(function, handler) for function, handler in handlers.items()
+        ]
+        patterns = package_patterns(reports)
+        if functions:
+            reports = [report for report in reports if report.function in functions]
+            patterns = {function: patterns[function] for function in functions}
+        if as_json:
+            print(
+                json.dumps(
+                    dict(
+                        functions=[report.to_dict() for report in reports],
+                        exclude=patterns,
+                    ),
+                    indent=1,
+                )
+            )
+        else:
+            print(format_report(reports, patterns, top=top))
+
+    manager.add_command(import_report_cmd)
+
 
 def init_handler(event, context):
-    from TEMPLATE.app import app
+    from TEMPLATE.create_app import shared_app
+
+    app = shared_app("db-only")
 
     if not app.config.get("DEV_DB_SCRIPTS_ENABLED"):
         raise Exception("DEV_DB_SCRIPTS_ENABLED is not enabled")
+    from TEMPLATE.db.snapshot import init_schema
+
     with app.app_context():
         drop_all_tables(app=app)
-        db.create_all(app=app)
-    return "DB initialized."
+        how = init_schema(
+            app.config["SQLALCHEMY_DATABASE_URI"], app.config.get("SCHEMA_SNAPSHOT_DIR")
+        )
+    return f"DB initialized ({how})."
 
 
 def seed_handler(event, context):
-    """Lambda entry point."""
-    from TEMPLATE.app import app
+    """Lambda entry point.
+
+    Pass {"bulk": 100000} to insert that many fake users quickly,
+    optionally with "batch_size", "unique_passwords" and "start" (first user number).
+    """
+    from TEMPLATE.create_app import shared_app
+
+    app = shared_app("db-only", "passwords")
 
     if not app.config.get("DEV_DB_SCRIPTS_ENABLED"):
         raise Exception("DEV_DB_SCRIPTS_ENABLED is not enabled")
 
-    from TEMPLATE.db.fixtures import seed_db
+    from TEMPLATE.db.fixtures import DEFAULT_PASSWORD, seed_db
+    from TEMPLATE.db.seed import bulk_seed_users
 
+    event = event or {}
     with app.app_context():
+        if event.get("bulk"):
+            rate = bulk_seed_users(
+                int(event["bulk"]),
+                password=DEFAULT_PASSWORD,
+                batch_size=event.get("batch_size"),
+                unique_passwords=bool(event.get("unique_passwords")),
+                start=int(event.get("start", 0)),
+            )
+            return f"Seeded {event['bulk']} users ({rate:.0f} rows/s)."
         seed_db()
 
     return "Seeded DB."
 
 
-def migrate_handler(event, context):
+def warmup_handler(event, context):
+    """Lambda entry point for scheduled pings, prepares the app for requests."""
     from TEMPLATE.app import app
+    from TEMPLATE.warmup import warm_up
+
+    return warm_up(app)
+
+
+def app_handler(event, context):
+    """Lambda entry point for the API.
+
+    Warm-up pings are answered directly, everything else goes to serverless-wsgi.
+    """
+    from TEMPLATE.warmup import is_warmup_event
+
+    if is_warmup_event(event):
+        return warmup_handler(event, context)
+
+    import wsgi_handler  # packaged by serverless-wsgi
+
+    return wsgi_handler.handler(event, context)
+
+
+def calibrate_password_hash_handler(event, context):
+    """Lambda entry point.
+
+    Finds the password hash method for {"target_ms": 100} on Lambda hardware.
+    Run it with the same memory size as the app function, which determines CPU speed.
+    """
+    from TEMPLATE.passwords import calibrate
+
+    target_ms = float((event or {}).get("target_ms", 100))
+    return f"PASSWORD_HASH_METHOD={calibrate(target_ms)}"
+
+
+def migrate_handler(event, context):
+    """Lambda entry point.
+
+    Runs migrations, then backfills (see TEMPLATE.db.backfill) until they are done.
+    When about to time out, invokes itself with {"invocation": n} to continue the backfills.
+    """
+    import json
+
+    import boto3
+    import flask_migrate
+    from TEMPLATE.create_app import shared_app
+    from TEMPLATE.db.backfill import run_backfills
+
+    app = shared_app("migrate")
+    event = event or {}
+    invocation = int(event.get("invocation", 1))
+
+    def time_left():
+        return context.get_remaining_time_in_millis() / 1000
 
     with app.app_context():
-        flask_migrate.upgrade()
-    return "Migrated"
+        if invocation == 1:
+            flask_migrate.upgrade()
+        reports = run_backfills(db.engine, app.config, time_left=time_left)
+    summary = "; ".join(str(report) for report in reports) or "no backfills"
+
+    if (
+        reports
+        and not reports[-1].finished
+        and time_left() < app.config["BACKFILL_TIME_MARGIN"]
+    ):
+        if invocation >= app.config["BACKFILL_MAX_INVOCATIONS"]:
+            raise Exception(
+                f"Backfills unfinished after {invocation} invocations: {summary}"
+            )
+        boto3.client("lambda").invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=json.dumps(dict(invocation=invocation + 1)),
+        )
+        return (
+            f"Migrated, continuing backfills in invocation {invocation + 1}: {summary}"
+        )
+    return f"Migrated: {summary}"
@@ -0,0 +1,127 @@
+"""Running independent I/O calls concurrently.
+
+The app is served synchronously, one request per thread (or Lambda invocation).
+A view making several independent calls to AWS services or the database can make them
+at the same time instead, so they take as long as the slowest one rather than the sum:
+
+    user, avatar = concurrently(
+        lambda: User.query.get(user_id),
+        lambda: s3.get_object(Bucket=bucket, Key=key),
+    )
+
+Views can also be coroutines, waiting on blocking calls with `run_in_thread`:
+
+    @blp.route("/<int:user_id>")
+    class Profile(MethodView):
+        @blp.response(ProfileSchema)
+        @async_view
+        async def get(self, user_id):
+            user, avatar = await asyncio.gather(
+                run_in_thread(User.query.get, user_id),
+                run_in_thread(s3.get_object, Bucket=bucket, Key=key),
+            )
+            ...
+
+`async_view` must be the innermost decorator, so the others get its result rather than a coroutine.
+
+Calls run on a thread pool of `CONCURRENCY_WORKERS` threads, in the app context of the caller
+and sharing its `g`, but without `request`; pass what they need as arguments.
+Each call gets a database session of its own, closed when it returns, so objects it loads
+belong to that session (use `db.session.merge()` to bring them into the request's).
+Calls using the database at the same time need a connection each: in the "lambda"
+`DB_POOL_MODE` the pool opens up to one extra connection per worker, see `DB_POOL_MAX_OVERFLOW`.
+Queries made in calls count towards the request's query statistics.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, List
+
+from flask import _app_ctx_stack, current_app
+
+from TEMPLATE.db.instrumentation import active_collectors, collecting_into
+
+_executor_lock = threading.Lock()
+
+
+def get_executor(app=None) -> ThreadPoolExecutor:
+    """Get the app's thread pool for concurrent calls."""
+    app = app or current_app._get_current_object()
+    executor = app.extensions.get("concurrency_executor")
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get("concurrency_executor")
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=app.config.get("CONCURRENCY_WORKERS"),
+                    thread_name_prefix="concurrency",
+                )
+                app.extensions["concurrency_executor"] = executor
+    return executor
+
+
+def in_context(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """Bind a call to the current app context, to be made in another thread."""
+    parent = _app_ctx_stack.top
+    app = parent.app if parent else None
+    collectors = active_collectors()
+
+    def call():
+        if app is None:
+            return func(*args, **kwargs)
+        ctx = app.app_context()
+        ctx.g = parent.g
+        ctx.push()
+        try:
+            with collecting_into(collectors):
+                return func(*args, **kwargs)
+        finally:
+            # tears down this thread's database session
+            ctx.pop()
+
+    return call
+
+
+def concurrently(*calls: Callable[[], Any]) -> List[Any]:
+    """Make calls at the same time, returning their results in order.
+
+    If any call raises, the first exception is raised after all calls are done.
+    """
+    executor = get_executor()
+    futures = [executor.submit(in_context(call)) for call in calls]
+    for future in futures:
+        future.exception()  # wait for all
+    return [future.result() for future in futures]
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """Wait for a blocking call made in the thread pool, like `asyncio.to_thread`."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), in_context(func, *args, **kwargs))
+
+
+class _Loops(threading.local):
+    def __init__(self):
+        self.loop = None
+
+
+_loops = _Loops()
+
+
+def run_async(awaitable) -> Any:
+    """Run a coroutine to completion on this thread's event loop."""
+    loop = _loops.loop
+    if loop is None or loop.is_closed():
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(awaitable)
+
+
+def async_view(view: Callable) -> Callable:
+    """Let a view (or MethodView method) be a coroutine."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return run_async(view(*args, **kwargs))
+
+    return wrapper
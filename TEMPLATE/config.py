@@ -1,6 +1,7 @@
 import os
 from datetime import timedelta
 import logging
+from typing import Optional
 
 CONFIG_EXPECTED_KEYS = ("SQLALCHEMY_DATABASE_URI", "OPENAPI_VERSION", "JWT_SECRET_KEY")
 # use local "TEMPLATE" DB for local dev
@@ -15,17 +16,70 @@ class Config:
     APP_SECRETS_NAME = os.getenv("APP_SECRETS_NAME", "TEMPLATE/dev")
     LOAD_RDS_SECRETS = os.getenv("LOAD_RDS_SECRETS", False)
     RDS_SECRETS_NAME = os.getenv("RDS_SECRETS_NAME")
+    # seconds to keep secrets in memory before fetching them again
+    SECRETS_CACHE_TTL = int(os.getenv("SECRETS_CACHE_TTL", 300))
+    # refresh secrets in the background this many seconds before they expire
+    SECRETS_REFRESH_AHEAD = int(os.getenv("SECRETS_REFRESH_AHEAD", 60))
+    # also keep secrets in this file, encrypted with SECRETS_DISK_CACHE_KEY (a Fernet key)
+    SECRETS_DISK_CACHE = os.getenv("SECRETS_DISK_CACHE")
+    SECRETS_DISK_CACHE_KEY = os.getenv("SECRETS_DISK_CACHE_KEY")
 
     # use aurora data API?
     AURORA_SECRET_ARN = os.getenv("AURORA_SECRET_ARN")
     AURORA_CLUSTER_ARN = os.getenv("AURORA_CLUSTER_ARN")
     DATABASE_NAME = os.getenv("DATABASE_NAME")
     AURORA_DATA_API_ENABLED = os.getenv("AURORA_DATA_API_ENABLED", False)
+    # run statements in read-only requests without a Data API transaction
+    DATA_API_COALESCE_READS = True
+
+    # rows per executemany/BatchExecuteStatement call for bulk writes
+    DB_BATCH_SIZE = 1000
+    # rows fetched at a time for streamed list responses
+    STREAM_BATCH_SIZE = 500
+
+    # cache of migrated schemas for init-db and tests, see TEMPLATE/db/snapshot.py
+    SCHEMA_SNAPSHOT_DIR = os.getenv("SCHEMA_SNAPSHOT_DIR", ".schema-snapshots")
+    # give up on a migration waiting this long for a lock, instead of blocking requests
+    MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+    # online data migrations, see TEMPLATE/db/backfill.py
+    # pause between batches while replicas are this many seconds behind
+    BACKFILL_MAX_REPLICA_LAG = 5.0
+    # replica lag in seconds; on provisioned Aurora use
+    # "SELECT max(replica_lag_in_msec) / 1000.0 FROM aurora_replica_status() WHERE session_id != 'MASTER_SESSION_ID'"
+    BACKFILL_REPLICA_LAG_QUERY = (
+        "SELECT max(extract(epoch FROM replay_lag)) FROM pg_stat_replication"
+    )
+    # pause between batches while more queries than this are running
+    BACKFILL_MAX_ACTIVE_QUERIES = 20
+    BACKFILL_THROTTLE_SLEEP = 1  # seconds between checks while paused
+    # the migrate Lambda continues in a new invocation with this many seconds left
+    BACKFILL_TIME_MARGIN = 60
+    BACKFILL_MAX_INVOCATIONS = 50
 
     DEV_DB_SCRIPTS_ENABLED = False  # can init-db/seed/etc be run?
 
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", DEFAULT_DB_URL)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # read replica for read-only requests, e.g. an Aurora reader endpoint (not with the Data API)
+    # see TEMPLATE/db/replica.py
+    SQLALCHEMY_READER_DATABASE_URI = os.getenv("SQLALCHEMY_READER_DATABASE_URI")
+
+    # connection pooling for psycopg2, see TEMPLATE.db.pool
+    DB_POOL_MODE = os.getenv("DB_POOL_MODE", "default")
+    # extra connections allowed in "lambda" mode, needed to query concurrently (TEMPLATE.concurrency)
+    DB_POOL_MAX_OVERFLOW = None  # default: CONCURRENCY_WORKERS
+    DB_POOL_RECYCLE = 1800  # seconds, keep below Aurora auto-pause delay
+    DB_CONNECT_RETRIES = 5  # retry with exponential backoff while Aurora resumes
+    DB_CONNECT_BACKOFF = 0.5  # seconds before first retry
+    DB_POOL_STATS = bool(os.getenv("DB_POOL_STATS"))  # log pool state after requests
+
+    # per-request query statistics, see TEMPLATE.db.instrumentation
+    QUERY_STATS_ENABLED = True
+    QUERY_SERVER_TIMING = True  # send a Server-Timing header with DB time
+    QUERY_LOG = bool(os.getenv("QUERY_LOG"))  # log statistics for every request
+    QUERY_SLOW_MS = 500  # log a warning for requests spending this long in the DB
+    QUERY_SLOWEST_COUNT = 3  # statements to include in logs
+    QUERY_BUDGET_ACTION = "log"  # "log" or "raise" when a view exceeds @query_budget
 
     # set SQL_ECHO=1 this to echo queries to stderr
     SQLALCHEMY_ECHO = bool(os.getenv("SQL_ECHO"))
@@ -33,6 +87,21 @@ class Config:
     TESTING = bool(os.getenv("TESTING"))
     XRAY = bool(os.getenv("XRAY"))
 
+    # sampled tracing, see TEMPLATE/tracing.py
+    TRACING = bool(os.getenv("TRACING"))
+    TRACE_SAMPLE_RATE = float(
+        os.getenv("TRACE_SAMPLE_RATE", 0.01)
+    )  # fraction of requests
+    TRACE_SAMPLE_RATES = {"Monitoring.*": 0.0}  # by endpoint pattern
+    TRACE_EXPORTER_CLASS = "TEMPLATE.tracing.StdoutExporter"
+    TRACE_EXPORT_PATH = "traces.jsonl"  # for FileExporter
+    TRACE_BATCH_SIZE = 100  # spans per export
+
+    # defer CLI, migrations and DB check until needed, for faster cold starts
+    LAZY_INIT = bool(os.getenv("LAZY_INIT"))
+    # print initialization timings when the global app is created
+    STARTUP_REPORT = bool(os.getenv("STARTUP_REPORT"))
+
     # openapi can be found at /api/openapi.json /api/doc
     OPENAPI_VERSION = "3.0.2"
     OPENAPI_URL_PREFIX = "/api"
@@ -53,8 +122,42 @@ class Config:
         },
         "security": [{"bearerAuth": []}],
     }
+    # caching of responses from views decorated with @cache_response
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_CLASS = "TEMPLATE.api.caching.MemoryBackend"
+    RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")  # for RedisBackend
+    RESPONSE_CACHE_SIZE = 512  # for MemoryBackend
+    RESPONSE_CACHE_TTL = 60  # seconds
+
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "INSECURE")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
+    # skip verifying the same token again on every request
+    JWT_TOKEN_CACHE_ENABLED = True
+    JWT_TOKEN_CACHE_SIZE = 4096
+    JWT_TOKEN_CACHE_TTL = None  # seconds, defaults to JWT_ACCESS_TOKEN_EXPIRES
+
+    # werkzeug password hash method; calibrate with `flask calibrate-password-hash`
+    # stored hashes are upgraded on login when this changes
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:150000")
+    PASSWORD_HASH_EXECUTOR = os.getenv(
+        "PASSWORD_HASH_EXECUTOR", "thread"
+    )  # or process, inline
+    PASSWORD_HASH_WORKERS = None  # default for the executor
+
+    # cache users loaded for authenticated requests
+    USER_CACHE_ENABLED = True
+    USER_CACHE_CLASS = "TEMPLATE.user_cache.LRUUserCache"
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 60  # seconds
+
+    # threads for making I/O calls concurrently, see TEMPLATE/concurrency.py
+    CONCURRENCY_WORKERS = 8
+
+    # open a DB connection when warming up Lambda containers, see TEMPLATE/warmup.py
+    WARMUP_CONNECT_DB = True
+
+    # seconds to reuse the database check result for /api/monitoring/ready
+    HEALTH_CHECK_INTERVAL = 30
 
     NPLUSONE_LOGGER = logging.getLogger("app.nplusone")
     NPLUSONE_LOG_LEVEL = logging.WARNING
@@ -71,6 +174,8 @@ class DevConfig(Config):
     """AWS dev environment and DB."""
 
     DEV_DB_SCRIPTS_ENABLED = True
+    DB_POOL_MODE = os.getenv("DB_POOL_MODE", "lambda")
+    WARMUP_CONNECT_DB = False  # let the dev cluster auto-pause
 
 
 class ProductionConfig(Config):
@@ -80,6 +185,22 @@ class ProductionConfig(Config):
     APP_SECRETS_NAME = "TEMPLATE/prd"
     LOAD_APP_SECRETS = False
     DEV_DB_SCRIPTS_ENABLED = False
+    QUERY_SERVER_TIMING = False
+    DB_POOL_MODE = os.getenv("DB_POOL_MODE", "lambda")
+
+
+STAGE_CLASSES = {
+    "local": "TEMPLATE.config.LocalDevConfig",
+    "dev": "TEMPLATE.config.DevConfig",
+    "prd": "TEMPLATE.config.ProductionConfig",
+}
+
+
+def config_class_name(stage: Optional[str] = None) -> str:
+    """Get the import path of the config class for a stage (None for local dev)."""
+    if stage is None:
+        return STAGE_CLASSES["local"]
+    return STAGE_CLASSES.get(stage, STAGE_CLASSES["dev"])
 
 
 # config checks
@@ -117,16 +238,21 @@ def check_valid(conf) -> bool:
 
 
 def check_valid_handler(event, context):
-    # which env are we checking?
-    config_class = event.get("env", "TEMPLATE.config.LocalDevConfig")
+    """Lambda entry point.
 
-    # create an app with this config
-    from .flask import App
+    Checks a config class, e.g. {"env": "TEMPLATE.config.ProductionConfig"}, without creating an app.
+    """
+    from .config_compiler import compile_config, resolve_snapshot, validate_config
 
-    app = App(__name__)
-    app.config.from_object(config_class)
-    conf = app.config
+    # which env are we checking?
+    config_class = event.get("env", "TEMPLATE.config.LocalDevConfig")
 
-    ok = check_valid(conf)
+    try:
+        snapshot = compile_config(config_class)
+        conf = resolve_snapshot(snapshot)
+        errors = validate_config(conf, snapshot["types"])
+        check_valid(conf)
+    except ConfigurationInvalidError as ex:
+        errors = [str(ex)]
 
-    return dict(ok=ok)
+    return dict(ok=not errors, errors=errors)
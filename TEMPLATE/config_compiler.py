@@ -0,0 +1,266 @@
+"""Precompiled configuration.
+
+`flask compile-config prd` resolves a stage's config class ahead of time and checks it;
+`make deploy-*` runs it before deploying. With `-o TEMPLATE/config.prd.json` it writes a snapshot,
+and setting `CONFIG_SNAPSHOT` to its path makes the app load its config from the file instead of
+the class. That freezes the settings that were checked, but isn't faster: loading config classes
+takes a fraction of a millisecond.
+
+Settings read from environment variables in `TEMPLATE/config.py` are not frozen: the snapshot
+records the variable, default and conversion (`int`, `float` or `bool`) found by parsing the
+config module, and they are read when the snapshot is loaded. So are secrets, which are fetched
+as usual. Only the simple form is supported:
+
+    SECRETS_CACHE_TTL = int(os.getenv("SECRETS_CACHE_TTL", 300))
+
+Compiling also checks the type of every setting against the config class: the type of its
+default, or of its environment variable's conversion (str without one). Loaded configs are
+checked again once secrets and `instance.cfg` are applied.
+
+A snapshot made from a different version of `config.py` is ignored, with a warning.
+
+`flask diff-config dev prd` compares the settings of two stages (or snapshot files).
+"""
+import ast
+import hashlib
+import inspect
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from werkzeug.utils import import_string
+
+from TEMPLATE.config import config_class_name, ConfigurationInvalidError
+
+log = logging.getLogger(__name__)
+
+CONFIG_MODULE = Path(__file__).with_name("config.py")
+CONVERSIONS = {"int": int, "float": float, "bool": bool}
+
+
+class EnvSetting(NamedTuple):
+    """A setting read from an environment variable."""
+
+    var: str
+    default: Any
+    conversion: Optional[str]
+
+    def resolve(self, environ=os.environ) -> Any:
+        """Read the setting's value."""
+        value = environ.get(self.var, self.default)
+        if self.conversion is None:
+            return value
+        try:
+            return CONVERSIONS[self.conversion](value)
+        except (TypeError, ValueError):
+            raise ConfigurationInvalidError(
+                f"{self.var} should be {self.conversion}, not {value!r}."
+            )
+
+
+def _env_setting(node: ast.expr, namespace: dict) -> Optional[EnvSetting]:
+    conversion = None
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in CONVERSIONS
+        and len(node.args) == 1
+    ):
+        conversion = node.func.id
+        node = node.args[0]
+    if not (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "getenv"
+        and isinstance(node.args[0], ast.Constant)
+    ):
+        return None
+    var = node.args[0].value
+    if not isinstance(var, str):
+        return None
+    default = None
+    if len(node.args) > 1:
+        default = eval(
+            compile(ast.Expression(node.args[1]), "<config>", "eval"), namespace
+        )
+    return EnvSetting(var, default, conversion)
+
+
+def _reads_env(node: ast.expr) -> bool:
+    return any(
+        isinstance(child, ast.Attribute) and child.attr in ("getenv", "environ")
+        for child in ast.walk(node)
+    )
+
+
+def env_settings(config_class) -> Dict[str, EnvSetting]:
+    """Find the settings of a config class read from environment variables."""
+    module = inspect.getmodule(config_class)
+    if module is None:
+        raise ConfigurationInvalidError(f"Can't find the module of {config_class}.")
+    tree = ast.parse(inspect.getsource(module))
+    class_defs = {
+        node.name: node for node in tree.body if isinstance(node, ast.ClassDef)
+    }
+    settings: Dict[str, EnvSetting] = {}
+    for cls in reversed(config_class.__mro__):
+        class_def = class_defs.get(cls.__name__)
+        if class_def is None:
+            continue
+        for statement in class_def.body:
+            if not isinstance(statement, ast.Assign):
+                continue
+            for target in statement.targets:
+                if not (isinstance(target, ast.Name) and target.id.isupper()):
+                    continue
+                setting = _env_setting(statement.value, vars(module))
+                if setting:
+                    settings[target.id] = setting
+                elif _reads_env(statement.value):
+                    raise ConfigurationInvalidError(
+                        f"Can't compile {target.id}: use [int|float|bool](os.getenv(name, default))."
+                    )
+                else:
+                    settings.pop(target.id, None)
+    return settings
+
+
+def class_settings(config_class) -> Dict[str, Any]:
+    """Get the settings of a config class, like `Config.from_object`."""
+    return {
+        key: getattr(config_class, key) for key in dir(config_class) if key.isupper()
+    }
+
+
+def _type_names(value, setting: Optional[EnvSetting]) -> Optional[List[str]]:
+    if setting is not None:
+        if setting.conversion == "float":
+            return ["float", "int"]
+        if setting.conversion:
+            return [setting.conversion]
+        return sorted({"str", type(setting.default).__name__} - {"NoneType"})
+    if value is None:
+        return None  # anything
+    if isinstance(value, float):
+        return ["float", "int"]
+    return [type(value).__name__]
+
+
+def _encode(key: str, value):
+    if isinstance(value, timedelta):
+        return {"__timedelta__": value.total_seconds()}
+    if isinstance(value, logging.Logger):
+        return {"__logger__": value.name}
+    try:
+        json.dumps(value)
+    except TypeError:
+        raise ConfigurationInvalidError(
+            f"Can't compile {key}: {type(value).__name__} values aren't supported."
+        )
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and len(value) == 1:
+        if "__timedelta__" in value:
+            return timedelta(seconds=value["__timedelta__"])
+        if "__logger__" in value:
+            return logging.getLogger(value["__logger__"])
+    return value
+
+
+def source_hash() -> str:
+    """Hash the config module, to tell when snapshots are out of date."""
+    return hashlib.sha256(CONFIG_MODULE.read_bytes()).hexdigest()[:16]
+
+
+def compile_config(class_name: str) -> dict:
+    """Resolve a config class into a snapshot."""
+    config_class = import_string(class_name)
+    env = env_settings(config_class)
+    settings = class_settings(config_class)
+    return dict(
+        config_class=class_name,
+        source_hash=source_hash(),
+        values={
+            key: _encode(key, value)
+            for key, value in settings.items()
+            if key not in env
+        },
+        env={key: list(setting) for key, setting in env.items()},
+        types={
+            key: _type_names(value, env.get(key))
+            for key, value in settings.items()
+            if _type_names(value, env.get(key)) is not None
+        },
+    )
+
+
+def resolve_snapshot(snapshot: dict, environ=os.environ) -> dict:
+    """Get the config values of a snapshot."""
+    config = {key: _decode(value) for key, value in snapshot["values"].items()}
+    for key, setting in snapshot["env"].items():
+        config[key] = EnvSetting(*setting).resolve(environ)
+    return config
+
+
+def load_snapshot(path: str) -> Optional[dict]:
+    """Read a snapshot file, if it exists and is up to date."""
+    try:
+        with open(path) as fh:
+            snapshot = json.load(fh)
+    except FileNotFoundError:
+        log.warning(f"Config snapshot {path} not found")
+        return None
+    if snapshot.get("source_hash") != source_hash():
+        log.warning(f"Config snapshot {path} is out of date, using config classes")
+        return None
+    return snapshot
+
+
+def validate_config(config, types: Dict[str, List[str]]) -> List[str]:
+    """Check the types of config values. Returns a list of problems."""
+    errors = []
+    for key, names in types.items():
+        value = config.get(key)
+        if value is None or type(value).__name__ in names:
+            continue
+        errors.append(f"{key} should be {' or '.join(names)}, not {value!r}")
+    return errors
+
+
+def diff_configs(a: dict, b: dict) -> List[str]:
+    """Compare two snapshots."""
+    lines = []
+
+    def describe(snapshot, key):
+        if key in snapshot["env"]:
+            var, default, conversion = snapshot["env"][key]
+            return (
+                f"${var} (default {default!r}{f', {conversion}' if conversion else ''})"
+            )
+        return repr(snapshot["values"][key])
+
+    keys_a = set(a["values"]) | set(a["env"])
+    keys_b = set(b["values"]) | set(b["env"])
+    for key in sorted(keys_a | keys_b):
+        if key not in keys_b:
+            lines.append(f"- {key} = {describe(a, key)}")
+        elif key not in keys_a:
+            lines.append(f"+ {key} = {describe(b, key)}")
+        elif describe(a, key) != describe(b, key):
+            lines.append(f"~ {key}: {describe(a, key)} -> {describe(b, key)}")
+    return lines
+
+
+def load_or_compile(stage_or_path: str) -> dict:
+    """Get a snapshot from a file, or compile one for a stage."""
+    if stage_or_path.endswith(".json"):
+        with open(stage_or_path) as fh:
+            return json.load(fh)
+    if "." in stage_or_path:
+        return compile_config(stage_or_path)
+    return compile_config(config_class_name(stage_or_path))
@@ -4,61 +4,195 @@ Creates a new instance of our Flask app with plugins, blueprints, views, and con
 """
 import logging
 import os
+from functools import lru_cache
 
+import click
 import sqlalchemy_aurora_data_api  # noqa: F401
-from aws_xray_sdk.core import patcher, xray_recorder
-from aws_xray_sdk.ext.flask.middleware import XRayMiddleware
 from flask import jsonify
-from flask_cors import CORS
-from flask_jwt_extended import JWTManager
-from flask_migrate import Migrate, MigrateCommand
-from flask_script import Manager
-from nplusone.ext.flask_sqlalchemy import NPlusOne
-from typing import Optional
-
-from .api import api
+from sqlalchemy.engine.url import make_url
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
 from .commands import init_cli
+from .config import config_class_name, ConfigurationInvalidError
 from .db import db
+from .db.dataapi import connection_creator
+from .db.hot import init_hot_queries
+from .db.instrumentation import init_query_stats
+from .db.pool import pool_options, pool_stats
+from .db.replica import reader_binds, use_reader
 from .flaskapp import App
-from .secret import db_secret_to_url, get_secret, update_app_config
+from .metrics import register_metrics
+from .secret import (
+    configure_secret_cache,
+    db_secret_to_url,
+    get_secret,
+    get_secrets,
+    update_app_config,
+)
+from .tracing import init_tracing, tracer
 
 log = logging.getLogger(__name__)
 
+# what each app profile sets up, see create_app
+PROFILES: Dict[str, Tuple[str, ...]] = {
+    # API requests and the flask CLI
+    "web": ("database", "api", "passwords", "auth", "xray", "cli"),
+    # scripts using the database, e.g. the seed and initDb functions
+    "db-only": ("database",),
+    # alembic migrations
+    "migrate": ("database", "migrate"),
+}
+COMPONENTS = ("database", "api", "passwords", "auth", "xray", "cli", "migrate")
+
+
+def profile_components(profile: Union[str, Iterable[str]]) -> Set[str]:
+    """Get what to set up for profiles and components, e.g. ("db-only", "passwords")."""
+    names = [profile] if isinstance(profile, str) else list(profile)
+    components: Set[str] = set()
+    for name in names:
+        if name in PROFILES:
+            components.update(PROFILES[name])
+        elif name in COMPONENTS:
+            components.add(name)
+        else:
+            raise ValueError(f"Unknown app profile or component {name!r}")
+    return components
+
+
+def create_app(
+    test_config: Optional[dict] = None, profile: Union[str, Iterable[str]] = "web"
+) -> App:
+    """Create the app, setting up what a profile needs.
+
+    The "web" profile sets up everything. Lambda functions not serving requests use smaller
+    ones, which skip importing and initializing flask-smorest, JWT, CORS and X-Ray.
+    """
+    components = profile_components(profile)
+    # traced as "startup", exported if tracing turns out to be enabled
+    with tracer.trace("startup"):
+        app = App("TEMPLATE")
+        report = app.startup_report
+
+        # load config
+        with report.phase("configure"):
+            configure(app=app, test_config=test_config)
+        init_tracing(app)
+
+        # in lazy mode skip everything not needed to serve requests
+        lazy = app.config.get("LAZY_INIT")
+
+        # extensions
+        if "database" in components:
+            with report.phase("configure_database"):
+                configure_database(app)
+        if "api" in components:
+            with report.phase("api.init_app"):
+                init_api(app)
+            if not lazy or app.debug:
+                init_nplusone(app)
+        if "migrate" in components:
+            init_migrate(app)
+
+        # CLI
+        if "cli" in components and (not lazy or running_from_cli()):
+            with report.phase("init_cli"):
+                init_manager(app)
+
+        if "xray" in components:
+            with report.phase("init_xray"):
+                init_xray(app)
+        if "passwords" in components:
+            from .passwords import init_password_hasher
+
+            init_password_hasher(app)
+        if "auth" in components:
+            with report.phase("init_auth"):
+                init_auth(app)
+
+        return app
+
+
+@lru_cache(maxsize=None)
+def shared_app(*profile: str) -> App:
+    """Get an app for a profile, created once per process.
+
+    For Lambda handlers, so that warm invocations reuse it.
+    """
+    app = create_app(profile=profile or "web")
+    app.startup_report.finish()
+    if app.config.get("STARTUP_REPORT"):
+        print(app.startup_report.to_json())
+    return app
 
-def create_app(test_config: Optional[dict] = None) -> App:
-    app = App("TEMPLATE")
 
-    # load config
-    configure(app=app, test_config=test_config)
+def running_from_cli() -> bool:
+    """Check if we are being loaded by the flask CLI rather than serving requests."""
+    return click.get_current_context(silent=True) is not None
 
-    # extensions
-    CORS(app)
-    configure_database(app)
-    api.init_app(app)  # flask-smorest
-    NPlusOne(app)
 
-    # CLI
+def init_manager(app: App) -> None:
+    """Set up migrations and CLI commands."""
+    from flask_script import Manager
+    from flask_migrate import MigrateCommand
+
+    init_migrate(app)
     manager = Manager(app)
     manager.add_command("db", MigrateCommand)  # migrations under "flask db"
     init_cli(app, manager)
 
-    init_xray(app)
-    init_auth(app)
 
-    return app
+def init_migrate(app: App) -> None:
+    """Set up alembic migrations, if not done already."""
+    if "migrate" in app.extensions:
+        return
+    from flask_migrate import Migrate
+
+    app.migrate = Migrate(app, db)
+
+
+def init_api(app: App) -> None:
+    """Set up flask-smorest, CORS and response caching."""
+    from flask_cors import CORS
+
+    from .api import api
+    from .api.caching import init_response_cache
+
+    CORS(app)
+    api.init_app(app)  # flask-smorest
+    init_response_cache(app)
+
+
+def init_nplusone(app: App) -> None:
+    from nplusone.ext.flask_sqlalchemy import NPlusOne
+
+    NPlusOne(app)
 
 
 def init_auth(app: App) -> None:
+    from flask_jwt_extended import JWTManager, get_raw_jwt
+
+    from .token_cache import init_token_cache
+    from .user_cache import init_user_cache
+
     jwt = JWTManager(app)
+    init_token_cache(app)
+    user_cache = init_user_cache(app)
 
-    @jwt.user_loader_callback_loader
-    def user_loader_callback(identity):
+    def load_user(identity):
         from TEMPLATE.model.user import User
 
+        # a slightly stale user is fine for authenticating
+        with use_reader():
+            return User.query.hot_get(identity)
+
+    @jwt.user_loader_callback_loader
+    def user_loader_callback(identity):
         if identity is None:
             return None
-        user = User.query.get(identity)
-        return user
+        if user_cache:
+            token_iat = get_raw_jwt().get("iat")
+            return user_cache.load(identity, token_iat, loader=load_user)
+        return load_user(identity)
 
     @jwt.user_loader_error_loader
     def custom_user_loader_error(identity):
@@ -89,10 +223,31 @@ def configure_database(app: App) -> None:
         connect_args["aurora_cluster_arn"] = aurora_cluster_arn
         connect_args["secret_arn"] = rds_secret_arn
         engine_opts["connect_args"] = connect_args
+
+        if app.config.get("DATA_API_COALESCE_READS"):
+            # skip transactions in read-only requests
+            engine_opts["creator"] = connection_creator(dbname=db_name, **connect_args)
+    else:
+        engine_opts = {**pool_options(app.config), **engine_opts}
+        if (
+            make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_driver_name()
+            == "psycopg2"
+        ):
+            # send executemany() as multi-row statements
+            engine_opts.setdefault("executemany_mode", "values")
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_opts
 
+    if app.config.get("SQLALCHEMY_READER_DATABASE_URI"):
+        if app.config.get("AURORA_DATA_API_ENABLED"):
+            raise ConfigurationInvalidError(
+                "SQLALCHEMY_READER_DATABASE_URI can't be used with the Aurora Data API."
+            )
+        app.config["SQLALCHEMY_BINDS"] = reader_binds(app.config)
+
     db.init_app(app)  # init sqlalchemy
-    app.migrate = Migrate(app, db)  # alembic
+    init_query_stats(app)
+    register_metrics(app, "db_pool", lambda: pool_stats(db.engine))
+    init_hot_queries(app)
 
     @app.teardown_appcontext
     def shutdown_session(exception=None):
@@ -101,8 +256,11 @@ def configure_database(app: App) -> None:
         Ensures no open transactions remain.
         """
         db.session.remove()
+        if app.config.get("DB_POOL_STATS"):
+            log.info(f"DB pool: {pool_stats(db.engine)}")
 
-    if app.config.get("TESTING"):
+    if app.config.get("TESTING") or app.config.get("LAZY_INIT"):
+        # lazy: first query will tell us soon enough if the DB is unreachable
         return
 
     test_db(app)
@@ -120,28 +278,46 @@ def test_db(app: App) -> None:
         raise ex
 
 
-def configure_class(app: App) -> None:
-    """Load class-based app configuration from config.py."""
-    config_class = os.getenv("TEMPLATE_CONFIG".upper())
-
-    if not config_class:
-        # figure out which config to load
-        # get stage name
-        stage = os.getenv("STAGE")
-        if stage:
-            # running in AWS or sls wsgi serve
-            if stage == "prd":
-                config_class = "TEMPLATE.config.ProductionConfig"
-            else:
-                config_class = "TEMPLATE.config.DevConfig"
-        else:
-            # local dev
-            config_class = "TEMPLATE.config.LocalDevConfig"
+def configure_class(app: App) -> Optional[dict]:
+    """Load class-based app configuration from config.py, or its compiled snapshot.
+
+    Returns the snapshot, if one was loaded.
+    """
+    snapshot_path = os.getenv("CONFIG_SNAPSHOT")
+    if snapshot_path:
+        from .config_compiler import load_snapshot, resolve_snapshot
+
+        snapshot = load_snapshot(snapshot_path)
+        if snapshot is not None:
+            app.config.update(resolve_snapshot(snapshot))
+            return snapshot
 
+    # running in AWS or sls wsgi serve if STAGE is set, else local dev
+    config_class = os.getenv("TEMPLATE_CONFIG".upper()) or config_class_name(
+        os.getenv("STAGE")
+    )
     app.config.from_object(config_class)
+    return None
+
+
+def secret_names(config) -> list:
+    """Secrets Manager secrets the app is configured to load."""
+    names = []
+    if config.get("LOAD_RDS_SECRETS") and config.get("RDS_SECRETS_NAME"):
+        names.append(config["RDS_SECRETS_NAME"])
+    if config.get("LOAD_APP_SECRETS"):
+        names.append(config["APP_SECRETS_NAME"])
+    return names
 
 
 def configure_secrets(app: App) -> None:
+    configure_secret_cache(app.config)
+
+    # fetch all the secrets we need in one request
+    names = secret_names(app.config)
+    if names:
+        get_secrets(names)
+
     if app.config.get("LOAD_RDS_SECRETS"):
         # fetch db config secrets from Secrets Manager
         secret_name = app.config["RDS_SECRETS_NAME"]
@@ -163,7 +339,7 @@ def configure_instance(app: App) -> None:
 
 
 def configure(app: App, test_config=None) -> None:
-    configure_class(app)
+    snapshot = configure_class(app)
     config = app.config
     if test_config:
         config.update(test_config)
@@ -179,11 +355,21 @@ def configure(app: App, test_config=None) -> None:
 
     if not check_valid(config):
         raise Exception("Configuration is not valid.")
+    if snapshot is not None:
+        # types of values from secrets and instance.cfg
+        from .config_compiler import validate_config
+
+        errors = validate_config(config, snapshot["types"])
+        if errors:
+            raise ConfigurationInvalidError("; ".join(errors))
 
 
 def init_xray(app: App) -> None:
     if not app.config.get("XRAY"):
         return
+    from aws_xray_sdk.core import patcher, xray_recorder
+    from aws_xray_sdk.ext.flask.middleware import XRayMiddleware
+
     patcher.patch(("requests", "boto3"))  # xray tracing for external requests
     xray_recorder.configure(service="TEMPLATE")
     XRayMiddleware(app, xray_recorder)
@@ -1,17 +1,87 @@
-from flask_sqlalchemy import SQLAlchemy
+from typing import Optional
+
+from sqlalchemy import orm
+
 from jetkit.db import BaseQuery as JKBaseQuery, BaseModel as JKBaseModel, SQLA
+from TEMPLATE.db.keyset import KeysetPage, keyset_page
 
 
 class BaseQuery(JKBaseQuery):
     """Base class to use for queries."""
 
+    def keyset_page(
+        self,
+        *columns,
+        cursor: Optional[str] = None,
+        page_size: int = 20,
+        descending: bool = False,
+    ) -> KeysetPage:
+        """Get a page of results after `cursor`, ordered by columns (default: primary key).
+
+        Example:
+            page = User.query.keyset_page(User.created_at, User.id, cursor=cursor)
+            next_page = User.query.keyset_page(User.created_at, User.id, cursor=page.next_cursor)
+
+        Raises InvalidCursorError if the cursor is malformed.
+        """
+        return keyset_page(
+            self, columns, cursor=cursor, page_size=page_size, descending=descending
+        )
+
+    def hot(self, name: str, /, **params):
+        """Run a query declared in the model's `__hot_queries__`, with cached SQL.
+
+        Example:
+            User.query.hot("by_email", email=email).one_or_none()
+        """
+        from TEMPLATE.db.hot import run_hot_query
+
+        return run_hot_query(self, name, **params)
+
+    def hot_get(self, ident):
+        """Get by primary key like `get()`, with cached SQL."""
+        from TEMPLATE.db.hot import hot_get
+
+        return hot_get(self, ident)
+
 
 class BaseModel(JKBaseModel):
     """Base class to use for all models."""
 
 
+class SQLAlchemy(SQLA):
+    """Flask-SQLAlchemy extension that sets up our engine event hooks and replica routing."""
+
+    def create_session(self, options):
+        """Create the session factory, with sessions that can read from a replica."""
+        from TEMPLATE.db.replica import RoutingSession
+
+        factory = super().create_session(options)
+        session_class = type("RoutingSession", (RoutingSession, factory.class_), {})
+        return orm.sessionmaker(class_=session_class, **factory.kw)
+
+    def create_engine(self, sa_url, engine_opts):
+        """Create an engine for the app database."""
+        from TEMPLATE.db.instrumentation import instrument_engine
+        from TEMPLATE.db.pool import configure_pool
+
+        config = self.get_app().config
+        engine = super().create_engine(sa_url, engine_opts)
+        configure_pool(engine, config)
+        if config.get("QUERY_STATS_ENABLED"):
+            instrument_engine(engine)
+        if config.get("TRACING"):
+            from TEMPLATE.tracing import trace_engine
+
+            trace_engine(engine)
+        return engine
+
+
 # initialize our XRay?FlaskSQLAlchemy instance
-db: SQLAlchemy = SQLA(model_class=BaseModel, query_class=BaseQuery)
+db: SQLAlchemy = SQLAlchemy(model_class=BaseModel, query_class=BaseQuery)
 
 # load all model classes now
 import TEMPLATE.model  # noqa: F401
+
+# tables not mapped to models
+import TEMPLATE.db.backfill  # noqa: F401
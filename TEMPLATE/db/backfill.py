@@ -0,0 +1,282 @@
+r"""Online data migrations.
+
+Schema migrations should be quick: each runs in its own transaction with a `MIGRATION_LOCK_TIMEOUT`,
+so a migration waiting for a lock fails instead of blocking requests behind it.
+Updating existing rows of a big table in a migration would hold locks on them until it's done,
+so migrations register a backfill instead, which is run afterwards in batches of primary keys,
+committing each one:
+
+    from TEMPLATE.db.backfill import add_backfill, remove_backfill
+
+    def upgrade():
+        op.add_column("user", sa.Column("email_domain", sa.Text()))
+        add_backfill(
+            "user_email_domain",
+            "user",
+            "UPDATE \"user\" SET email_domain = split_part(email, '@', 2) "
+            "WHERE id > :start AND id <= :end",
+        )
+
+    def downgrade():
+        remove_backfill("user_email_domain")
+        op.drop_column("user", "email_domain")
+
+The statement gets the key range of each batch as `:start` and `:end`.
+New rows should be written correctly by the app before the backfill runs; it covers keys up to
+the highest one when it started.
+
+Progress is saved in the `backfill` table with each batch, so backfills resume where they left off.
+Between batches they wait while replica lag or the number of active queries is above the limits
+set by `BACKFILL_MAX_REPLICA_LAG` and `BACKFILL_MAX_ACTIVE_QUERIES`.
+
+Backfills are run by `flask backfill` and the migrate Lambda, which invokes itself again to continue
+when it's about to time out.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+from TEMPLATE.db import db
+
+log = logging.getLogger(__name__)
+
+backfill_table = db.Table(
+    "backfill",
+    sa.Column("name", sa.Text, primary_key=True),
+    sa.Column("table_name", sa.Text, nullable=False),
+    sa.Column("key_column", sa.Text, nullable=False, server_default="id"),
+    sa.Column("statement", sa.Text, nullable=False),
+    sa.Column("batch_size", sa.Integer, nullable=False, server_default="1000"),
+    # keys in (first_key, max_key] are updated, up to last_key so far
+    sa.Column("first_key", sa.BigInteger),
+    sa.Column("last_key", sa.BigInteger),
+    sa.Column("max_key", sa.BigInteger),
+    sa.Column("rows", sa.BigInteger, nullable=False, server_default="0"),
+    sa.Column("seconds", sa.Float, nullable=False, server_default="0"),
+    sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column("finished_at", sa.DateTime(timezone=True)),
+)
+
+
+def add_backfill(
+    name: str,
+    table_name: str,
+    statement: str,
+    key_column: str = "id",
+    batch_size: int = 1000,
+) -> None:
+    """Register a backfill from a migration."""
+    from alembic import op
+
+    op.execute(
+        backfill_table.insert().values(
+            name=name,
+            table_name=table_name,
+            key_column=key_column,
+            statement=statement,
+            batch_size=batch_size,
+        )
+    )
+
+
+def remove_backfill(name: str) -> None:
+    """Forget a backfill, from a migration's downgrade."""
+    from alembic import op
+
+    op.execute(backfill_table.delete().where(backfill_table.c.name == name))
+
+
+@dataclass
+class BackfillReport:
+    """What a backfill did in one run."""
+
+    name: str
+    batches: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+    throttled_seconds: float = 0.0
+    progress: float = 0.0  # fraction of the key range done
+    finished: bool = False
+    batch_ms: List[float] = field(default_factory=list, repr=False)
+
+    def __str__(self):
+        rate = self.rows / self.seconds if self.seconds else 0
+        slowest = max(self.batch_ms, default=0)
+        state = "finished" if self.finished else f"{self.progress:.1%} done"
+        return (
+            f"{self.name}: {state}, {self.rows} rows in {self.batches} batches, "
+            f"{self.seconds:.1f}s ({rate:.0f} rows/s, slowest batch {slowest:.0f}ms), "
+            f"throttled {self.throttled_seconds:.1f}s"
+        )
+
+
+class Throttle:
+    """Wait while the database is busy."""
+
+    def __init__(self, config):
+        self.max_lag = config.get("BACKFILL_MAX_REPLICA_LAG")
+        self.lag_query = config.get("BACKFILL_REPLICA_LAG_QUERY")
+        self.max_active = config.get("BACKFILL_MAX_ACTIVE_QUERIES")
+        self.sleep = config.get("BACKFILL_THROTTLE_SLEEP", 1)
+
+    def busy(self, conn: Connection) -> Optional[str]:
+        """Get why the database is too busy for another batch, if it is."""
+        if self.max_lag is not None and self.lag_query:
+            lag = conn.execute(sa.text(self.lag_query)).scalar() or 0
+            if lag > self.max_lag:
+                return f"replica lag {lag:.1f}s"
+        if self.max_active is not None:
+            active = conn.execute(
+                sa.text(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE state = 'active' AND pid != pg_backend_pid()"
+                )
+            ).scalar()
+            if active > self.max_active:
+                return f"{active} active queries"
+        return None
+
+    def wait(self, engine: Engine, until: Callable[[], bool]) -> float:
+        """Wait until the database isn't busy, or until() is true. Returns seconds waited."""
+        start = time.monotonic()
+        with engine.connect() as conn:
+            reason = self.busy(conn)
+            while reason and not until():
+                log.info(f"Backfill throttled: {reason}")
+                time.sleep(self.sleep)
+                reason = self.busy(conn)
+        return time.monotonic() - start
+
+
+def _key_range(conn: Connection, row) -> tuple:
+    key = sa.column(row.key_column)
+    low, high = conn.execute(
+        sa.select([sa.func.min(key), sa.func.max(key)]).select_from(
+            sa.table(row.table_name)
+        )
+    ).first()
+    if low is None:
+        return 0, 0
+    return low - 1, high
+
+
+def progress(row) -> float:
+    """Get the fraction of a backfill's keys done."""
+    if row.finished_at is not None:
+        return 1.0
+    if row.max_key is None or row.max_key <= row.first_key:
+        return 0.0
+    return (row.last_key - row.first_key) / (row.max_key - row.first_key)
+
+
+def run_batch(conn: Connection, name: str) -> Optional[tuple]:
+    """Run the next batch of a backfill in the transaction of conn.
+
+    Returns (rows updated, backfill row), or None if the backfill is finished or
+    being run elsewhere.
+    """
+    t = backfill_table
+    where = t.c.name == name
+    row = conn.execute(
+        t.select()
+        .where(where)
+        .where(t.c.finished_at.is_(None))
+        .with_for_update(skip_locked=True)
+    ).first()
+    if row is None:
+        return None
+    if row.max_key is None:
+        # first batch: cover the keys there are now
+        first_key, max_key = _key_range(conn, row)
+        conn.execute(
+            t.update()
+            .where(where)
+            .values(first_key=first_key, last_key=first_key, max_key=max_key)
+        )
+        row = conn.execute(t.select().where(where)).first()
+
+    start = row.last_key
+    end = min(start + row.batch_size, row.max_key)
+    rows = 0
+    if end > start:
+        result = conn.execute(sa.text(row.statement), start=start, end=end)
+        rows = max(result.rowcount, 0)
+    values = dict(last_key=end, rows=t.c.rows + rows)
+    if end >= row.max_key:
+        values["finished_at"] = sa.func.now()
+    conn.execute(t.update().where(where).values(**values))
+    return rows, conn.execute(t.select().where(where)).first()
+
+
+def pending_backfills(engine: Engine) -> List[str]:
+    """Get the names of unfinished backfills, oldest first."""
+    t = backfill_table
+    with engine.connect() as conn:
+        return [
+            name
+            for name, in conn.execute(
+                sa.select([t.c.name])
+                .where(t.c.finished_at.is_(None))
+                .order_by(t.c.created_at, t.c.name)
+            )
+        ]
+
+
+def backfill_status(engine: Engine) -> list:
+    """Get the rows of all backfills."""
+    with engine.connect() as conn:
+        return conn.execute(
+            backfill_table.select().order_by(backfill_table.c.created_at)
+        ).fetchall()
+
+
+def run_backfills(
+    engine: Engine, config, time_left: Optional[Callable[[], float]] = None
+) -> List[BackfillReport]:
+    """Run unfinished backfills until they are done or time_left() (seconds) runs out.
+
+    Stops with `BACKFILL_TIME_MARGIN` seconds to spare.
+    """
+    throttle = Throttle(config)
+    margin = config.get("BACKFILL_TIME_MARGIN", 60)
+
+    def out_of_time() -> bool:
+        return time_left is not None and time_left() < margin
+
+    reports = []
+    for name in pending_backfills(engine):
+        report = BackfillReport(name)
+        reports.append(report)
+        started = time.monotonic()
+        while not out_of_time():
+            report.throttled_seconds += throttle.wait(engine, until=out_of_time)
+            if out_of_time():
+                break
+            batch_start = time.monotonic()
+            with engine.begin() as conn:
+                result = run_batch(conn, name)
+                if result is None:
+                    break
+                rows, row = result
+                elapsed = time.monotonic() - batch_start
+                conn.execute(
+                    backfill_table.update()
+                    .where(backfill_table.c.name == name)
+                    .values(seconds=backfill_table.c.seconds + elapsed)
+                )
+            report.batches += 1
+            report.rows += rows
+            report.batch_ms.append(elapsed * 1000)
+            report.progress = progress(row)
+            if row.finished_at is not None:
+                report.finished = True
+                break
+        report.seconds = time.monotonic() - started - report.throttled_seconds
+        log.info(f"Backfill {report}")
+        if not report.finished:
+            break  # out of time, or running elsewhere
+    return reports
@@ -0,0 +1,49 @@
+"""Bulk writes.
+
+Saving new objects with `db.session.add` issues one INSERT per row because SQLAlchemy fetches back
+each generated primary key. With the Aurora Data API every statement is a separate HTTPS request.
+
+These helpers skip fetching keys so SQLAlchemy can use executemany, which the Data API driver sends
+as one BatchExecuteStatement call per batch. The number of requests then scales with the number of
+batches (`DB_BATCH_SIZE` rows each) instead of the number of rows.
+
+Unlike `db.session.add`, saved objects don't get their primary keys or server defaults back,
+relationships are not cascaded and mapper events are not emitted.
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from flask import current_app
+
+from TEMPLATE.db import db
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Split an iterable into lists of up to `size` items."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def get_batch_size(batch_size: Optional[int] = None) -> int:
+    return batch_size or current_app.config["DB_BATCH_SIZE"]
+
+
+def bulk_save(objects: Iterable, batch_size: Optional[int] = None) -> int:
+    """Insert or update model objects in batches. Returns the number of objects saved."""
+    count = 0
+    for batch in batched(objects, get_batch_size(batch_size)):
+        db.session.bulk_save_objects(batch, preserve_order=False)
+        count += len(batch)
+    return count
+
+
+def bulk_insert(model, rows: Iterable[dict], batch_size: Optional[int] = None) -> int:
+    """Insert rows given as dicts of attribute values. Returns the number of rows inserted."""
+    count = 0
+    for batch in batched(rows, get_batch_size(batch_size)):
+        db.session.bulk_insert_mappings(model, batch)
+        count += len(batch)
+    return count
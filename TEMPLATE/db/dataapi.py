@@ -0,0 +1,47 @@
+"""Aurora Data API connections.
+
+Every Data API transaction costs a BeginTransaction call before the first statement and a
+CommitTransaction or RollbackTransaction call when the connection is returned to the pool.
+In read-only requests (see `TEMPLATE.db.readonly`) statements are run outside of a transaction instead,
+which is equivalent to the default READ COMMITTED isolation when nothing is written.
+"""
+from functools import lru_cache
+
+import aurora_data_api
+import boto3
+
+from TEMPLATE.db.readonly import is_read_only
+
+
+@lru_cache(maxsize=None)
+def get_rds_data_client():
+    """Get an RDS Data API client shared by all connections."""
+    return boto3.client("rds-data")
+
+
+class DataAPIConnection(aurora_data_api.AuroraDataAPIClient):
+    def cursor(self):
+        """Get a cursor, beginning a transaction unless the request is read-only."""
+        if self._transaction_id is None and is_read_only():
+            cursor_args = {}
+            if hasattr(self, "_continue_after_timeout"):  # aurora-data-api >= 0.3
+                cursor_args["continue_after_timeout"] = self._continue_after_timeout
+            return aurora_data_api.AuroraDataAPICursor(
+                client=self._client,
+                dbname=self._dbname,
+                aurora_cluster_arn=self._aurora_cluster_arn,
+                secret_arn=self._secret_arn,
+                **cursor_args,
+            )
+        return super().cursor()
+
+
+def connection_creator(**connect_args):
+    """Make a `creator` for create_engine that opens DataAPIConnections."""
+
+    def create():
+        return DataAPIConnection(
+            **{"rds_data_client": get_rds_data_client(), **connect_args}
+        )
+
+    return create
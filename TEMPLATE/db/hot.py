@@ -0,0 +1,159 @@
+"""Cached compiled SQL for hot queries.
+
+Building a Query and compiling it to SQL can take more CPU time than running a simple
+query. Queries run on most requests can be declared once on their model:
+
+    class User(db.Model):
+        __hot_queries__ = {
+            "by_email": lambda query: query.filter(User.email == bindparam("email")),
+        }
+
+and run with the parameters filled in:
+
+    User.query.hot("by_email", email=email).one_or_none()
+    User.query.hot_get(user_id)  # like User.query.get(user_id)
+
+These are SQLAlchemy baked queries: each query is built once, and the SQL compiled for it
+is cached per dialect, so psycopg2 and Data API engines each get their own.
+Criteria on the query `hot()` is called on are not used, only those of the declared query.
+
+Statistics (under "hot_queries" in the monitoring metrics) estimate the CPU time saved:
+the time building and compiling the query once took, times the number of cached runs.
+"""
+import threading
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+from sqlalchemy import and_, bindparam
+from sqlalchemy.ext import baked
+from sqlalchemy.orm import Query
+
+from TEMPLATE.metrics import register_metrics
+
+# compiled queries to keep
+BAKERY_SIZE = 500
+
+QueryBuilder = Callable[[Query], Query]
+
+bakery = baked.bakery(size=BAKERY_SIZE)
+
+
+class HotQueryStats:
+    """Runs of each hot query and how much compiling they saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], dict] = {}
+
+    def record(self, name: str, dialect: str, measure: Callable[[], float]) -> None:
+        """Count a run, calling measure() the first time to get its compile time."""
+        key = (name, dialect)
+        stats = self._stats.get(key)
+        if stats is None:
+            compile_ms = measure()
+            with self._lock:
+                stats = self._stats.setdefault(
+                    key, dict(calls=0, compile_ms=compile_ms)
+                )
+        with self._lock:
+            stats["calls"] += 1
+
+    def as_dict(self) -> dict:
+        """Get statistics by query name and dialect."""
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._stats.items()}
+        result: Dict[str, dict] = {}
+        for (name, dialect), value in sorted(stats.items()):
+            saved_ms = value["compile_ms"] * max(0, value["calls"] - 1)
+            result.setdefault(name, {})[dialect] = dict(
+                calls=value["calls"],
+                compile_ms=round(value["compile_ms"], 3),
+                saved_ms=round(saved_ms, 1),
+            )
+        return result
+
+
+hot_query_stats = HotQueryStats()
+
+
+def _time_compile(build: Callable[[], Query], dialect) -> float:
+    start = time.perf_counter()
+    build().statement.compile(dialect=dialect)
+    return (time.perf_counter() - start) * 1000
+
+
+def _entity(query: Query):
+    return query._mapper_zero().class_
+
+
+def _dialect(session, entity):
+    return session.get_bind(mapper=entity).dialect
+
+
+def _dialect_name(dialect) -> str:
+    # e.g. postgresql+psycopg2, postgresql+auroradataapi
+    return f"{dialect.name}+{dialect.driver}"
+
+
+def get_hot_query(entity, name: str) -> Tuple[baked.BakedQuery, QueryBuilder]:
+    """Get the baked query declared as name on a model."""
+    try:
+        build = entity.__hot_queries__[name]
+    except (AttributeError, KeyError):
+        raise KeyError(f"{entity.__name__} has no hot query '{name}'")
+    # the initial lambda is the same code for every query, key it by model and name
+    bq = bakery(lambda session: session.query(entity), entity, name)
+    bq += build
+    return bq, build
+
+
+def run_hot_query(query: Query, name: str, /, **params) -> baked.Result:
+    """Run a hot query in the session of query."""
+    entity = _entity(query)
+    session = query.session
+    bq, build = get_hot_query(entity, name)
+    dialect = _dialect(session, entity)
+    hot_query_stats.record(
+        f"{entity.__name__}.{name}",
+        _dialect_name(dialect),
+        lambda: _time_compile(lambda: build(session.query(entity)), dialect),
+    )
+    return bq(session).params(**params)
+
+
+def _get_query(entity, session) -> Query:
+    query = session.query(entity)
+    # Query.get() doesn't allow criteria, default filters are checked after loading
+    without_filters = getattr(query, "without_filters", None)
+    return without_filters() if without_filters else query
+
+
+def hot_get(query: Query, ident: Hashable):
+    """Like query.get(ident), with cached SQL."""
+    entity = _entity(query)
+    session = query.session
+    mapper = entity.__mapper__
+
+    def build_equivalent():
+        return _get_query(entity, session).filter(
+            and_(*(column == bindparam(column.key) for column in mapper.primary_key))
+        )
+
+    dialect = _dialect(session, entity)
+    hot_query_stats.record(
+        f"{entity.__name__}.get",
+        _dialect_name(dialect),
+        lambda: _time_compile(build_equivalent, dialect),
+    )
+    bq = bakery(lambda session: _get_query(entity, session), entity)
+    obj = bq(session).get(ident)
+
+    # same as jetkit's FilteredQuery.get()
+    for query_filter in getattr(query, "default_filters", ()):
+        if not query_filter.get_filter(query, obj):
+            return None
+    return obj
+
+
+def init_hot_queries(app) -> None:
+    register_metrics(app, "hot_queries", hot_query_stats.as_dict)
@@ -0,0 +1,226 @@
+"""SQL query statistics per request.
+
+Counts queries and database time for each request, reported as a `Server-Timing` header
+(visible in browser dev tools) and in the logs.
+
+Views can declare how many queries they are allowed to make, to catch N+1 queries:
+
+    @blp.route("")
+    class Things(MethodView):
+        @query_budget(3)
+        @blp.response(ThingSchema(many=True))
+        def get(self):
+            ...
+
+Queries made while serializing the response count too. Going over budget logs a warning,
+or raises `QueryBudgetExceeded` if `QUERY_BUDGET_ACTION` is "raise" (as in tests).
+
+Queries in any block of code can be counted with `count_queries()`.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, Optional, Tuple
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from TEMPLATE.config import ConfigurationInvalidError
+
+log = logging.getLogger(__name__)
+
+BUDGET_ACTIONS = ("log", "raise")
+
+# statements are truncated to this length in reports
+STATEMENT_LENGTH = 200
+
+
+class QueryBudgetExceeded(Exception):
+    """More queries were made than a view's query budget allows."""
+
+
+class QueryStats:
+    """Queries made during a request or block of code."""
+
+    def __init__(self, keep_slowest: int = 3):
+        self.count = 0
+        self.total_ms = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest: List[Tuple[float, str]] = []  # min-heap of (ms, statement)
+        # queries may be made from several threads, see TEMPLATE.concurrency
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, elapsed_ms: float) -> None:
+        """Record a query."""
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if not self.keep_slowest:
+                return
+            entry = (elapsed_ms, statement[:STATEMENT_LENGTH])
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        """Slowest statements with their durations, slowest first."""
+        return sorted(self._slowest, reverse=True)
+
+    def as_dict(self) -> dict:
+        """Get statistics for logging."""
+        return dict(
+            queries=self.count,
+            db_ms=round(self.total_ms, 2),
+            slowest=[
+                dict(ms=round(ms, 2), statement=statement)
+                for ms, statement in self.slowest
+            ],
+        )
+
+    def server_timing(self) -> str:
+        """Value for a Server-Timing header."""
+        return f'db;dur={self.total_ms:.2f};desc="{self.count} queries"'
+
+
+class _Collectors(threading.local):
+    def __init__(self):
+        self.active: List[QueryStats] = []
+
+
+_collectors = _Collectors()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement the engine executes."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        if not _collectors.active:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for stats in _collectors.active:
+            stats.add(statement, elapsed_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # after_cursor_execute won't be called
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+@contextmanager
+def count_queries(keep_slowest: int = 3):
+    """Collect statistics for queries made in this thread inside the block."""
+    stats = QueryStats(keep_slowest=keep_slowest)
+    _collectors.active.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.active.remove(stats)
+
+
+def active_collectors() -> List[QueryStats]:
+    """Get the statistics queries in this thread are currently counted towards."""
+    return list(_collectors.active)
+
+
+@contextmanager
+def collecting_into(collectors: List[QueryStats]):
+    """Count queries in this thread towards collectors, e.g. those of another thread."""
+    previous = _collectors.active
+    _collectors.active = previous + collectors
+    try:
+        yield
+    finally:
+        _collectors.active = previous
+
+
+def request_query_stats() -> Optional[QueryStats]:
+    """Get statistics for the current request, if enabled."""
+    return g.get("query_stats")
+
+
+def query_budget(max_queries: int):
+    """Declare the most queries a view should make, including serializing its response."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_budget = max_queries
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def check_query_budget(stats: QueryStats) -> None:
+    budget = g.get("query_budget")
+    if budget is None or stats.count <= budget:
+        return
+    message = (
+        f"{request.method} {request.path} made {stats.count} queries, "
+        f"budget is {budget}: {stats.as_dict()['slowest']}"
+    )
+    if current_app.config["QUERY_BUDGET_ACTION"] == "raise":
+        raise QueryBudgetExceeded(message)
+    log.warning(message)
+
+
+def init_query_stats(app) -> None:
+    """Collect query statistics for each request."""
+    if not app.config.get("QUERY_STATS_ENABLED"):
+        return
+    if app.config["QUERY_BUDGET_ACTION"] not in BUDGET_ACTIONS:
+        raise ConfigurationInvalidError(
+            f"QUERY_BUDGET_ACTION must be one of {', '.join(BUDGET_ACTIONS)}."
+        )
+
+    @app.before_request
+    def start_query_stats():
+        stats = QueryStats(keep_slowest=app.config["QUERY_SLOWEST_COUNT"])
+        g.query_stats = stats
+        _collectors.active.append(stats)
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = request_query_stats()
+        if stats is None:
+            return response
+        if app.config.get("QUERY_SERVER_TIMING"):
+            response.headers.add("Server-Timing", stats.server_timing())
+
+        slow = stats.total_ms >= app.config["QUERY_SLOW_MS"]
+        if slow or app.config.get("QUERY_LOG"):
+            entry = dict(
+                method=request.method,
+                path=request.path,
+                endpoint=request.endpoint,
+                status=response.status_code,
+                **stats.as_dict(),
+            )
+            log.log(logging.WARNING if slow else logging.INFO, json.dumps(entry))
+
+        check_query_budget(stats)
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exception=None):
+        stats = request_query_stats()
+        if stats in _collectors.active:
+            _collectors.active.remove(stats)
@@ -0,0 +1,123 @@
+"""Keyset (cursor) pagination.
+
+Instead of OFFSET, which makes the database read and throw away every row before the
+requested page, each page is fetched with `WHERE (created_at, id) > (:last_created_at, :last_id)`,
+which can use an index on the ordering columns no matter how deep the page is.
+
+The position of the last row is returned to clients as an opaque cursor string.
+"""
+import base64
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import inspect, tuple_
+
+
+class InvalidCursorError(ValueError):
+    """Cursor couldn't be decoded."""
+
+
+class KeysetPage:
+    """One page of keyset-paginated results."""
+
+    def __init__(self, items: List[Any], page_size: int, next_cursor: Optional[str]):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor  # None on the last page
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f"<KeysetPage items={len(self.items)} next_cursor={self.next_cursor!r}>"
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def _from_json(value, column):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type in (uuid.UUID, Decimal):
+        return python_type(value)
+    if python_type in (int, float, str) and not isinstance(value, python_type):
+        raise ValueError(f"Expected {python_type.__name__} for {column.key}")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Make an opaque cursor from the ordering column values of a row."""
+    data = json.dumps([_to_json(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Get the ordering column values back from a cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Wrong number of values")
+        return [_from_json(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError) as ex:
+        raise InvalidCursorError(f"Invalid cursor: {ex}") from ex
+
+
+def primary_key_columns(query) -> list:
+    """Get the primary key columns of the entity a query selects."""
+    entity = query.column_descriptions[0]["entity"]
+    mapper = inspect(entity)
+    return [
+        getattr(entity, mapper.get_property_by_column(c).key)
+        for c in mapper.primary_key
+    ]
+
+
+def keyset_page(
+    query,
+    columns: Sequence,
+    cursor: Optional[str] = None,
+    page_size: int = 20,
+    descending: bool = False,
+) -> KeysetPage:
+    """Get the page of query results after cursor, ordered by columns.
+
+    The columns must be unique together (end with the primary key) and should be indexed together.
+    """
+    columns = list(columns) or primary_key_columns(query)
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            key, after = columns[0], values[0]
+        else:
+            key, after = tuple_(*columns), tuple_(*values)
+        query = query.filter(key < after if descending else key > after)
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+
+    # fetch one extra row to know if there is a next page
+    rows = query.order_by(None).order_by(*ordering).limit(page_size + 1).all()
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return KeysetPage(items=items, page_size=page_size, next_cursor=next_cursor)
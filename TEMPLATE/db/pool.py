@@ -0,0 +1,92 @@
+"""Connection pooling for psycopg2 connections.
+
+Set `DB_POOL_MODE` to choose a strategy:
+    "default": SQLAlchemy's defaults, for long-running servers.
+    "lambda": keep a single connection open across invocations of a Lambda container.
+        Connections are checked with a ping before use and recycled after `DB_POOL_RECYCLE` seconds,
+        which should be less than the Aurora Serverless auto-pause delay.
+        Up to `DB_POOL_MAX_OVERFLOW` more connections are opened while needed, by default one
+        for each of the `CONCURRENCY_WORKERS` threads making concurrent calls.
+    "external": don't pool connections, for use with RDS Proxy or pgbouncer.
+
+Failed connection attempts are retried with exponential backoff, so requests arriving while
+a paused Aurora Serverless cluster resumes wait for it instead of failing.
+"""
+import logging
+import time
+import weakref
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from TEMPLATE.config import ConfigurationInvalidError
+
+log = logging.getLogger(__name__)
+
+POOL_MODES = ("default", "lambda", "external")
+
+# connection attempt counts per engine
+_connect_stats: "weakref.WeakKeyDictionary[Engine, Dict[str, int]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def pool_options(config) -> dict:
+    """Get create_engine options for the configured pool mode."""
+    mode = config.get("DB_POOL_MODE", "default")
+    if mode not in POOL_MODES:
+        raise ConfigurationInvalidError(
+            f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, not '{mode}'."
+        )
+    if mode == "lambda":
+        max_overflow = config.get("DB_POOL_MAX_OVERFLOW")
+        if max_overflow is None:
+            max_overflow = config.get("CONCURRENCY_WORKERS") or 0
+        return dict(
+            poolclass=QueuePool,
+            pool_size=1,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=config["DB_POOL_RECYCLE"],
+        )
+    if mode == "external":
+        return dict(poolclass=NullPool)
+    return {}
+
+
+def configure_pool(engine: Engine, config) -> None:
+    """Retry connecting with backoff and keep connection statistics."""
+    stats = _connect_stats.setdefault(engine, dict(connects=0, connect_retries=0))
+    retries = config.get("DB_CONNECT_RETRIES", 0)
+    backoff = config.get("DB_CONNECT_BACKOFF", 0.5)
+
+    @event.listens_for(engine, "do_connect")
+    def connect_with_retry(dialect, conn_rec, cargs, cparams):
+        for attempt in range(retries + 1):
+            try:
+                conn = dialect.connect(*cargs, **cparams)
+                stats["connects"] += 1
+                return conn
+            except dialect.dbapi.OperationalError as ex:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2**attempt
+                log.warning(f"Database connection failed, retrying in {delay}s: {ex}")
+                stats["connect_retries"] += 1
+                time.sleep(delay)
+
+
+def pool_stats(engine: Engine) -> dict:
+    """Get current pool state."""
+    pool = engine.pool
+    stats = dict(pool=type(pool).__name__, **_connect_stats.get(engine, {}))
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
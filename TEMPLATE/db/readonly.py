@@ -0,0 +1,39 @@
+"""Read-only requests.
+
+Views decorated with `read_only` promise not to write to the database for the rest of the request,
+which lets the database layer skip work it would otherwise need for writes.
+Attempting to flush changes in a read-only request raises `ReadOnlyRequestError`.
+"""
+from functools import wraps
+
+from flask import g, has_app_context
+from sqlalchemy import event
+
+from TEMPLATE.db import db
+
+
+class ReadOnlyRequestError(Exception):
+    pass
+
+
+def read_only(view):
+    """Mark the current request as read-only."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def is_read_only() -> bool:
+    return has_app_context() and g.get("db_read_only", False)
+
+
+@event.listens_for(db.session, "before_flush")
+def _forbid_writes(session, flush_context, instances):
+    if is_read_only() and (session.new or session.dirty or session.deleted):
+        raise ReadOnlyRequestError(
+            "Cannot write to the database in a read-only request"
+        )
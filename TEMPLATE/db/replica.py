@@ -0,0 +1,79 @@
+"""Read replica routing.
+
+With `SQLALCHEMY_READER_DATABASE_URI` set (e.g. an Aurora cluster's reader endpoint),
+SELECT statements go to the replica in
+    - requests marked with `read_only` (see `TEMPLATE.db.readonly`)
+    - blocks and functions wrapped in `use_reader()`:
+
+        with use_reader():
+            users = User.query.filter_by(name=name).all()
+
+Everything else goes to the writer: flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE
+and textual SQL.
+
+Replicas lag behind the writer, so once a request sends anything else than a plain SELECT
+to the writer, the rest of its reads go to the writer too, before and after committing,
+and it reads its own writes.
+
+`use_reader()` applies to the current thread only, even when other threads share the
+request's `g` (see `TEMPLATE.concurrency`).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_app_context
+from flask_sqlalchemy import get_state
+from sqlalchemy.sql.selectable import GenerativeSelect
+
+READER_BIND = "reader"
+
+_use_reader: ContextVar[bool] = ContextVar("use_reader", default=False)
+
+
+@contextmanager
+def use_reader():
+    """Send reads to the read replica, if there is one."""
+    token = _use_reader.set(True)
+    try:
+        yield
+    finally:
+        _use_reader.reset(token)
+
+
+def reader_binds(config) -> dict:
+    """Get SQLALCHEMY_BINDS with the reader added, if configured."""
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    reader_uri = config.get("SQLALCHEMY_READER_DATABASE_URI")
+    if reader_uri:
+        binds[READER_BIND] = reader_uri
+    return binds
+
+
+def _reads_allowed() -> bool:
+    if not has_app_context():
+        return False
+    return not g.get("db_wrote", False) and (
+        g.get("db_read_only", False) or _use_reader.get()
+    )
+
+
+class RoutingSession:
+    """Session mixin choosing between the writer and the reader."""
+
+    def get_bind(self, mapper=None, clause=None):
+        """Get the reader for reads when allowed, otherwise the writer."""
+        binds = self.app.config.get("SQLALCHEMY_BINDS")
+        if not binds or READER_BIND not in binds:
+            return super().get_bind(mapper, clause)
+        if (
+            not self._flushing
+            and isinstance(clause, GenerativeSelect)
+            and clause._for_update_arg is None
+        ):
+            if _reads_allowed():
+                return get_state(self.app).db.get_engine(self.app, bind=READER_BIND)
+        elif has_app_context():
+            # flushes, DML, locking reads, textual SQL: might write,
+            # so read our writes from now on
+            g.db_wrote = True
+        return super().get_bind(mapper, clause)
@@ -0,0 +1,175 @@
+"""Fast seeding of large amounts of fake data, for load testing.
+
+    flask seed --bulk 1000000
+
+Going through factories and the ORM costs several Faker calls, a password hash and an INSERT
+per row. Instead rows are generated in batches as plain dicts from pools of pre-generated fake
+values, unique passwords are hashed across a process pool, and each batch is sent with COPY
+(psycopg2) or a single executemany/BatchExecuteStatement (Data API).
+"""
+import csv
+import io
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from typing import Callable, Iterator, List, Optional
+
+from faker import Faker
+from werkzeug.security import generate_password_hash
+
+from TEMPLATE.db import db
+from TEMPLATE.db.bulk import bulk_insert, get_batch_size
+from TEMPLATE.model.user import NormalUser
+from TEMPLATE.passwords import get_password_hasher
+
+log = logging.getLogger(__name__)
+
+# distinct fake values to pick from
+POOL_SIZE = 1000
+
+USER_COLUMNS = ("email", "name", "dob", "avatar_url", "_password")
+
+
+def fake_pools(size: int = POOL_SIZE, seed: Optional[int] = None) -> dict:
+    """Generate pools of fake values once, to be combined at random for each row."""
+    faker = Faker()
+    if seed is not None:
+        faker.seed_instance(seed)
+    return dict(name=[faker.name() for _ in range(size)])
+
+
+@contextmanager
+def password_hasher(workers: Optional[int] = None):
+    """Get a function hashing a list of passwords, in parallel where processes are available."""
+    workers = workers or os.cpu_count() or 1
+    # hash with the configured method, without the app's executor and statistics
+    hash_password = partial(generate_password_hash, method=get_password_hasher().method)
+    executor = None
+    if workers > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError):
+            # no shared memory for multiprocessing on Lambda
+            log.info("Process pool unavailable, hashing passwords serially")
+
+    def hash_passwords(passwords: List[str]) -> List[str]:
+        if executor is None:
+            return [hash_password(p) for p in passwords]
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+    try:
+        yield hash_passwords
+    finally:
+        if executor:
+            executor.shutdown()
+
+
+def fake_user_rows(
+    count: int,
+    batch_size: int,
+    password: str,
+    unique_passwords: bool = False,
+    workers: Optional[int] = None,
+    start: int = 0,
+    seed: Optional[int] = None,
+) -> Iterator[List[dict]]:
+    """Generate batches of user rows (column name -> value).
+
+    All users share one hashed `password` unless `unique_passwords`, in which case user n
+    gets the password "{password}{n}".
+    """
+    rng = random.Random(seed)
+    pools = fake_pools(seed=seed)
+    oldest = date(1940, 1, 1)
+
+    with password_hasher(workers if unique_passwords else 1) as hash_passwords:
+        shared_hash = None if unique_passwords else hash_passwords([password])[0]
+        for offset in range(start, start + count, batch_size):
+            numbers = range(offset, min(offset + batch_size, start + count))
+            if unique_passwords:
+                hashes = hash_passwords([f"{password}{n}" for n in numbers])
+            else:
+                hashes = [shared_hash] * len(numbers)
+            names = rng.choices(pools["name"], k=len(numbers))
+            yield [
+                dict(
+                    email=f"bulkuser.{n}@example.com",
+                    name=name,
+                    dob=oldest + timedelta(days=rng.randrange(25000)),
+                    avatar_url=f"https://placem.at/people?w=200&txt=0&random={n}",
+                    _password=password_hash,
+                )
+                for n, name, password_hash in zip(numbers, names, hashes)
+            ]
+
+
+def copy_rows(table: str, columns: tuple, rows: List[dict]) -> None:
+    """Insert rows with COPY, in the session's transaction (psycopg2 only)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            ["" if row[c] is None else row[c] for c in columns]  # empty = NULL
+        )
+    buffer.seek(0)
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{table}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def can_copy() -> bool:
+    return db.engine.dialect.driver == "psycopg2"
+
+
+def bulk_seed_users(
+    count: int,
+    password: str,
+    batch_size: Optional[int] = None,
+    unique_passwords: bool = False,
+    workers: Optional[int] = None,
+    start: int = 0,
+    progress: Callable[[str], None] = print,
+) -> float:
+    """Insert count fake users, committing after each batch. Returns rows per second."""
+    batch_size = get_batch_size(batch_size)
+    use_copy = can_copy()
+    table = NormalUser.__table__.name
+    started = time.perf_counter()
+    done = 0
+    batches = fake_user_rows(
+        count,
+        batch_size=batch_size,
+        password=password,
+        unique_passwords=unique_passwords,
+        workers=workers,
+        start=start,
+    )
+    for rows in batches:
+        if use_copy:
+            copy_rows(table, USER_COLUMNS, rows)
+        else:
+            # executemany, one BatchExecuteStatement per DB_BATCH_SIZE rows on the Data API
+            bulk_insert(NormalUser, rows)
+        db.session.commit()
+        done += len(rows)
+        elapsed = time.perf_counter() - started
+        progress(f"{done}/{count} users, {done / elapsed:.0f} rows/s")
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    progress(
+        f"Inserted {count} users in {elapsed:.1f}s ({rate:.0f} rows/s) "
+        f"using {'COPY' if use_copy else 'executemany'}"
+    )
+    return rate
@@ -0,0 +1,153 @@
+"""Schema snapshots.
+
+Building a database by running every migration gets slower as migrations pile up.
+After migrating an empty database, `init_schema` saves it with `pg_dump` in `SCHEMA_SNAPSHOT_DIR`,
+named by the Alembic head revision and a hash of the migration files. Later databases are
+created by loading the snapshot instead, taking the same time however many migrations there are.
+The snapshot includes the `alembic_version` table, so the database can be migrated further as usual.
+
+A new snapshot is made whenever the migrations change. Without `pg_dump` (or with the Data API)
+databases are migrated every time.
+
+`verify_schema` lists the differences between a database and the models, to check that
+the migrations (and so snapshots) match them.
+
+Used by `flask init-db` and the test database setup.
+"""
+import hashlib
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+import sqlalchemy as sa
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parents[2] / "migrations"
+
+
+def migrations_hash() -> str:
+    """Hash the migration files, to tell when they change."""
+    digest = hashlib.sha256()
+    for path in sorted(
+        [MIGRATIONS_DIR / "env.py", *MIGRATIONS_DIR.glob("versions/*.py")]
+    ):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def migrations_key() -> str:
+    """Identify the current migrations: head revision and a hash of the files."""
+    heads = "_".join(sorted(ScriptDirectory(str(MIGRATIONS_DIR)).get_heads()))
+    return f"{heads}-{migrations_hash()}"
+
+
+def snapshot_path(snapshot_dir: str) -> Path:
+    """Get where the snapshot of the current migrations is kept."""
+    return Path(snapshot_dir) / f"schema-{migrations_key()}.sql"
+
+
+def migrate(url: str) -> None:
+    """Run migrations on a database."""
+    import flask_migrate
+    from flask import Flask
+
+    from TEMPLATE.db import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    flask_migrate.Migrate(app, db, directory=str(MIGRATIONS_DIR))
+    # alembic's logging config disables loggers that already exist
+    loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
+    disabled = {logger: logger.disabled for logger in loggers}
+    try:
+        with app.app_context():
+            flask_migrate.upgrade(directory=str(MIGRATIONS_DIR))
+    finally:
+        for logger, was_disabled in disabled.items():
+            logger.disabled = was_disabled
+
+
+def dump_schema(url: str, path: Path) -> None:
+    """Save a database with pg_dump."""
+    url = make_url(url)
+    env = dict(os.environ)
+    if url.password:
+        env["PGPASSWORD"] = url.password
+    args = dict(host=url.host, port=url.port, username=url.username)
+    tmp_path = path.with_suffix(".tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        [
+            "pg_dump",
+            "--no-owner",
+            "--no-privileges",
+            "--no-comments",
+            "--inserts",
+            f"--file={tmp_path}",
+            *(f"--{name}={value}" for name, value in args.items() if value),
+            url.database,
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    tmp_path.replace(path)
+
+
+def restore_schema(url: str, path: Path) -> None:
+    """Load a snapshot into an empty database."""
+    # skip psql meta-commands
+    sql = "".join(line for line in path.open() if not line.startswith("\\"))
+    # on its own connection, since the dump changes the search path
+    engine = sa.create_engine(url, poolclass=NullPool)
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+        engine.dispose()
+
+
+def init_schema(url: str, snapshot_dir: Optional[str]) -> str:
+    """Create the tables in an empty database, from a snapshot if there is one.
+
+    Returns "restored" or "migrated".
+    """
+    if not snapshot_dir or make_url(url).get_driver_name() != "psycopg2":
+        migrate(url)
+        return "migrated"
+    path = snapshot_path(snapshot_dir)
+    if path.exists():
+        restore_schema(url, path)
+        return "restored"
+    migrate(url)
+    try:
+        dump_schema(url, path)
+    except (OSError, subprocess.CalledProcessError) as ex:
+        stderr = getattr(ex, "stderr", b"") or b""
+        log.warning(f"Couldn't save schema snapshot: {ex} {stderr.decode()}")
+    return "migrated"
+
+
+def verify_schema(url: str) -> List[str]:
+    """Get differences between a database and the models."""
+    from TEMPLATE.db import db
+
+    engine = sa.create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            diffs = compare_metadata(MigrationContext.configure(conn), db.metadata)
+    finally:
+        engine.dispose()
+    return [str(diff) for diff in diffs]
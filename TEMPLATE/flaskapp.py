@@ -3,10 +3,18 @@
 from flask import Flask
 from flask.config import Config
 from TEMPLATE.config import ConfigurationValueMissingError
+from TEMPLATE.json_encoder import JSONEncoder
+from TEMPLATE.startup import StartupReport
 
 
 class App(Flask):
     config: Config
+    startup_report: StartupReport
+    json_encoder = JSONEncoder
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.startup_report = StartupReport()
 
     def get_config_value_or_raise(self, key):
         """Get a config value or raise an exception if it is not truthy."""
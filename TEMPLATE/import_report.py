@@ -0,0 +1,354 @@
+"""Import-time report and per-function packages.
+
+Every module a Lambda function imports adds to its cold start, and every package deployed with it
+to the size of its bundle. `flask import-report` finds out what each function in `serverless.yml`
+imports: it runs the handler's imports in a fresh interpreter with `python -X importtime`
+(and `LAZY_INIT`, like on Lambda), and reports the time and file size of each module.
+The imports of a handler are its module's plus those inside the handler function,
+and inside functions of the same module it calls.
+
+It then suggests `package: exclude:` patterns for each function: the project modules that other
+functions import but it doesn't. Modules aren't excluded if an import statement anywhere in the
+code the function imports refers to them, in case they are imported later, e.g. inside a function.
+To use the patterns, set `package: individually: true` in `serverless.yml`.
+
+Third-party packages are only reported, with the functions importing them. Exclude patterns
+don't apply to them: serverless-python-requirements adds requirements to each function's bundle
+after it's packaged, filtering them only with `noDeploy` and `slimPatterns`, for all functions.
+"""
+import ast
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+ROOT = Path(__file__).parents[1]
+PROJECT = __name__.split(".")[0]
+SERVERLESS_YML = ROOT / "serverless.yml"
+
+# imports a module, then prints the file of everything imported
+TRACE = """
+import importlib, json, sys
+missing = []
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError as ex:
+        missing.append(name)
+files = {{
+    name: getattr(module, "__file__", None)
+    for name, module in list(sys.modules.items())
+}}
+print(json.dumps(dict(files=files, missing=missing)))
+"""
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+@dataclass
+class ModuleStat:
+    """An imported module."""
+
+    name: str
+    self_us: int = 0  # import time, excluding the modules it imports
+    cumulative_us: int = 0
+    file: Optional[str] = None
+    size: int = 0  # bytes
+
+    @property
+    def package(self) -> str:
+        """Get the top-level package."""
+        return self.name.split(".")[0]
+
+    @property
+    def kind(self) -> str:
+        """Get where the module comes from: "project", "third-party" or "stdlib"."""
+        if self.package == PROJECT:
+            return "project"
+        if self.file and any(
+            part in ("site-packages", "dist-packages") for part in Path(self.file).parts
+        ):
+            return "third-party"
+        return "stdlib"
+
+
+@dataclass
+class FunctionReport:
+    """The imports of a Lambda function."""
+
+    function: str
+    handler: str
+    modules: Dict[str, ModuleStat] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    package_sizes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def import_ms(self) -> float:
+        """Get the total import time."""
+        return sum(module.self_us for module in self.modules.values()) / 1000
+
+    def of_kind(self, kind: str) -> List[ModuleStat]:
+        """Get the imported modules of a kind."""
+        return [module for module in self.modules.values() if module.kind == kind]
+
+    def packages(self) -> Set[str]:
+        """Get the third-party top-level packages imported."""
+        return {module.package for module in self.of_kind("third-party")}
+
+    def project_files(self) -> Set[str]:
+        """Get the project files imported, relative to the project root."""
+        return {
+            str(Path(module.file).relative_to(ROOT))
+            for module in self.of_kind("project")
+            if module.file
+        }
+
+    def slowest(self, count: int = 10) -> List[ModuleStat]:
+        """Get the modules taking the most time to import, with what they import."""
+        return sorted(
+            self.modules.values(), key=lambda module: module.cumulative_us, reverse=True
+        )[:count]
+
+    def to_dict(self) -> dict:
+        """Get the report as JSON-compatible data."""
+        return dict(
+            function=self.function,
+            handler=self.handler,
+            import_ms=round(self.import_ms, 1),
+            missing=self.missing,
+            packages={
+                name: self.package_sizes.get(name, 0)
+                for name in sorted(self.packages())
+            },
+            modules={
+                name: dict(
+                    self_us=module.self_us,
+                    cumulative_us=module.cumulative_us,
+                    size=module.size,
+                    kind=module.kind,
+                )
+                for name, module in sorted(self.modules.items())
+            },
+        )
+
+
+def serverless_functions(path: Path = SERVERLESS_YML) -> Dict[str, str]:
+    """Get the handler of each function in serverless.yml."""
+    # not parsed as YAML, which would need CloudFormation's tags
+    functions: Dict[str, str] = {}
+    function = None
+    in_functions = False
+    for line in path.read_text().splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not line.startswith(" "):
+            in_functions = line.rstrip() == "functions:"
+            continue
+        if not in_functions:
+            continue
+        match = re.match(r"^  (\w+):", line)
+        if match:
+            function = match.group(1)
+            continue
+        match = re.match(r"^\s+handler:\s*(\S+)", line)
+        if match and function:
+            functions[function] = match.group(1)
+    return functions
+
+
+def _absolute(module: str, node: ast.ImportFrom) -> str:
+    if not node.level:
+        return node.module or ""
+    base = module.split(".")[: -node.level]
+    return ".".join(base + ([node.module] if node.module else []))
+
+
+def imported_names(tree: ast.AST, module: str) -> Set[str]:
+    """Get the modules named by the import statements in a syntax tree."""
+    names: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = _absolute(module, node)
+            names.add(base)
+            # `from package import module`
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+    return names
+
+
+def handler_imports(handler: str) -> List[str]:
+    """Get the modules a handler imports: its module's and its own, in the order it imports them."""
+    module, function = handler.rsplit(".", 1)
+    path = ROOT / Path(*module.split("."))
+    path = path / "__init__.py" if path.is_dir() else path.with_suffix(".py")
+    functions = {
+        node.name: node
+        for node in ast.parse(path.read_text()).body
+        if isinstance(node, ast.FunctionDef)
+    }
+    imports = [module]
+    seen = set()
+
+    def visit(name):
+        if name in seen or name not in functions:
+            return
+        seen.add(name)
+        for node in ast.walk(functions[name]):
+            if isinstance(node, ast.Import):
+                imports.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                imports.append(_absolute(module, node))
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                visit(node.func.id)
+
+    visit(function)
+    return list(dict.fromkeys(imports))
+
+
+def parse_import_time(stderr: str) -> Dict[str, ModuleStat]:
+    """Parse the output of `python -X importtime`."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules[name] = ModuleStat(name, int(self_us), int(cumulative_us))
+    return modules
+
+
+def trace_imports(modules: List[str], env: Optional[dict] = None) -> tuple:
+    """Import modules in a new interpreter. Returns (stats by module name, modules not found)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TRACE.format(modules=modules)],
+        env={**os.environ, "LAZY_INIT": "1", **(env or {})},
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    traced = json.loads(result.stdout.strip().splitlines()[-1])
+    stats = parse_import_time(result.stderr)
+    for name, file in traced["files"].items():
+        stat = stats.setdefault(name, ModuleStat(name))
+        stat.file = file
+        if file and os.path.exists(file):
+            stat.size = os.path.getsize(file)
+    return stats, traced["missing"]
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def package_size(module: ModuleStat) -> int:
+    """Get the size on disk of the top-level package of a module."""
+    if not module.file:
+        return 0
+    path = Path(module.file)
+    for _ in module.name.split(".")[1:]:
+        path = path.parent
+    if path.name == "__init__.py":
+        path = path.parent
+    return _tree_size(path)
+
+
+def report_function(
+    function: str, handler: str, env: Optional[dict] = None
+) -> FunctionReport:
+    """Trace the imports of a Lambda function."""
+    modules, missing = trace_imports(handler_imports(handler), env)
+    report = FunctionReport(function, handler, modules, missing)
+    for module in report.of_kind("third-party"):
+        if module.package not in report.package_sizes and module.name == module.package:
+            report.package_sizes[module.package] = package_size(module)
+    return report
+
+
+def referenced(report: FunctionReport) -> Set[str]:
+    """Get the modules named by any import statement in the project modules a function imports."""
+    names: Set[str] = set()
+    for module in report.of_kind("project"):
+        if module.file and module.file.endswith(".py"):
+            tree = ast.parse(Path(module.file).read_text())
+            names |= imported_names(tree, module.name)
+    return names
+
+
+def package_patterns(reports: List[FunctionReport]) -> Dict[str, List[str]]:
+    """Get `package: exclude:` patterns for each function.
+
+    Excludes project modules other functions import and a function doesn't, or might later.
+    """
+    all_files: Set[str] = set(
+        itertools.chain.from_iterable(report.project_files() for report in reports)
+    )
+    patterns = {}
+    for report in reports:
+        names = referenced(report)
+        exclude = []
+        for file in sorted(all_files - report.project_files()):
+            module = str(Path(file).with_suffix("")).replace(os.sep, ".")
+            if module.endswith(".__init__"):
+                module = module[: -len(".__init__")]
+            if module not in names:
+                exclude.append(file)
+        patterns[report.function] = exclude
+    return patterns
+
+
+def patterns_yaml(patterns: Dict[str, List[str]]) -> str:
+    """Format exclude patterns as serverless.yml function settings."""
+    lines = ["package:", "  individually: true", "", "functions:"]
+    for function, exclude in patterns.items():
+        lines += [f"  {function}:", "    package:"]
+        lines.append("      exclude:" if exclude else "      exclude: []")
+        lines += [f"        - {pattern}" for pattern in exclude]
+    return "\n".join(lines)
+
+
+def format_report(
+    reports: List[FunctionReport], patterns: Dict[str, List[str]], top: int = 10
+) -> str:
+    """Describe the imports of each function."""
+    importers: Dict[str, List[str]] = {}
+    for report in reports:
+        for package in report.packages():
+            importers.setdefault(package, []).append(report.function)
+    sizes: Dict[str, int] = {}
+    for report in reports:
+        sizes.update(report.package_sizes)
+
+    lines = []
+    for report in reports:
+        kinds = {
+            kind: len(report.of_kind(kind))
+            for kind in ("project", "third-party", "stdlib")
+        }
+        lines.append(
+            f"{report.function} ({report.handler}): {report.import_ms:.0f}ms, "
+            + ", ".join(f"{count} {kind}" for kind, count in kinds.items())
+            + " modules"
+        )
+        if report.missing:
+            lines.append(f"  not installed: {', '.join(report.missing)}")
+        for module in report.slowest(top):
+            lines.append(
+                f"  {module.cumulative_us / 1000:7.1f}ms {module.self_us / 1000:7.1f}ms "
+                f"{module.size / 1024:7.1f}K  {module.name}"
+            )
+    lines += ["", "Third-party packages (size: functions importing them):"]
+    for package in sorted(importers, key=lambda name: -sizes.get(name, 0)):
+        lines.append(
+            f"  {sizes.get(package, 0) / 1024:8.0f}K {package}: "
+            + ", ".join(importers[package])
+        )
+    lines += ["", patterns_yaml(patterns)]
+    return "\n".join(lines)
@@ -0,0 +1,60 @@
+"""JSON encoding for responses.
+
+Uses `orjson` when installed (`pip install TEMPLATE[fast-json]`), falling back to Flask's encoder
+for anything orjson would write differently, so responses are the same either way.
+The one exception is NaN/Infinity, which orjson writes as `null`.
+"""
+import re
+from types import ModuleType
+from typing import Optional
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# orjson formats floats with exponents differently:
+# 1e-07 -> 1e-7, 1e-05 -> 0.00001, 1e+20 -> 1e20
+_EXPONENT = re.compile(rb"\de(\d|-\d(?!\d))")
+
+
+def _same_as_json(encoded: bytes, ensure_ascii: bool) -> bool:
+    """Check that orjson wrote the same as the json module would."""
+    if b"0.0000" in encoded:
+        return False
+    if b"e" in encoded and _EXPONENT.search(encoded):
+        return False
+    if ensure_ascii:
+        # json escapes DEL and everything above it
+        return encoded.isascii() and b"\x7f" not in encoded
+    return True
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask's JSON encoder, accelerated with orjson for compact output."""
+
+    def encode(self, o) -> str:
+        """Encode o as a JSON string."""
+        if (
+            orjson is None
+            or self.indent is not None
+            or self.item_separator != ","
+            or self.key_separator != ":"
+            or self.skipkeys
+        ):
+            return super().encode(o)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            encoded = orjson.dumps(o, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            # unsupported types, non-str keys, big ints, ...
+            return super().encode(o)
+        if not _same_as_json(encoded, self.ensure_ascii):
+            return super().encode(o)
+        return encoded.decode()
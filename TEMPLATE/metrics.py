@@ -0,0 +1,20 @@
+"""Runtime metrics, exposed via the monitoring API.
+
+Extensions register a function returning a dict of their current statistics:
+    register_metrics(app, "user_cache", cache.stats)
+"""
+from typing import Callable, Dict, Optional
+
+from flask import Flask, current_app
+
+Collector = Callable[[], dict]
+
+
+def register_metrics(app: Flask, name: str, collector: Collector) -> None:
+    app.extensions.setdefault("metrics", {})[name] = collector
+
+
+def collect_metrics(app: Optional[Flask] = None) -> Dict[str, dict]:
+    app = app or current_app
+    collectors: Dict[str, Collector] = app.extensions.get("metrics", {})
+    return {name: collector() for name, collector in collectors.items()}
@@ -1,11 +1,18 @@
+import logging
 from enum import Enum, unique
 from sqlalchemy.types import Text, Enum as SQLAEnum
-from sqlalchemy import Column
+from sqlalchemy import bindparam, Column, Index, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm.attributes import set_committed_value
 from jetkit.db.extid import ExtID
 from jetkit.model.user import CoreUser
 from typing import Any, Mapping
 
 from TEMPLATE.db import db
+from TEMPLATE.passwords import get_password_hasher
+
+log = logging.getLogger(__name__)
 
 
 @unique
@@ -19,6 +26,64 @@ class User(db.Model, CoreUser, ExtID["User"]):
     )
     avatar_url = db.Column(Text())
     __mapper_args__: Mapping[str, Any] = {"polymorphic_on": _user_type}
+    # for keyset pagination by creation date
+    __table_args__ = (Index("ix_user_created_at_id", "created_at", "id"),)
+    # see TEMPLATE.db.hot
+    __hot_queries__ = {
+        "by_email": lambda query: query.filter(User.email == bindparam("email")),
+    }
+
+    @hybrid_property
+    def password(self):
+        """Hashed password."""
+        return self._password
+
+    @password.setter  # type: ignore
+    def password(self, plaintext):
+        self._password = get_password_hasher().hash(plaintext)
+
+    def is_correct_password(self, plaintext) -> bool:
+        """Check a password, upgrading the stored hash if the hash method has changed."""
+        hasher = get_password_hasher()
+        if not self._password or not hasher.verify(self._password, plaintext):
+            return False
+        if hasher.needs_rehash(self._password):
+            self.rehash_password(plaintext)
+        return True
+
+    def rehash_password(self, plaintext) -> None:
+        """Store the password hashed with the current method.
+
+        Updated in a savepoint on the session's connection, without flushing, committing or
+        rolling back anything else in the session. It's saved when the session commits.
+        Skipped if the row is locked elsewhere or the password changed meanwhile; it's done next time.
+        """
+        if self.id is None:
+            return
+        table = User.__table__
+        old_hash = self._password
+        new_hash = get_password_hasher().hash(plaintext)
+        row = (
+            select([table.c.id])
+            .where(table.c.id == self.id)
+            .where(table.c._password == old_hash)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            # the connection's savepoint rather than the session's, which would flush
+            conn = db.session.connection(mapper=User.__mapper__)
+            with conn.begin_nested():
+                updated = conn.execute(
+                    table.update().where(table.c.id.in_(row)).values(_password=new_hash)
+                ).rowcount
+        except SQLAlchemyError:
+            # logging in works without the upgrade; try again next time
+            log.exception(f"Failed to rehash password for user {self.id}")
+            return
+        if updated:
+            # as loaded, so the session doesn't write it again
+            set_committed_value(self, "_password", new_hash)
+            get_password_hasher().record_rehash()
 
 
 User.add_create_uuid_extension_trigger()
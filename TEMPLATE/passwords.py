@@ -0,0 +1,172 @@
+"""Password hashing.
+
+Hashes are computed with werkzeug using `PASSWORD_HASH_METHOD`, e.g. "pbkdf2:sha256:150000".
+The iteration count sets how long each hash takes; pick one for your hardware with
+`flask calibrate-password-hash --target-ms 100`.
+
+When the method changes, stored hashes are upgraded the next time each user logs in.
+
+Hashing runs in an executor (`PASSWORD_HASH_EXECUTOR`):
+    "thread": a thread pool. PBKDF2 releases the GIL, so other requests keep being served.
+    "process": a process pool, for hash methods that hold the GIL.
+    "inline": on the calling thread, e.g. for Lambda where there is only one request at a time.
+"""
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from flask import current_app, has_app_context
+from werkzeug.security import (
+    check_password_hash,
+    DEFAULT_PBKDF2_ITERATIONS,
+    generate_password_hash,
+)
+
+from TEMPLATE.config import ConfigurationInvalidError
+from TEMPLATE.metrics import register_metrics
+
+EXECUTORS = ("inline", "thread", "process")
+DEFAULT_METHOD = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"
+
+
+def normalize_method(method: str) -> str:
+    """Spell out the default iteration count, the way werkzeug stores it in hashes."""
+    if method.startswith("pbkdf2:") and method.count(":") == 1:
+        return f"{method}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+def hash_method(pwhash: str) -> str:
+    """Get the method a hash was made with."""
+    return pwhash.split("$", 1)[0]
+
+
+class PasswordHasher:
+    """Hash and verify passwords in an executor, keeping timing statistics."""
+
+    def __init__(
+        self,
+        method: str = DEFAULT_METHOD,
+        executor: str = "inline",
+        workers: Optional[int] = None,
+    ):
+        if executor not in EXECUTORS:
+            raise ConfigurationInvalidError(
+                f"PASSWORD_HASH_EXECUTOR must be one of {', '.join(EXECUTORS)}."
+            )
+        self.method = normalize_method(method)
+        self.executor_type = executor
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._stats = dict(hash=0, hash_ms=0.0, verify=0, verify_ms=0.0, rehash=0)
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        """Executor to run hashing in, created on first use."""
+        if self.executor_type == "inline":
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    executor_class = (
+                        ProcessPoolExecutor
+                        if self.executor_type == "process"
+                        else ThreadPoolExecutor
+                    )
+                    self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    def _run(self, stat: str, func: Callable, *args, **kwargs):
+        # stat is "hash" or "verify"
+        start = time.perf_counter()
+        executor = self.executor
+        if executor is None:
+            result = func(*args, **kwargs)
+        else:
+            result = executor.submit(func, *args, **kwargs).result()
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats[stat] += 1
+            self._stats[f"{stat}_ms"] += elapsed
+        return result
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method."""
+        return self._run("hash", generate_password_hash, password, method=self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Check a password against a hash."""
+        return self._run("verify", check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Check if a hash was made with a different method than the configured one."""
+        return hash_method(pwhash) != self.method
+
+    def record_rehash(self) -> None:
+        """Count a stored hash upgraded to the configured method."""
+        with self._lock:
+            self._stats["rehash"] += 1
+
+    def stats(self) -> dict:
+        """Get hash counts and average durations."""
+        with self._lock:
+            stats = dict(self._stats)
+        return dict(
+            method=self.method,
+            executor=self.executor_type,
+            hashes=stats["hash"],
+            hash_avg_ms=_average(stats["hash_ms"], stats["hash"]),
+            verifies=stats["verify"],
+            verify_avg_ms=_average(stats["verify_ms"], stats["verify"]),
+            rehashes=stats["rehash"],
+        )
+
+    def shutdown(self) -> None:
+        """Stop the executor's workers."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _average(total_ms: float, count: int) -> Optional[float]:
+    return round(total_ms / count, 2) if count else None
+
+
+# used outside of an app, e.g. by factories in scripts
+_default_hasher = PasswordHasher()
+
+
+def init_password_hasher(app) -> PasswordHasher:
+    """Set up password hashing as configured."""
+    hasher = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        executor=app.config["PASSWORD_HASH_EXECUTOR"],
+        workers=app.config.get("PASSWORD_HASH_WORKERS"),
+    )
+    app.extensions["password_hasher"] = hasher
+    register_metrics(app, "password_hashing", hasher.stats)
+    return hasher
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the current app's hasher, or a default one outside of an app."""
+    if has_app_context():
+        hasher = current_app.extensions.get("password_hasher")
+        if hasher:
+            return hasher
+    return _default_hasher
+
+
+def calibrate(target_ms: float, algorithm: str = "sha256", sample: int = 20000) -> str:
+    """Find the PBKDF2 method whose hashes take about target_ms on this machine."""
+    # time a few hashes at a known iteration count and scale linearly
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        generate_password_hash("calibration", method=f"pbkdf2:{algorithm}:{sample}")
+        timings.append((time.perf_counter() - start) * 1000)
+    ms_per_iteration = min(timings) / sample
+    iterations = max(1000, int(target_ms / ms_per_iteration) // 1000 * 1000)
+    return f"pbkdf2:{algorithm}:{iterations}"
@@ -1,25 +1,240 @@
-"""Access AWS Secrets Manager."""
+"""Access AWS Secrets Manager.
+
+Secret values are cached in memory for `SECRETS_CACHE_TTL` seconds and refreshed in the background
+when they get close to expiring, so warm invocations never wait on Secrets Manager.
+Optionally the cache is also written, encrypted, to disk (`SECRETS_DISK_CACHE`).
+"""
 import boto3
 import base64
 import json
 import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+from TEMPLATE.config import ConfigurationInvalidError, ConfigurationValueMissingError
+from TEMPLATE.tracing import span
 
 log = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def get_client():
+    """Get a Secrets Manager client shared by the whole process."""
+    return boto3.client(service_name="secretsmanager")
+
+
+def parse_secret(secret_value: dict) -> Any:
+    """Decode a GetSecretValue response or BatchGetSecretValue entry."""
+    if "SecretString" in secret_value:
+        return json.loads(secret_value["SecretString"])
+    else:
+        return base64.b64decode(secret_value["SecretBinary"])
+
+
+class DiskCache:
+    """Encrypted file holding raw secret values and when they were fetched.
+
+    Requires `cryptography`; `key` is a Fernet key.
+    """
+
+    def __init__(self, path: str, key: str):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            raise ConfigurationInvalidError(
+                "SECRETS_DISK_CACHE requires the 'cryptography' package."
+            )
+        self.path = path
+        self.fernet = Fernet(key)
+
+    def load(self) -> Dict[str, dict]:
+        """Read entries, or nothing if the file is missing or unreadable."""
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.path, "rb") as fh:
+                entries = json.loads(self.fernet.decrypt(fh.read()))
+        except FileNotFoundError:
+            return {}
+        except (InvalidToken, ValueError):
+            log.warning(f"Ignoring invalid secrets cache file {self.path}")
+            return {}
+        for entry in entries.values():
+            if "SecretBinary" in entry:
+                entry["SecretBinary"] = base64.b64decode(entry["SecretBinary"])
+        return entries
+
+    def save(self, entries: Dict[str, dict]) -> None:
+        """Write entries, readable only by us."""
+        serializable = {}
+        for name, entry in entries.items():
+            entry = dict(entry)
+            if "SecretBinary" in entry:
+                entry["SecretBinary"] = base64.b64encode(entry["SecretBinary"]).decode()
+            serializable[name] = entry
+        tmp_path = f"{self.path}.{os.getpid()}"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(self.fernet.encrypt(json.dumps(serializable).encode()))
+        os.replace(tmp_path, self.path)
+
+
+class SecretCache:
+    """Process-wide cache of Secrets Manager values.
+
+    Entries are dicts with `SecretString` or `SecretBinary` plus `fetched_at` (epoch seconds).
+    Values older than `ttl` are fetched again before being returned.
+    Values within `refresh_ahead` seconds of expiring are returned immediately and refreshed in a background thread.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        ttl: float = 300,
+        refresh_ahead: float = 60,
+        disk_cache: Optional[DiskCache] = None,
+    ):
+        self._client = client
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.disk_cache = disk_cache
+        self._entries: Dict[str, dict] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._disk_loaded = False
+
+    @property
+    def client(self):
+        """Client to use, by default the shared one."""
+        return self._client or get_client()
+
+    def get(self, secret_name: str) -> Any:
+        """Get a secret value, fetching it if needed."""
+        return self.get_many([secret_name])[secret_name]
+
+    def get_many(self, secret_names: Iterable[str]) -> Dict[str, Any]:
+        """Get several secret values, fetching all missing ones in a single request."""
+        secret_names = list(secret_names)
+        self._load_disk_cache()
+
+        now = time.time()
+        missing = []
+        for name in secret_names:
+            entry = self._entries.get(name)
+            if not entry or now - entry["fetched_at"] >= self.ttl:
+                missing.append(name)
+            elif now - entry["fetched_at"] >= self.ttl - self.refresh_ahead:
+                self._refresh_in_background(name)
+        if missing:
+            self._store(self._fetch(missing))
+
+        return {name: parse_secret(self._entries[name]) for name in secret_names}
+
+    def clear(self) -> None:
+        """Forget all cached values."""
+        with self._lock:
+            self._entries.clear()
+
+    def _fetch(self, secret_names: list) -> Dict[str, dict]:
+        """Fetch secret values from Secrets Manager."""
+        with span("secrets.fetch", secrets=len(secret_names)):
+            return self._fetch_many(secret_names)
+
+    def _fetch_many(self, secret_names: list) -> Dict[str, dict]:
+        client = self.client
+        if len(secret_names) == 1 or not hasattr(client, "batch_get_secret_value"):
+            return {name: self._fetch_one(name) for name in secret_names}
+
+        log.debug(f"Fetching {len(secret_names)} secrets")
+        fetched_at = time.time()
+        response = client.batch_get_secret_value(SecretIdList=secret_names)
+        fetched = {}
+        for value in response.get("SecretValues", []):
+            # secrets may be requested by name or ARN
+            for name in secret_names:
+                if name in (value.get("Name"), value.get("ARN")):
+                    fetched[name] = self._make_entry(value, fetched_at)
+        # fetch anything that failed individually so errors are raised like before
+        for name in secret_names:
+            if name not in fetched:
+                fetched[name] = self._fetch_one(name)
+        return fetched
+
+    def _fetch_one(self, secret_name: str) -> dict:
+        fetched_at = time.time()
+        response = self.client.get_secret_value(SecretId=secret_name)
+        return self._make_entry(response, fetched_at)
+
+    @staticmethod
+    def _make_entry(secret_value: dict, fetched_at: float) -> dict:
+        entry = {
+            k: secret_value[k]
+            for k in ("SecretString", "SecretBinary")
+            if k in secret_value
+        }
+        entry["fetched_at"] = fetched_at
+        return entry
+
+    def _store(self, entries: Dict[str, dict]) -> None:
+        with self._lock:
+            self._entries.update(entries)
+            if self.disk_cache:
+                self.disk_cache.save(self._entries)
+
+    def _load_disk_cache(self) -> None:
+        if self._disk_loaded or not self.disk_cache:
+            return
+        self._disk_loaded = True
+        entries = self.disk_cache.load()
+        with self._lock:
+            for name, entry in entries.items():
+                self._entries.setdefault(name, entry)
+
+    def _refresh_in_background(self, secret_name: str) -> None:
+        with self._lock:
+            if secret_name in self._refreshing:
+                return
+            self._refreshing.add(secret_name)
+
+        def refresh():
+            try:
+                self._store({secret_name: self._fetch_one(secret_name)})
+            except Exception:
+                log.exception(f"Failed to refresh secret '{secret_name}'")
+            finally:
+                self._refreshing.discard(secret_name)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+secret_cache = SecretCache()
+
+
+def configure_secret_cache(config) -> None:
+    """Apply cache settings from app config."""
+    secret_cache.ttl = config.get("SECRETS_CACHE_TTL", secret_cache.ttl)
+    secret_cache.refresh_ahead = config.get(
+        "SECRETS_REFRESH_AHEAD", secret_cache.refresh_ahead
+    )
+    disk_path = config.get("SECRETS_DISK_CACHE")
+    if disk_path and not secret_cache.disk_cache:
+        key = config.get("SECRETS_DISK_CACHE_KEY")
+        if not key:
+            raise ConfigurationValueMissingError("SECRETS_DISK_CACHE_KEY")
+        secret_cache.disk_cache = DiskCache(path=disk_path, key=key)
+
+
 def get_secret(secret_name):
     """Fetch secret via boto3."""
-    client = boto3.client(service_name="secretsmanager")
-    get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+    return secret_cache.get(secret_name)
 
-    if "SecretString" in get_secret_value_response:
-        secret = get_secret_value_response["SecretString"]
-        return json.loads(secret)
-    else:
-        decoded_binary_secret = base64.b64decode(
-            get_secret_value_response["SecretBinary"]
-        )
-        return decoded_binary_secret
+
+def get_secrets(secret_names: Iterable[str]) -> Dict[str, Any]:
+    """Fetch several secrets in one round trip."""
+    return secret_cache.get_many(secret_names)
 
 
 def update_app_config(app, secret_name: str):
@@ -0,0 +1,60 @@
+"""Cold start timing."""
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from TEMPLATE.tracing import span
+
+
+class StartupReport:
+    """Record how long each phase of app initialization takes.
+
+    Usage:
+        report = StartupReport()
+        with report.phase("configure"):
+            configure(app)
+        report.finish()
+        print(report)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.phases: Dict[str, float] = {}  # phase name -> milliseconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of initialization code."""
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def finish(self) -> None:
+        """Mark initialization as complete."""
+        self.finished = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        """Milliseconds from start until finish (or now, if not finished)."""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def as_dict(self) -> dict:
+        """Get timings in milliseconds."""
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "phases": {name: round(ms, 2) for name, ms in self.phases.items()},
+        }
+
+    def to_json(self) -> str:
+        """Single line suitable for CloudWatch log metric filters."""
+        return json.dumps(dict(cold_start=self.as_dict()))
+
+    def __str__(self):
+        phases = ", ".join(f"{name}={ms:.1f}ms" for name, ms in self.phases.items())
+        return f"Cold start {self.total_ms:.1f}ms ({phases})"
@@ -0,0 +1,136 @@
+"""Benchmarks for startup and the request path.
+
+Skipped unless the `BENCHMARK` environment variable is set:
+
+    BENCHMARK=1 pytest TEMPLATE/test/benchmark
+    BENCHMARK=1 BENCHMARK_BASELINE=benchmark-results.json BENCHMARK_SAVE=new.json pytest TEMPLATE/test/benchmark
+
+Results are saved as JSON to `BENCHMARK_SAVE` (default benchmark-results.json).
+When `BENCHMARK_BASELINE` is given, a benchmark fails if its median time is more than
+`BENCHMARK_THRESHOLD` (default 0.25 = 25%) slower than the baseline median.
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pytest
+
+HERE = Path(__file__).parent
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("BENCHMARK"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with BENCHMARK=1")
+    for item in items:
+        if HERE in Path(str(item.fspath)).parents:
+            item.add_marker(skip)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    index = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(timings_ms: List[float], items_per_call: int = 1) -> dict:
+    """Get statistics for a list of timings in milliseconds."""
+    ordered = sorted(timings_ms)
+    mean = statistics.mean(ordered)
+    return dict(
+        rounds=len(ordered),
+        mean_ms=round(mean, 4),
+        min_ms=round(ordered[0], 4),
+        max_ms=round(ordered[-1], 4),
+        p50_ms=round(percentile(ordered, 50), 4),
+        p99_ms=round(percentile(ordered, 99), 4),
+        ops_per_sec=round(1000 * items_per_call / mean, 1) if mean else None,
+    )
+
+
+class Benchmarks:
+    """Collect benchmark results for a test session and check them against a baseline."""
+
+    def __init__(self, baseline: Optional[dict], threshold: float):
+        self.results: Dict[str, dict] = {}
+        self.baseline = (baseline or {}).get("results", {})
+        self.threshold = threshold
+
+    def run(
+        self,
+        name: str,
+        func: Callable[[], object],
+        rounds: int = 100,
+        warmup: int = 5,
+        items_per_call: int = 1,
+    ) -> dict:
+        """Time func, record and check the result."""
+        for _ in range(warmup):
+            func()
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return self.record(name, timings, items_per_call=items_per_call)
+
+    def record(
+        self, name: str, timings_ms: List[float], items_per_call: int = 1
+    ) -> dict:
+        """Record timings measured elsewhere, failing if slower than the baseline."""
+        result = summarize(timings_ms, items_per_call=items_per_call)
+        self.results[name] = result
+
+        previous = self.baseline.get(name)
+        if previous:
+            limit = previous["p50_ms"] * (1 + self.threshold)
+            if result["p50_ms"] > limit:
+                pytest.fail(
+                    f"{name} regressed: median {result['p50_ms']}ms, "
+                    f"baseline {previous['p50_ms']}ms (limit {limit:.4f}ms)"
+                )
+        return result
+
+    def save(self, path: str) -> None:
+        """Write results as JSON."""
+        data = dict(
+            created_at=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            results=self.results,
+        )
+        Path(path).write_text(json.dumps(data, indent=2, sort_keys=True))
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    benchmarks = getattr(config, "_benchmarks", None)
+    if not benchmarks or not benchmarks.results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, result in benchmarks.results.items():
+        terminalreporter.write_line(
+            f"{name}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms"
+        )
+
+
+@pytest.fixture(scope="session")
+def benchmarks(request):
+    baseline = None
+    baseline_path = os.getenv("BENCHMARK_BASELINE")
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+
+    threshold = float(os.getenv("BENCHMARK_THRESHOLD", 0.25))
+    benchmarks = Benchmarks(baseline=baseline, threshold=threshold)
+    # reported in the terminal summary
+    request.config._benchmarks = benchmarks
+    yield benchmarks
+    if benchmarks.results:
+        benchmarks.save(os.getenv("BENCHMARK_SAVE", "benchmark-results.json"))
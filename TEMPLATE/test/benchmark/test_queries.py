@@ -0,0 +1,50 @@
+from sqlalchemy import bindparam, Column, create_engine, Integer, Text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from TEMPLATE.db import BaseQuery
+
+Base = declarative_base()
+
+
+class Account(Base):
+    __tablename__ = "account"
+    id = Column(Integer, primary_key=True)
+    email = Column(Text, unique=True)
+
+    __hot_queries__ = {
+        "by_email": lambda query: query.filter(Account.email == bindparam("email")),
+    }
+
+
+def test_hot_queries(benchmarks):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, query_cls=BaseQuery)()
+    session.add_all(Account(id=i, email=f"user{i}@example.com") for i in range(100))
+    session.commit()
+
+    def query(run):
+        def lookup():
+            run()
+            session.expunge_all()  # skip the identity map, like a new request
+
+        return lookup
+
+    email = "user42@example.com"
+    benchmarks.run(
+        "query.get", query(lambda: session.query(Account).get(42)), rounds=1000
+    )
+    benchmarks.run(
+        "query.get.hot", query(lambda: session.query(Account).hot_get(42)), rounds=1000
+    )
+    benchmarks.run(
+        "query.filter_by",
+        query(lambda: session.query(Account).filter_by(email=email).one()),
+        rounds=1000,
+    )
+    benchmarks.run(
+        "query.filter_by.hot",
+        query(lambda: session.query(Account).hot("by_email", email=email).one()),
+        rounds=1000,
+    )
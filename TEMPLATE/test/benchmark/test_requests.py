@@ -0,0 +1,46 @@
+from TEMPLATE.db.fixtures import DEFAULT_PASSWORD
+
+
+def test_auth(benchmarks, client_unauthenticated, user, db_session):
+    client = client_unauthenticated
+    tokens = {}
+
+    def login():
+        response = client.post(
+            "/api/auth/login", json=dict(email=user.email, password=DEFAULT_PASSWORD)
+        )
+        assert response.status_code == 200
+        tokens.update(response.json)
+
+    # password hashing is deliberately slow
+    benchmarks.run("auth.login", login, rounds=20, warmup=2)
+
+    refresh_header = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+
+    def refresh():
+        response = client.post("/api/auth/refresh", headers=refresh_header)
+        assert response.status_code == 200
+
+    benchmarks.run("auth.refresh", refresh)
+
+    access_header = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    def check():
+        response = client.get("/api/auth/check", headers=access_header)
+        assert response.status_code == 200
+
+    benchmarks.run("auth.check", check, rounds=200)
+
+
+def test_monitoring(benchmarks, client_unauthenticated, db_session):
+    client = client_unauthenticated
+
+    def get(path):
+        def request():
+            assert client.get(path).status_code == 200
+
+        return request
+
+    benchmarks.run("monitoring", get("/api/monitoring"), rounds=200)
+    benchmarks.run("monitoring.live", get("/api/monitoring/live"), rounds=200)
+    benchmarks.run("monitoring.ready", get("/api/monitoring/ready"), rounds=200)
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import jsonify
+from marshmallow import fields as f, Schema
+
+from TEMPLATE.api.auth.schema import UserSchema
+from TEMPLATE.flaskapp import App
+
+ROWS = 1000
+
+
+class PlainUserSchema(Schema):
+    extid = f.Str(dump_only=True)
+    name = f.Str()
+
+
+@pytest.fixture(scope="module")
+def users():
+    return [
+        SimpleNamespace(extid=f"{i:032x}", name=f"User {i}", email=f"{i}@example.com")
+        for i in range(ROWS)
+    ]
+
+
+@pytest.mark.parametrize("schema_class", [PlainUserSchema, UserSchema])
+def test_dump(benchmarks, users, schema_class):
+    schema = schema_class(many=True)
+    benchmarks.run(
+        f"serialize.dump.{schema_class.__name__}",
+        lambda: schema.dump(users),
+        items_per_call=ROWS,
+    )
+
+
+def test_jsonify(benchmarks, users):
+    app = App(__name__)
+    dumped = UserSchema(many=True).dump(users)
+    with app.app_context():
+        benchmarks.run(
+            "serialize.jsonify", lambda: jsonify(dumped), items_per_call=ROWS
+        )
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from TEMPLATE.test.conftest import DB_CONN
+
+ROUNDS = 5
+
+# run in a fresh interpreter so nothing is already imported
+COLD_START = """
+import json, time
+start = time.perf_counter()
+from TEMPLATE.create_app import create_app
+imported = time.perf_counter()
+app = create_app(test_config=dict(TESTING=True, SQLALCHEMY_DATABASE_URI={db_url!r}))
+created = time.perf_counter()
+print(json.dumps(dict(import_ms=(imported - start) * 1000, create_app_ms=(created - imported) * 1000)))
+"""
+
+
+def cold_start(**env) -> dict:
+    script = COLD_START.format(db_url=DB_CONN)
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, **env},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+def test_cold_start(benchmarks, lazy):
+    env = dict(LAZY_INIT="1") if lazy else dict(LAZY_INIT="")
+    runs = [cold_start(**env) for _ in range(ROUNDS)]
+    mode = "lazy" if lazy else "eager"
+    benchmarks.record(f"import.{mode}", [run["import_ms"] for run in runs])
+    benchmarks.record(f"create_app.{mode}", [run["create_app_ms"] for run in runs])
+    benchmarks.record(
+        f"cold_start.{mode}", [run["import_ms"] + run["create_app_ms"] for run in runs]
+    )
@@ -0,0 +1,50 @@
+from flask import Flask
+from flask_jwt_extended import create_access_token, jwt_required, JWTManager
+from flask_jwt_extended.utils import decode_token
+
+from TEMPLATE.token_cache import init_token_cache
+
+
+def make_app(cache_enabled: bool) -> Flask:
+    app = Flask(__name__)
+    app.config.update(
+        JWT_SECRET_KEY="benchmark",
+        JWT_TOKEN_CACHE_ENABLED=cache_enabled,
+        JWT_TOKEN_CACHE_SIZE=1024,
+        JWT_TOKEN_CACHE_TTL=None,
+    )
+    JWTManager(app)
+    init_token_cache(app)
+
+    @app.route("/protected")
+    @jwt_required
+    def protected():
+        return "ok"
+
+    return app
+
+
+def test_decode(benchmarks):
+    app = make_app(cache_enabled=True)
+    token_cache = app.extensions["token_cache"]
+    with app.test_request_context():
+        token = create_access_token(identity=1)
+        benchmarks.run("jwt.decode", lambda: decode_token(token), rounds=2000)
+        benchmarks.run(
+            "jwt.decode.cached", lambda: token_cache.decode(token), rounds=2000
+        )
+
+
+def test_protected_request(benchmarks):
+    for cache_enabled in (False, True):
+        app = make_app(cache_enabled)
+        with app.app_context():
+            token = create_access_token(identity=1)
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+
+        def request():
+            assert client.get("/protected", headers=headers).status_code == 200
+
+        name = "jwt.request.cached" if cache_enabled else "jwt.request"
+        benchmarks.run(name, request, rounds=500)
@@ -0,0 +1,56 @@
+from flask import Flask, jsonify
+from sqlalchemy import create_engine
+
+from TEMPLATE.api.serialization import CompiledSchema
+from TEMPLATE.tracing import init_tracing, SpanExporter, trace_engine, tracer
+from marshmallow import fields as f
+
+
+class NullExporter(SpanExporter):
+    def export(self, spans):
+        """Drop the spans."""
+
+
+class ItemSchema(CompiledSchema):
+    id = f.Int()
+    name = f.Str()
+
+
+def make_app(rate=None) -> Flask:
+    app = Flask(__name__)
+    app.config.update(
+        TRACING=rate is not None,
+        TRACE_SAMPLE_RATE=rate,
+        TRACE_EXPORTER_CLASS=f"{__name__}.NullExporter",
+        TRACE_BATCH_SIZE=100,
+    )
+    init_tracing(app)
+    engine = create_engine("sqlite://")
+    if rate is not None:
+        trace_engine(engine)
+    schema = ItemSchema(many=True)
+    items = [dict(id=i, name=f"item {i}") for i in range(20)]
+
+    @app.route("/items")
+    def get_items():
+        engine.execute("SELECT 1").scalar()
+        return jsonify(schema.dump(items))
+
+    return app
+
+
+def test_tracing_overhead(benchmarks):
+    try:
+        for name, rate in (
+            ("tracing.off", None),
+            ("tracing.sampled_1pct", 0.01),
+            ("tracing.sampled_all", 1.0),
+        ):
+            client = make_app(rate).test_client()
+
+            def request():
+                assert client.get("/items").status_code == 200
+
+            benchmarks.run(name, request, rounds=2000, warmup=50)
+    finally:
+        tracer.configure(dict(TRACING=False))
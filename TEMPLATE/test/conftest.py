@@ -1,12 +1,19 @@
 import os
+from contextlib import contextmanager
+from typing import Optional
+
 import sqlalchemy as sa
 from faker import Faker
 import pytest
 
 from TEMPLATE.api import init_views
+from TEMPLATE.config import Config
 from TEMPLATE.create_app import create_app
+from TEMPLATE.db import db
 from flask_jwt_extended import create_access_token
 from TEMPLATE.db.fixtures import NormalUserFactory
+from TEMPLATE.db.instrumentation import count_queries
+from TEMPLATE.db.snapshot import init_schema, migrations_hash
 from pytest_factoryboy import register
 from pytest_postgresql.factories import DatabaseJanitor
 
@@ -22,37 +29,141 @@ DB_OPTS = sa.engine.url.make_url(DB_CONN).translate_connect_args()
 DB_VERSION = "11.5"
 
 
+def database_url(name: str) -> str:
+    """Get the URL of another database on the test server."""
+    url = sa.engine.url.make_url(DB_CONN)
+    url.database = name
+    return str(url)
+
+
+def ensure_template(janitor: DatabaseJanitor) -> str:
+    """Get a migrated template database, creating it if needed.
+
+    Templates are named by the hash of the migrations, so they are built once per
+    schema change and shared by test workers and runs.
+    They're loaded from a schema snapshot if there is one (see `TEMPLATE.db.snapshot`).
+    """
+    version = migrations_hash()
+    template = f"{DB_OPTS['database']}_template_{version}"
+    with janitor.cursor() as cur:
+        # one worker builds it while the others wait
+        cur.execute("SELECT pg_advisory_lock(%s)", (int(version, 16),))
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (template,))
+        if cur.fetchone() is None:
+            # build under another name so an interrupted build isn't used
+            building = f"{template}_building"
+            cur.execute(f'DROP DATABASE IF EXISTS "{building}"')
+            cur.execute(f'CREATE DATABASE "{building}"')
+            init_schema(database_url(building), Config.SCHEMA_SNAPSHOT_DIR)
+            cur.execute(f'ALTER DATABASE "{building}" RENAME TO "{template}"')
+        cur.execute("SELECT pg_advisory_unlock(%s)", (int(version, 16),))
+    return template
+
+
+class TemplateJanitor(DatabaseJanitor):
+    """Create the database as a copy of a template database."""
+
+    def __init__(self, *args, template: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.template = template
+
+    def init(self) -> None:
+        """Create the database from the template."""
+        with self.cursor() as cur:
+            cur.execute(f'CREATE DATABASE "{self.db_name}" TEMPLATE "{self.template}"')
+
+
+def janitor(db_name: str, template: Optional[str] = None) -> DatabaseJanitor:
+    """Get a janitor for a database on the test server, copied from template if given."""
+    args = (
+        DB_OPTS.get("username"),
+        DB_OPTS.get("host"),
+        DB_OPTS.get("port"),
+        db_name,
+        DB_VERSION,
+        DB_OPTS.get("password"),
+    )
+    if template:
+        return TemplateJanitor(*args, template=template)
+    return DatabaseJanitor(*args)
+
+
+@contextmanager
+def database_copy(db_name: str, template: str):
+    """Create a database from a template, and drop it when done."""
+    # left over from an interrupted run
+    janitor(db_name).drop()
+    with janitor(db_name, template):
+        yield database_url(db_name)
+
+
+@pytest.fixture(scope="session")
+def database_name(worker_id):
+    """Get the name of the test database.
+
+    Each pytest-xdist worker (`pytest -n auto`) gets its own database.
+    """
+    if worker_id == "master":
+        return DB_OPTS["database"]
+    return f"{DB_OPTS['database']}_{worker_id}"
+
+
 @pytest.fixture(scope="session")
-def database(request):
+def template_database(database_name):
+    """Get the template database built from migrations."""
+    return ensure_template(janitor(database_name))
+
+
+@pytest.fixture(scope="session")
+def database(database_name, template_database):
     """Create a Postgres database for the tests, and drop it when the tests are done."""
-    host = DB_OPTS.get("host")
-    port = DB_OPTS.get("port")
-    user = DB_OPTS.get("username")
-    db_name = DB_OPTS["database"]
+    with database_copy(database_name, template_database) as url:
+        yield url
 
-    with DatabaseJanitor(user, host, port, db_name, DB_VERSION):
-        yield
+
+def make_app(database_url: str):
+    """Create an app for tests using a database."""
+    # override config for test app here
+    return create_app(
+        test_config=dict(
+            SQLALCHEMY_DATABASE_URI=database_url,
+            TESTING=True,
+            QUERY_BUDGET_ACTION="raise",
+            # fast hashing for test users
+            PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+        )
+    )
 
 
 @pytest.fixture(scope="session")
 def app(database):
     """Create a Flask app context for tests."""
-    # override config for test app here
-    app = create_app(test_config=dict(SQLALCHEMY_DATABASE_URI=DB_CONN, TESTING=True))
+    app = make_app(database)
     init_views()
 
     with app.app_context():
         yield app
 
 
+@pytest.fixture
+def scratch_app(app, database_name, template_database):
+    """Create an app with a throwaway database, for tests dropping tables.
+
+    The database is copied from the template, so other tests on the worker keep their tables.
+    """
+    with database_copy(f"{database_name}_scratch", template_database) as url:
+        scratch = make_app(url)
+        # the session is per thread, not per app: start a new one bound to this app
+        db.session.remove()
+        with scratch.app_context():
+            yield scratch
+            db.get_engine(scratch).dispose()
+
+
 @pytest.fixture(scope="session")
 def _db(app):
     """Provide the transactional fixtures with access to the database via a Flask-SQLAlchemy database connection."""
-    from TEMPLATE.db import db
-
-    # create all tables for test DB
-    db.create_all()
-
+    # tables were created by migrations in the template database
     return db
 
 
@@ -74,6 +185,23 @@ def client(app, user):
     return client
 
 
+@pytest.fixture
+def max_queries():
+    """Fail if a block makes more than n queries.
+
+    with max_queries(2):
+        client.get("/api/things")
+    """
+
+    @contextmanager
+    def check(n: int):
+        with count_queries() as stats:
+            yield stats
+        assert stats.count <= n, f"{stats.count} queries made, expected at most {n}"
+
+    return check
+
+
 @pytest.fixture(scope="session")
 def faker():
     return Faker(LOCALE)
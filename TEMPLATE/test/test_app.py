@@ -1,4 +1,6 @@
-from TEMPLATE.create_app import create_app
+import pytest
+
+from TEMPLATE.create_app import create_app, profile_components
 from TEMPLATE.config import check_valid
 
 
@@ -10,3 +12,46 @@ def test_config():
 
 def test_db(db_session):
     assert db_session.execute("SELECT 1").scalar() == 1, "test DB query failed"
+
+
+def test_startup_report():
+    app = create_app(test_config=dict(TESTING=True))
+    phases = app.startup_report.as_dict()["phases"]
+    for phase in ("configure", "configure_database", "api.init_app", "init_auth"):
+        assert phase in phases
+    assert app.startup_report.total_ms >= sum(phases.values())
+
+
+def test_lazy_init():
+    app = create_app(test_config=dict(TESTING=True, LAZY_INIT=True))
+    assert "migrate" not in app.extensions, "migrations should not be set up"
+    assert "init_cli" not in app.startup_report.phases
+
+
+def test_profiles():
+    assert profile_components(("db-only", "passwords")) == {"database", "passwords"}
+    with pytest.raises(ValueError):
+        profile_components("nope")
+
+    app = create_app(test_config=dict(TESTING=True), profile="migrate")
+    assert "migrate" in app.extensions
+    assert "password_hasher" not in app.extensions
+    assert "flask-jwt-extended" not in app.extensions
+    assert "api.init_app" not in app.startup_report.phases
+    assert "configure_database" in app.startup_report.phases
+
+
+def test_warm_up():
+    from TEMPLATE.warmup import is_warmup_event, warm_up
+
+    assert is_warmup_event({"source": "aws.events"})
+    assert is_warmup_event({"warmup": True})
+    assert not is_warmup_event({"httpMethod": "GET", "path": "/"})
+
+    app = create_app(test_config=dict(TESTING=True, WARMUP_CONNECT_DB=False))
+    result = warm_up(app)
+    assert "errors" not in result
+    phases = result["warmup"]["phases"]
+    for phase in ("configure_mappers", "compile_serializers"):
+        assert phase in phases
+    assert "connect_db" not in phases
@@ -0,0 +1,140 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+from flask import Response
+from flask_jwt_extended import create_access_token, jwt_required
+
+from TEMPLATE.api.caching import (
+    cache_response,
+    get_backend,
+    invalidate_responses,
+    RedisBackend,
+)
+from TEMPLATE.create_app import create_app
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        """Get value."""
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        """Set value, ignoring expiry."""
+        self.data[key] = value
+
+    def delete(self, key):
+        """Delete value."""
+        self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        """Find keys matching a pattern, with "*", "?" and backslash escapes."""
+        regex = "".join(
+            ".*" if token == "*" else "." if token == "?" else re.escape(token[-1])
+            for token in re.findall(r"\\.|.", match, re.S)
+        )
+        return [k for k in list(self.data) if re.fullmatch(regex, k, re.S)]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache_app(request):
+    app = create_app(test_config=dict(TESTING=True))
+    if request.param == "redis":
+        app.extensions["response_cache"] = RedisBackend(app.config, client=FakeRedis())
+    app.calls = 0
+
+    # skip looking up users in the DB
+    jwt = app.extensions["flask-jwt-extended"]
+    jwt.user_loader_callback_loader(lambda identity: SimpleNamespace(id=identity))
+
+    @app.route("/public")
+    @cache_response(public=True)
+    def public_view():
+        app.calls += 1
+        return {"calls": app.calls}
+
+    @app.route("/binary")
+    @cache_response(public=True)
+    def binary_view():
+        app.calls += 1
+        return Response(b"\xff\x00" * app.calls, mimetype="application/octet-stream")
+
+    @app.route("/private")
+    @cache_response()
+    def private_view():
+        app.calls += 1
+        return {"calls": app.calls}
+
+    return app
+
+
+def auth_header(app, user_id):
+    with app.app_context():
+        token = create_access_token(identity=SimpleNamespace(id=user_id))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_public_cache(cache_app):
+    client = cache_app.test_client()
+    first = client.get("/public")
+    assert first.json == {"calls": 1}
+    assert first.headers["ETag"]
+
+    second = client.get("/public")
+    assert second.json == {"calls": 1}
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["Content-Type"] == "application/json"
+
+    not_modified = client.get(
+        "/public", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+
+    with cache_app.app_context():
+        invalidate_responses("/public")
+    assert client.get("/public").json == {"calls": 2}
+
+
+def test_binary_body(cache_app):
+    client = cache_app.test_client()
+    assert client.get("/binary").data == b"\xff\x00"
+    response = client.get("/binary")
+    assert response.data == b"\xff\x00"
+    assert response.headers["Content-Type"] == "application/octet-stream"
+
+
+def test_public_needs_no_jwt():
+    with pytest.raises(ValueError):
+
+        @cache_response(public=True)
+        @jwt_required
+        def view():
+            pass
+
+
+def test_private_cache(cache_app):
+    client = cache_app.test_client()
+    alice, bob = auth_header(cache_app, 1), auth_header(cache_app, 2)
+    assert client.get("/private", headers=alice).json == {"calls": 1}
+    assert client.get("/private", headers=bob).json == {"calls": 2}
+    response = client.get("/private", headers=alice)
+    assert response.json == {"calls": 1}
+    assert "private" in response.headers["Cache-Control"]
+
+
+def test_invalidate_path_segments(cache_app):
+    paths = ["/api/user?", "/api/user?page=2", "/api/user/1?", "/api/users?", "/api/u?"]
+    with cache_app.app_context():
+        backend = get_backend()
+        for path in paths:
+            backend.set(f"response:{path}:public", dict(body=b"", etag=path), ttl=60)
+        invalidate_responses("/api/user")
+        assert [path for path in paths if backend.get(f"response:{path}:public")] == [
+            "/api/users?",
+            "/api/u?",
+        ]
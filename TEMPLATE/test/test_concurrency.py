@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask, g, jsonify
+from sqlalchemy import create_engine
+
+from TEMPLATE.concurrency import async_view, concurrently, run_in_thread
+from TEMPLATE.db.instrumentation import count_queries, instrument_engine
+from TEMPLATE.db.pool import pool_options
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(CONCURRENCY_WORKERS=4)
+    return app
+
+
+def together(barrier: threading.Barrier, value):
+    """Return value once all parties of barrier are running, so only if run concurrently."""
+    barrier.wait(timeout=5)
+    return value
+
+
+def test_concurrently(app):
+    with app.app_context():
+        g.tenant = "acme"
+        barrier = threading.Barrier(3)
+        results = concurrently(
+            lambda: together(barrier, 1),
+            lambda: together(barrier, 2),
+            lambda: together(barrier, g.tenant),
+        )
+        assert results == [1, 2, "acme"]
+
+        with pytest.raises(ZeroDivisionError):
+            concurrently(lambda: 1, lambda: 1 / 0)
+
+
+def test_queries_counted(app):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with app.app_context(), count_queries() as stats:
+        concurrently(*[lambda: engine.execute("SELECT 1").scalar()] * 3)
+    assert stats.count == 3
+
+
+def test_lambda_pool(app, tmp_path):
+    config = dict(DB_POOL_MODE="lambda", DB_POOL_RECYCLE=1800, CONCURRENCY_WORKERS=2)
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'db.sqlite'}", pool_timeout=1, **pool_options(config)
+    )
+    barrier = threading.Barrier(2)
+
+    def query(value):
+        # holds a connection until both calls have one
+        with engine.connect() as conn:
+            return together(barrier, conn.execute(sa.select([value])).scalar())
+
+    # the request holds the pooled connection meanwhile
+    with app.app_context(), engine.connect():
+        assert concurrently(lambda: query(1), lambda: query(2)) == [1, 2]
+
+
+def test_async_view(app):
+    @app.route("/fan-out")
+    @async_view
+    async def fan_out():
+        barrier = threading.Barrier(2)
+        results = await asyncio.gather(
+            run_in_thread(together, barrier, "a"), run_in_thread(together, barrier, "b")
+        )
+        return jsonify(results)
+
+    client = app.test_client()
+    assert client.get("/fan-out").json == ["a", "b"]
+    # the thread's event loop is reused
+    assert client.get("/fan-out").json == ["a", "b"]
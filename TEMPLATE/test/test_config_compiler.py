@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from TEMPLATE.config import (
+    check_valid_handler,
+    ConfigurationInvalidError,
+    STAGE_CLASSES,
+)
+from TEMPLATE.config_compiler import (
+    class_settings,
+    compile_config,
+    diff_configs,
+    load_snapshot,
+    resolve_snapshot,
+    validate_config,
+)
+from werkzeug.utils import import_string
+
+
+@pytest.mark.parametrize("class_name", STAGE_CLASSES.values())
+def test_compile_stages(class_name):
+    snapshot = json.loads(json.dumps(compile_config(class_name)))
+    config = resolve_snapshot(snapshot)
+    assert config == class_settings(import_string(class_name))
+    assert validate_config(config, snapshot["types"]) == []
+
+
+def test_env_settings():
+    snapshot = compile_config(STAGE_CLASSES["dev"])
+    assert snapshot["env"]["DB_POOL_MODE"] == ["DB_POOL_MODE", "lambda", None]
+    assert "DEV_DB_SCRIPTS_ENABLED" in snapshot["values"]
+
+    config = resolve_snapshot(snapshot, environ=dict(SECRETS_CACHE_TTL="5"))
+    assert config["SECRETS_CACHE_TTL"] == 5
+    with pytest.raises(ConfigurationInvalidError):
+        resolve_snapshot(snapshot, environ=dict(SECRETS_CACHE_TTL="soon"))
+
+
+def test_validate_config():
+    snapshot = compile_config(STAGE_CLASSES["prd"])
+    config = dict(
+        resolve_snapshot(snapshot), USER_CACHE_SIZE="big", TRACE_SAMPLE_RATE=1
+    )
+    assert validate_config(config, snapshot["types"]) == [
+        "USER_CACHE_SIZE should be int, not 'big'"
+    ]
+
+
+def test_stale_snapshot(tmp_path):
+    path = tmp_path / "config.json"
+    snapshot = compile_config(STAGE_CLASSES["prd"])
+    path.write_text(json.dumps(snapshot))
+    assert load_snapshot(str(path)) == snapshot
+    path.write_text(json.dumps(dict(snapshot, source_hash="old")))
+    assert load_snapshot(str(path)) is None
+
+
+def test_diff_and_check():
+    diff = diff_configs(
+        compile_config(STAGE_CLASSES["dev"]), compile_config(STAGE_CLASSES["prd"])
+    )
+    assert "~ DEV_DB_SCRIPTS_ENABLED: True -> False" in diff
+    assert check_valid_handler(dict(env=STAGE_CLASSES["prd"]), None) == dict(
+        ok=True, errors=[]
+    )
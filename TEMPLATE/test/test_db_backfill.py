@@ -0,0 +1,63 @@
+import sqlalchemy as sa
+
+from TEMPLATE.db.backfill import backfill_status, backfill_table, run_backfills
+
+CONFIG = dict(BACKFILL_TIME_MARGIN=0.5, BACKFILL_THROTTLE_SLEEP=0.01)
+
+
+def make_engine(rows=25):
+    engine = sa.create_engine("sqlite://")
+    backfill_table.create(engine)
+    engine.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, value TEXT, upper TEXT)")
+    engine.execute(
+        "INSERT INTO item (id, value) VALUES "
+        + ", ".join(f"({i}, 'item {i}')" for i in range(1, rows + 1))
+    )
+    engine.execute(
+        backfill_table.insert().values(
+            name="item_upper",
+            table_name="item",
+            statement="UPDATE item SET upper = upper(value) WHERE id > :start AND id <= :end",
+            batch_size=10,
+        )
+    )
+    return engine
+
+
+def test_backfill():
+    engine = make_engine()
+    (report,) = run_backfills(engine, CONFIG)
+    assert report.finished
+    assert (report.batches, report.rows) == (3, 25)
+    assert engine.execute("SELECT count(*) FROM item WHERE upper IS NULL").scalar() == 0
+    (row,) = backfill_status(engine)
+    assert row.finished_at is not None and row.rows == 25
+    assert run_backfills(engine, CONFIG) == []
+
+
+def test_backfill_resumes():
+    engine = make_engine()
+    checks = iter(range(100))
+
+    def time_left():
+        # checked before and after throttling each batch: time for one batch
+        return 1 if next(checks) < 2 else 0
+
+    (report,) = run_backfills(engine, CONFIG, time_left=time_left)
+    assert (report.finished, report.batches, report.progress) == (False, 1, 0.4)
+    (report,) = run_backfills(engine, CONFIG)
+    assert (report.finished, report.batches, report.rows) == (True, 2, 15)
+    assert engine.execute("SELECT count(*) FROM item WHERE upper IS NULL").scalar() == 0
+
+
+def test_backfill_throttled():
+    engine = make_engine()
+    config = dict(
+        CONFIG, BACKFILL_MAX_REPLICA_LAG=5, BACKFILL_REPLICA_LAG_QUERY="SELECT 10"
+    )
+    checks = iter(range(100))
+
+    (report,) = run_backfills(
+        engine, config, time_left=lambda: 1 if next(checks) < 5 else 0
+    )
+    assert report.batches == 0 and report.throttled_seconds > 0
@@ -0,0 +1,92 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+from flask import g
+
+from TEMPLATE.create_app import create_app
+from TEMPLATE.db import db
+from TEMPLATE.db.dataapi import DataAPIConnection
+from TEMPLATE.db.readonly import ReadOnlyRequestError
+from TEMPLATE.model.user import NormalUser, User
+
+CLUSTER_ARN = "arn:aws:rds:eu-west-1:123456789012:cluster:test"
+SECRET_ARN = "arn:aws:secretsmanager:eu-west-1:123456789012:secret:test"
+
+
+@pytest.fixture
+def rds_data():
+    client = boto3.client(
+        "rds-data",
+        region_name="eu-west-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def test_app():
+    app = create_app(test_config=dict(TESTING=True))
+    with app.test_request_context():
+        yield app
+
+
+def execute(client, read_only):
+    g.db_read_only = read_only
+    conn = DataAPIConnection(
+        dbname="test",
+        aurora_cluster_arn=CLUSTER_ARN,
+        secret_arn=SECRET_ARN,
+        rds_data_client=client,
+    )
+    conn.cursor().execute("SELECT 1")
+
+
+def test_data_api_read_only_skips_transaction(test_app, rds_data):
+    client, stubber = rds_data
+    stubber.add_response(
+        "execute_statement",
+        dict(records=[]),
+        dict(
+            database="test",
+            resourceArn=CLUSTER_ARN,
+            secretArn=SECRET_ARN,
+            sql="SELECT 1",
+            includeResultMetadata=True,
+        ),
+    )
+    execute(client, read_only=True)
+
+
+def test_data_api_transaction(test_app, rds_data):
+    client, stubber = rds_data
+    stubber.add_response("begin_transaction", dict(transactionId="tx"))
+    stubber.add_response(
+        "execute_statement",
+        dict(records=[]),
+        dict(
+            database="test",
+            resourceArn=CLUSTER_ARN,
+            secretArn=SECRET_ARN,
+            sql="SELECT 1",
+            includeResultMetadata=True,
+            transactionId="tx",
+        ),
+    )
+    execute(client, read_only=False)
+
+
+def test_read_only_forbids_writes(test_app):
+    g.db_read_only = True
+    db.session.add(NormalUser(email="readonly@example.com"))
+    with pytest.raises(ReadOnlyRequestError):
+        db.session.flush()
+    db.session.rollback()
+
+
+def test_create_bulk(normal_user_factory, db_session):
+    before = User.query.count()
+    assert normal_user_factory.create_bulk(25) == 25
+    assert User.query.count() == before + 25
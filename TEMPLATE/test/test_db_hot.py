@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import bindparam, Column, create_engine, Integer, Text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from TEMPLATE.db import BaseQuery
+from TEMPLATE.db.hot import hot_query_stats
+
+Base = declarative_base()
+
+
+class Gadget(Base):
+    __tablename__ = "gadget"
+    id = Column(Integer, primary_key=True)
+    name = Column(Text)
+
+    __hot_queries__ = {
+        "by_name": lambda query: query.filter(Gadget.name == bindparam("name")),
+    }
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, query_cls=BaseQuery)()
+    session.add_all(Gadget(id=i, name=f"gadget {i}") for i in range(1, 6))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_hot_query(session):
+    for i in (1, 2, 3):
+        gadget = session.query(Gadget).hot("by_name", name=f"gadget {i}").one()
+        assert gadget.id == i
+    assert session.query(Gadget).hot("by_name", name="nope").one_or_none() is None
+
+    with pytest.raises(KeyError):
+        session.query(Gadget).hot("by_color", color="red")
+
+    stats = hot_query_stats.as_dict()["Gadget.by_name"]["sqlite+pysqlite"]
+    assert stats["calls"] >= 4
+    assert stats["compile_ms"] > 0
+
+
+def test_hot_get(session):
+    session.expunge_all()
+    assert session.query(Gadget).hot_get(3).name == "gadget 3"
+    assert session.query(Gadget).hot_get(42) is None
+    # from the identity map
+    assert session.query(Gadget).hot_get(3) is session.query(Gadget).get(3)
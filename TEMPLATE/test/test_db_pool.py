@@ -0,0 +1,30 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from TEMPLATE.config import ConfigurationInvalidError
+from TEMPLATE.create_app import create_app
+from TEMPLATE.db import db
+from TEMPLATE.db.pool import configure_pool, pool_options, pool_stats
+
+
+def test_lambda_pool_mode():
+    app = create_app(test_config=dict(TESTING=True, DB_POOL_MODE="lambda"))
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert pool_stats(db.engine)["size"] == 1
+
+
+def test_invalid_pool_mode():
+    with pytest.raises(ConfigurationInvalidError):
+        pool_options(dict(DB_POOL_MODE="bogus"))
+
+
+def test_connect_retry():
+    # nothing should be listening on port 1
+    engine = sa.create_engine("postgresql://localhost:1/nope")
+    configure_pool(engine, dict(DB_CONNECT_RETRIES=2, DB_CONNECT_BACKOFF=0.001))
+    with pytest.raises(OperationalError):
+        engine.connect()
+    assert pool_stats(engine)["connect_retries"] == 2
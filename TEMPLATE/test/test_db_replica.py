@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+import sqlalchemy as sa
+from flask import g
+from pytest_postgresql.factories import DatabaseJanitor
+
+from TEMPLATE.concurrency import in_context
+from TEMPLATE.create_app import create_app
+from TEMPLATE.db import db
+from TEMPLATE.db.replica import _reads_allowed, use_reader
+from TEMPLATE.model.user import NormalUser, User
+from TEMPLATE.test.conftest import (
+    database_url,
+    DB_OPTS,
+    DB_VERSION,
+    ensure_template,
+    TemplateJanitor,
+)
+
+marker = sa.table("marker", sa.column("name"))
+
+
+@pytest.fixture
+def sqlite_app(tmp_path):
+    writer, reader = (
+        f"sqlite:///{tmp_path}/writer.db",
+        f"sqlite:///{tmp_path}/reader.db",
+    )
+    for url, name in ((writer, "writer"), (reader, "reader")):
+        engine = sa.create_engine(url)
+        engine.execute("CREATE TABLE marker (name TEXT)")
+        engine.execute(marker.insert().values(name=name))
+    app = create_app(
+        test_config=dict(
+            TESTING=True,
+            SQLALCHEMY_DATABASE_URI=writer,
+            SQLALCHEMY_READER_DATABASE_URI=reader,
+        )
+    )
+    with app.test_request_context():
+        yield app
+        db.session.remove()
+
+
+def read_marker():
+    return db.session.execute(sa.select([marker.c.name])).scalar()
+
+
+def test_routing(sqlite_app):
+    assert read_marker() == "writer"
+    with use_reader():
+        assert read_marker() == "reader"
+    assert read_marker() == "writer"
+
+    g.db_read_only = True
+    assert read_marker() == "reader"
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [sa.select([marker.c.name]).with_for_update(), "SELECT name FROM marker"],
+    ids=["for_update", "text"],
+)
+def test_routing_to_writer(sqlite_app, statement):
+    with use_reader():
+        # locking reads and textual SQL use the writer, and might write
+        assert db.session.execute(statement).scalar() == "writer"
+        assert read_marker() == "writer"
+
+
+def test_reads_own_writes(sqlite_app):
+    with use_reader():
+        db.session.execute(marker.insert().values(name="written"))
+        assert read_marker() == "writer"
+        db.session.commit()
+        assert read_marker() == "writer"
+
+
+def test_reads_own_textual_writes(sqlite_app):
+    with use_reader():
+        db.session.execute(sa.text("INSERT INTO marker (name) VALUES ('written')"))
+        db.session.commit()
+        assert g.db_wrote
+        assert read_marker() == "writer"
+
+
+def test_use_reader_per_thread(sqlite_app):
+    # threads sharing g don't share use_reader()
+    seen = []
+    inside, done = threading.Event(), threading.Event()
+
+    def read_in_other_thread():
+        inside.wait()
+        seen.append(_reads_allowed())
+        done.set()
+
+    thread = threading.Thread(target=in_context(read_in_other_thread))
+    thread.start()
+    with use_reader():
+        assert _reads_allowed()
+        inside.set()
+        done.wait()
+    thread.join()
+    assert seen == [False]
+
+
+@pytest.fixture
+def reader_database(database):
+    """Create a second database to use as a (never up to date) read replica."""
+    host = DB_OPTS.get("host")
+    port = DB_OPTS.get("port")
+    user = DB_OPTS.get("username")
+    password = DB_OPTS.get("password")
+    db_name = f"{sa.engine.url.make_url(database).database}_reader"
+    template = ensure_template(
+        DatabaseJanitor(user, host, port, db_name, DB_VERSION, password)
+    )
+    with TemplateJanitor(
+        user, host, port, db_name, DB_VERSION, password, template=template
+    ):
+        yield database_url(db_name)
+
+
+def test_postgres_replica(database, reader_database):
+    app = create_app(
+        test_config=dict(
+            TESTING=True,
+            SQLALCHEMY_DATABASE_URI=database,
+            SQLALCHEMY_READER_DATABASE_URI=reader_database,
+            PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+        )
+    )
+    email = "replica@example.com"
+    try:
+        with app.test_request_context():
+            db.session.add(NormalUser(email=email, password="pw"))
+            db.session.commit()
+        with app.test_request_context():
+            g.db_read_only = True
+            # not replicated
+            assert User.query.filter_by(email=email).one_or_none() is None
+        with app.test_request_context():
+            with use_reader():
+                user = User.query.filter_by(email=email).one_or_none()
+                assert user is None
+                db.session.add(NormalUser(email="replica2@example.com", password="pw"))
+                db.session.commit()
+                assert User.query.filter_by(email=email).one().email == email
+    finally:
+        with app.app_context():
+            User.query.filter(User.email.like("replica%")).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+            db.session.remove()
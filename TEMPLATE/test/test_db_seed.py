@@ -1,18 +1,40 @@
 from TEMPLATE.commands import drop_all_tables
-import flask_migrate
-from TEMPLATE.db.fixtures import seed_db
+from TEMPLATE.db.fixtures import DEFAULT_PASSWORD, seed_db
 from TEMPLATE.db import db
+from TEMPLATE.db.seed import bulk_seed_users, fake_user_rows
+from TEMPLATE.db.snapshot import init_schema, verify_schema
+from TEMPLATE.model.user import User
 
 
-def test_db_init_seed(app):
+def test_db_init_seed(scratch_app):
     """Try initializing and seeding development database."""
-    drop_all_tables(app=app)
-    db.create_all(app=app)
+    drop_all_tables(app=scratch_app)
+    db.create_all(app=scratch_app)
     seed_db()
-    drop_all_tables(app=app)
+    drop_all_tables(app=scratch_app)
 
 
-def test_db_migrate_seed():
-    """Run migrations and seed."""
-    flask_migrate.upgrade()
+def test_db_migrate_seed(scratch_app):
+    """Build the schema from migrations (or their snapshot), check it and seed."""
+    url = scratch_app.config["SQLALCHEMY_DATABASE_URI"]
+    drop_all_tables(app=scratch_app)
+    init_schema(url, scratch_app.config["SCHEMA_SNAPSHOT_DIR"])
+    assert verify_schema(url) == []
     seed_db()
+
+
+def test_fake_user_rows():
+    batches = list(fake_user_rows(25, batch_size=10, password="pw", seed=1))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    emails = {row["email"] for batch in batches for row in batch}
+    assert len(emails) == 25
+
+
+def test_bulk_seed(app, db_session):
+    before = User.query.count()
+    bulk_seed_users(
+        50, password=DEFAULT_PASSWORD, batch_size=20, progress=lambda _: None
+    )
+    assert User.query.count() == before + 50
+    user = User.query.filter_by(email="bulkuser.7@example.com").one()
+    assert user.is_correct_password(DEFAULT_PASSWORD)
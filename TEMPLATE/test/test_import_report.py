@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from TEMPLATE.import_report import (
+    FunctionReport,
+    handler_imports,
+    ModuleStat,
+    package_patterns,
+    parse_import_time,
+    patterns_yaml,
+    ROOT,
+    serverless_functions,
+    trace_imports,
+)
+
+IMPORT_TIME = """import time: self [us] | cumulative | imported package
+import time:        75 |         75 |   _io
+import time:       120 |        195 | io
+import time:       900 |       1300 |     faker.providers
+import time:       400 |       1700 |   faker
+"""
+
+
+def test_serverless_functions():
+    functions = serverless_functions()
+    assert functions["app"] == "TEMPLATE.commands.app_handler"
+    assert functions["migrate"] == "TEMPLATE.commands.migrate_handler"
+
+
+def test_handler_imports():
+    # includes imports of warmup_handler, which app_handler calls
+    assert handler_imports("TEMPLATE.commands.app_handler") == [
+        "TEMPLATE.commands",
+        "TEMPLATE.warmup",
+        "wsgi_handler",
+        "TEMPLATE.app",
+    ]
+
+
+def test_parse_import_time():
+    modules = parse_import_time(IMPORT_TIME)
+    assert modules["faker"].self_us == 400
+    assert modules["faker"].cumulative_us == 1700
+    assert list(modules) == ["_io", "io", "faker.providers", "faker"]
+
+
+def test_trace_imports():
+    modules, missing = trace_imports(["TEMPLATE.passwords", "not_a_module"])
+    assert missing == ["not_a_module"]
+    assert modules["TEMPLATE.passwords"].kind == "project"
+    assert modules["TEMPLATE.passwords"].size > 0
+    assert modules["json"].kind == "stdlib"
+
+
+def report(function, *modules):
+    return FunctionReport(
+        function,
+        f"handler.{function}",
+        {
+            name: ModuleStat(name, file=file)
+            for name, file in [
+                ("TEMPLATE", str(ROOT / "TEMPLATE/__init__.py")),
+                *modules,
+            ]
+        },
+    )
+
+
+def test_package_patterns():
+    site = "/venv/lib/python3.8/site-packages"
+    app = report("app", ("flask", f"{site}/flask/__init__.py"))
+    seed = report(
+        "seed",
+        ("flask", f"{site}/flask/__init__.py"),
+        ("faker", f"{site}/faker/__init__.py"),
+        ("TEMPLATE.db.bulk", str(ROOT / "TEMPLATE/db/bulk.py")),
+    )
+    patterns = package_patterns([app, seed])
+    # third-party packages are added to bundles regardless of excludes
+    assert patterns["app"] == [str(Path("TEMPLATE/db/bulk.py"))]
+    assert patterns["seed"] == []
+    assert "      exclude: []" in patterns_yaml(patterns)
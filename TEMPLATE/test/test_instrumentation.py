@@ -0,0 +1,74 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from TEMPLATE.db.instrumentation import (
+    count_queries,
+    init_query_stats,
+    instrument_engine,
+    query_budget,
+    QueryBudgetExceeded,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    return engine
+
+
+def test_count_queries(engine):
+    with count_queries(keep_slowest=2) as outer:
+        engine.execute("SELECT 1")
+        with count_queries() as inner:
+            engine.execute("SELECT 2")
+            engine.execute("SELECT 3")
+        with pytest.raises(OperationalError):
+            engine.execute("SELECT nope")
+    engine.execute("SELECT 4")
+
+    assert inner.count == 2
+    assert outer.count == 3
+    assert len(outer.slowest) == 2
+    assert outer.total_ms >= sum(ms for ms, _ in outer.slowest)
+
+
+@pytest.fixture
+def app(engine):
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        QUERY_STATS_ENABLED=True,
+        QUERY_SERVER_TIMING=True,
+        QUERY_SLOW_MS=500,
+        QUERY_SLOWEST_COUNT=3,
+        QUERY_BUDGET_ACTION="raise",
+    )
+    init_query_stats(app)
+
+    @app.route("/queries/<int:n>")
+    @query_budget(3)
+    def queries(n):
+        for i in range(n):
+            engine.execute(f"SELECT {i}")
+        return "ok"
+
+    return app
+
+
+def test_request_query_stats(app, caplog):
+    client = app.test_client()
+    res = client.get("/queries/2")
+    assert res.headers["Server-Timing"].endswith('desc="2 queries"')
+
+    app.config["QUERY_LOG"] = True
+    with caplog.at_level("INFO"):
+        client.get("/queries/1")
+    assert '"queries": 1' in caplog.text
+
+
+def test_query_budget(app):
+    with pytest.raises(QueryBudgetExceeded):
+        app.test_client().get("/queries/4")
@@ -0,0 +1,20 @@
+from TEMPLATE.api.monitor import db_probe
+
+
+def test_liveness(client_unauthenticated):
+    response = client_unauthenticated.get("/api/monitoring/live")
+    assert response.status_code == 200
+    assert response.json["ok"]
+
+
+def test_readiness_is_cached(client_unauthenticated):
+    db_probe._checked = None
+    response = client_unauthenticated.get("/api/monitoring/ready")
+    assert response.status_code == 200
+    assert response.json["ok"]
+    assert not response.json["cached"]
+    assert response.json["latency_ms"] >= 0
+    assert "pool" in response.json
+
+    response = client_unauthenticated.get("/api/monitoring/ready")
+    assert response.json["cached"]
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from flask.views import MethodView
+from flask_smorest import Api, Blueprint
+from marshmallow import fields as f
+from sqlalchemy import Column, create_engine, DateTime, Integer, Text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from TEMPLATE.api.pagination import keyset_paginate
+from TEMPLATE.api.serialization import CompiledSchema
+from TEMPLATE.api.streaming import stream_json
+from TEMPLATE.db import BaseQuery
+from TEMPLATE.db.keyset import decode_cursor, encode_cursor, InvalidCursorError
+
+Base = declarative_base()
+START = datetime(2020, 1, 1)
+
+
+class Thing(Base):
+    __tablename__ = "thing"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime)
+    name = Column(Text)
+
+
+class ThingSchema(CompiledSchema):
+    id = f.Int()
+    name = f.Str()
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, query_cls=BaseQuery)()
+    # several rows share created_at, so the id is needed to order them
+    session.add_all(
+        Thing(id=i, created_at=START + timedelta(days=i // 3), name=f"thing {i}")
+        for i in range(1, 26)
+    )
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_cursor():
+    created = datetime(2020, 5, 1, 12, tzinfo=timezone.utc)
+    cursor = encode_cursor([created, 7])
+    assert decode_cursor(cursor, [Thing.created_at, Thing.id]) == [created, 7]
+
+    for bad in ("nope", encode_cursor([1]), encode_cursor(["x", "y"])):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(bad, [Thing.created_at, Thing.id])
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_page(session, descending):
+    query = session.query(Thing)
+    expected = query.order_by(Thing.id.desc() if descending else Thing.id).all()
+
+    seen, cursor = [], None
+    while True:
+        page = query.keyset_page(
+            Thing.created_at,
+            Thing.id,
+            cursor=cursor,
+            page_size=10,
+            descending=descending,
+        )
+        seen += page.items
+        cursor = page.next_cursor
+        if not cursor:
+            break
+    assert seen == expected
+    assert len(page) == 5
+
+    # defaults to primary key
+    assert [t.id for t in query.keyset_page(page_size=3)] == [1, 2, 3]
+
+
+@pytest.fixture
+def client(session):
+    app = Flask(__name__)
+    app.config.update(OPENAPI_VERSION="3.0.2", STREAM_BATCH_SIZE=4)
+    api = Api(app)
+    blp = Blueprint("Things", __name__, url_prefix="/things")
+
+    @blp.route("")
+    class Things(MethodView):
+        @blp.response(ThingSchema(many=True))
+        @keyset_paginate(Thing.created_at, Thing.id, page_size=10)
+        def get(self):
+            return session.query(Thing)
+
+    @blp.route("export")
+    class Export(MethodView):
+        @blp.response(ThingSchema(many=True))
+        def get(self):
+            return stream_json(session.query(Thing).order_by(Thing.id), ThingSchema())
+
+    api.register_blueprint(blp)
+    return app.test_client()
+
+
+def test_keyset_paginate(client):
+    res = client.get("/things?page_size=20")
+    assert [t["id"] for t in res.json] == list(range(1, 21))
+    pagination = json.loads(res.headers["X-Pagination"])
+    assert pagination["page_size"] == 20
+    assert res.headers["Link"].startswith(
+        "<http://localhost/things?page_size=20&cursor="
+    )
+
+    res = client.get(f"/things?page_size=20&cursor={pagination['next_cursor']}")
+    assert [t["id"] for t in res.json] == list(range(21, 26))
+    assert json.loads(res.headers["X-Pagination"])["next_cursor"] is None
+    assert "Link" not in res.headers
+
+    assert client.get("/things?cursor=garbage").status_code == 400
+    assert client.get("/things?page_size=1000").status_code == 422
+
+
+def test_stream_json(client, session):
+    res = client.get("/things/export")
+    assert res.status_code == 200
+    assert res.is_streamed
+    expected = ThingSchema(many=True).dump(session.query(Thing).order_by(Thing.id))
+    assert res.json == expected
@@ -0,0 +1,80 @@
+import pytest
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+from TEMPLATE.config import ConfigurationInvalidError
+from TEMPLATE.db.fixtures import DEFAULT_PASSWORD
+from TEMPLATE.model.user import User
+from TEMPLATE.passwords import (
+    calibrate,
+    get_password_hasher,
+    hash_method,
+    normalize_method,
+    PasswordHasher,
+)
+
+
+@pytest.mark.parametrize("executor", ["inline", "thread", "process"])
+def test_hash_and_verify(executor):
+    hasher = PasswordHasher("pbkdf2:sha256:1000", executor=executor, workers=2)
+    try:
+        pwhash = hasher.hash("hunter2")
+        assert pwhash.startswith("pbkdf2:sha256:1000$")
+        assert hasher.verify(pwhash, "hunter2")
+        assert not hasher.verify(pwhash, "hunter3")
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["hashes"] == 1
+    assert stats["verifies"] == 2
+    assert stats["verify_avg_ms"] > 0
+
+
+def test_needs_rehash():
+    hasher = PasswordHasher("pbkdf2:sha256:2000")
+    assert not hasher.needs_rehash(hasher.hash("pw"))
+    assert hasher.needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:1000"))
+    # werkzeug stores the default iteration count explicitly
+    assert normalize_method("pbkdf2:sha256") == "pbkdf2:sha256:150000"
+    default = PasswordHasher("pbkdf2:sha256")
+    assert not default.needs_rehash(generate_password_hash("pw"))
+
+
+def test_invalid_executor():
+    with pytest.raises(ConfigurationInvalidError):
+        PasswordHasher(executor="gpu")
+
+
+def test_calibrate():
+    method = calibrate(5, sample=2000)
+    algorithm, iterations = method.rsplit(":", 1)
+    assert algorithm == "pbkdf2:sha256"
+    assert int(iterations) >= 1000
+
+
+def test_rehash_leaves_session_alone(user, db_session):
+    hasher = get_password_hasher()
+    user._password = generate_password_hash(DEFAULT_PASSWORD, "pbkdf2:sha256:500")
+    db_session.commit()
+    rehashes = hasher.stats()["rehashes"]
+    name = user.name
+    user.name = "not saved yet"
+
+    assert user.is_correct_password(DEFAULT_PASSWORD)
+    assert hasher.stats()["rehashes"] == rehashes + 1
+    # the pending change is neither flushed nor lost
+    assert user in db_session.dirty
+    assert user.name == "not saved yet"
+    assert (
+        db_session.execute(
+            sa.select([User.__table__.c.name]).where(User.__table__.c.id == user.id)
+        ).scalar()
+        == name
+    )
+    # the upgraded hash is stored
+    stored = db_session.execute(
+        sa.select([User.__table__.c._password]).where(User.__table__.c.id == user.id)
+    ).scalar()
+    assert hash_method(stored) == hasher.method
+    assert not hasher.needs_rehash(user._password)
@@ -0,0 +1,80 @@
+import json
+import time
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from TEMPLATE.secret import DiskCache, SecretCache
+
+RDS_SECRET = {"username": "rds", "password": "pw"}
+APP_SECRET = {"JWT_SECRET_KEY": "shh"}
+
+
+@pytest.fixture
+def client():
+    return boto3.client(
+        "secretsmanager",
+        region_name="eu-west-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+
+
+@pytest.fixture
+def stub(client):
+    with Stubber(client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def secret_value(name, value):
+    return dict(
+        Name=name,
+        ARN=f"arn:aws:secretsmanager:eu-west-1:123456789012:secret:{name}",
+        SecretString=json.dumps(value),
+    )
+
+
+def test_batch_fetch_and_cache(client, stub):
+    stub.add_response(
+        "batch_get_secret_value",
+        dict(
+            SecretValues=[
+                secret_value("app", APP_SECRET),
+                secret_value("rds", RDS_SECRET),
+            ]
+        ),
+        dict(SecretIdList=["rds", "app"]),
+    )
+    cache = SecretCache(client=client)
+    assert cache.get_many(["rds", "app"]) == dict(rds=RDS_SECRET, app=APP_SECRET)
+
+    # served from memory, no more requests
+    assert cache.get("rds") == RDS_SECRET
+
+
+def test_expired_secret_is_fetched(client, stub):
+    for value in (APP_SECRET, dict(JWT_SECRET_KEY="rotated")):
+        stub.add_response(
+            "get_secret_value", secret_value("app", value), dict(SecretId="app")
+        )
+    cache = SecretCache(client=client, ttl=60)
+    assert cache.get("app") == APP_SECRET
+    cache._entries["app"]["fetched_at"] = time.time() - 61
+    assert cache.get("app") == dict(JWT_SECRET_KEY="rotated")
+
+
+def test_disk_cache(client, stub, tmp_path):
+    fernet = pytest.importorskip("cryptography.fernet")
+    disk_cache = DiskCache(
+        path=str(tmp_path / "secrets"), key=fernet.Fernet.generate_key()
+    )
+    stub.add_response(
+        "get_secret_value", secret_value("app", APP_SECRET), dict(SecretId="app")
+    )
+    SecretCache(client=client, disk_cache=disk_cache).get("app")
+    assert b"shh" not in (tmp_path / "secrets").read_bytes()
+
+    # new process, same container: no request needed
+    assert SecretCache(client=client, disk_cache=disk_cache).get("app") == APP_SECRET
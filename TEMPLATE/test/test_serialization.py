@@ -0,0 +1,139 @@
+import enum
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from marshmallow import fields as f, post_dump, Schema
+from marshmallow.utils import get_value
+from marshmallow_enum import EnumField
+
+from TEMPLATE.api.serialization import CompiledSchema
+from TEMPLATE.json_encoder import _same_as_json, JSONEncoder
+
+
+class Color(enum.Enum):
+    red = "R"
+    blue = "B"
+
+
+def tag_fields(base):
+    """Build the same schema on top of Schema or CompiledSchema."""
+
+    class TagSchema(base):
+        label = f.Str()
+        weight = f.Int(as_string=True)
+
+        @post_dump
+        def upper(self, data, **kwargs):
+            data["label"] = data["label"].upper()
+            return data
+
+    class ThingSchema(base):
+        id = f.Int(dump_only=True)
+        name = f.Str()
+        display = f.Str(attribute="name", data_key="displayName", dump_only=True)
+        score = f.Float()
+        active = f.Bool()
+        color = EnumField(Color)
+        color_value = EnumField(Color, attribute="color", by_value=True, dump_only=True)
+        created = f.DateTime()
+        missing_default = f.Str(default="dflt")
+        callable_default = f.Int(default=lambda: 7)
+        absent = f.Str()
+        owner_name = f.Str(attribute="owner.name")
+        method = f.Method("get_method")
+        tags = f.Nested(TagSchema, many=True)
+        parent = f.Nested(lambda: ThingSchema(only=("id", "name")), allow_none=True)
+        meta = f.Dict()
+
+        def get_method(self, obj):
+            return f"m{get_value(obj, 'id')}"
+
+    return ThingSchema
+
+
+def make_thing(i, parent=None):
+    return SimpleNamespace(
+        id=i,
+        name=f"thing {i}" if i % 3 else None,
+        score=i / 7 if i % 2 else i,
+        active=bool(i % 2) if i % 4 else 1,
+        color=Color.red if i % 2 else None,
+        created=datetime(2020, 1, i % 28 + 1, tzinfo=timezone.utc),
+        owner=SimpleNamespace(name=f"owner {i}"),
+        tags=[SimpleNamespace(label=f"t{n}", weight=n) for n in range(i % 3)],
+        parent=parent,
+        meta={"n": i},
+    )
+
+
+@pytest.mark.parametrize("many", [False, True])
+def test_compiled_schema_matches_marshmallow(many):
+    plain = tag_fields(Schema)(many=many)
+    compiled = tag_fields(CompiledSchema)(many=many)
+    parent = make_thing(100)
+    things = [make_thing(i, parent=parent if i % 2 else None) for i in range(20)]
+    obj = things if many else things[1]
+
+    assert compiled.dump(obj) == plain.dump(obj)
+    assert json.dumps(compiled.dump(obj)) == json.dumps(plain.dump(obj))
+
+    # dicts and objects with __getitem__ are supported too
+    as_dict = vars(things[1])
+    assert compiled.dump(as_dict, many=False) == plain.dump(as_dict, many=False)
+
+
+def test_compiled_schema_only():
+    ThingSchema = tag_fields(CompiledSchema)
+    thing = make_thing(1)
+    assert ThingSchema(only=("id", "color")).dump(thing) == {"id": 1, "color": "red"}
+    assert "id" in ThingSchema().dump(thing)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"a": 1, "b": [1.5, None, True, "x"], "c": {"z": 1, "a": 2}},
+        {"small": 1e-5},
+        {"tiny": 1.5e-7},
+        {"big": 1e20, "neg": -0.0},
+        {"big": 1e16},
+        {"huge": 1.5e300},
+        {"long": 1.2345678901234567e19},
+        {"small": 1.5e-300},
+        {"text": 'é ✓ \x7f \x1f   "quoted" \\'},
+        {"when": datetime(2020, 5, 1, 12, tzinfo=timezone.utc), "id": uuid.uuid4()},
+        {1: "non-str key"},
+        {"huge": 2**70},
+        [],
+    ],
+)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("sort_keys", [True, False])
+def test_json_encoder(value, ensure_ascii, sort_keys):
+    app = Flask(__name__)
+    app.json_encoder = JSONEncoder
+    app.config.update(JSON_AS_ASCII=ensure_ascii, JSON_SORT_KEYS=sort_keys)
+    with app.app_context():
+        fast = app.json_encoder(
+            ensure_ascii=ensure_ascii, sort_keys=sort_keys, separators=(",", ":")
+        ).encode(value)
+        slow = json.JSONEncoder.encode(
+            app.json_encoder(
+                ensure_ascii=ensure_ascii, sort_keys=sort_keys, separators=(",", ":")
+            ),
+            value,
+        )
+    assert fast == slow
+
+
+@pytest.mark.parametrize(
+    "encoded", [b'{"big":1e20}', b"[1.2345678901234567e19]", b"[1e-7]", b"[0.00001]"]
+)
+def test_json_encoder_fallback(encoded):
+    # what some orjson versions write, differently from json
+    assert not _same_as_json(encoded, ensure_ascii=True)
+    assert _same_as_json(b'{"big":1e+20,"small":1e-20}', ensure_ascii=True)
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import (
+    create_access_token,
+    get_jwt_identity,
+    get_raw_jwt,
+    jwt_required,
+    JWTManager,
+)
+
+from TEMPLATE.token_cache import init_token_cache, invalidate_tokens
+
+revoked = set()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(
+        JWT_SECRET_KEY="test",
+        JWT_TOKEN_CACHE_ENABLED=True,
+        JWT_TOKEN_CACHE_SIZE=10,
+        JWT_TOKEN_CACHE_TTL=None,
+        JWT_BLACKLIST_ENABLED=True,
+        JWT_BLACKLIST_TOKEN_CHECKS=["access"],
+    )
+    jwt = JWTManager(app)
+    init_token_cache(app)
+
+    @jwt.token_in_blacklist_loader
+    def is_revoked(token):
+        return token["jti"] in revoked
+
+    @app.route("/whoami")
+    @jwt_required
+    def whoami():
+        return jsonify(identity=get_jwt_identity(), jti=get_raw_jwt()["jti"])
+
+    return app
+
+
+def test_token_cache(app):
+    client = app.test_client()
+    token_cache = app.extensions["token_cache"]
+    with app.app_context():
+        token = create_access_token(identity=1)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for _ in range(3):
+        res = client.get("/whoami", headers=headers)
+        assert res.json["identity"] == 1
+    assert token_cache.stats()["misses"] == 1
+    assert token_cache.stats()["hits"] == 2
+
+    # bad signature
+    tampered = {"Authorization": f"Bearer {token[:-2]}xx"}
+    assert client.get("/whoami", headers=tampered).status_code == 422
+
+    # blacklist is still checked for cached tokens
+    revoked.add(res.json["jti"])
+    assert client.get("/whoami", headers=headers).status_code == 401
+    revoked.clear()
+
+    with app.app_context():
+        invalidate_tokens(1)
+    assert token_cache.stats()["size"] == 0
+
+
+def test_token_cache_ttl(app):
+    token_cache = app.extensions["token_cache"]
+    with app.app_context():
+        token_cache.max_ttl = 60
+        assert token_cache.ttl({}) == 60
+        short = create_access_token(identity=1, expires_delta=timedelta(seconds=5))
+        with app.test_request_context():
+            claims = token_cache.decode(short)
+        assert 0 < token_cache.ttl(claims) <= 5
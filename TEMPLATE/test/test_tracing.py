@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+from TEMPLATE.tracing import init_tracing, span, trace_engine, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        TRACING=True,
+        TRACE_SAMPLE_RATE=1.0,
+        TRACE_SAMPLE_RATES={"untraced": 0.0},
+        TRACE_EXPORTER_CLASS="TEMPLATE.tracing.FileExporter",
+        TRACE_EXPORT_PATH=str(tmp_path / "traces.jsonl"),
+        TRACE_BATCH_SIZE=10,
+    )
+    init_tracing(app)
+    engine = create_engine("sqlite://")
+    trace_engine(engine)
+
+    @app.route("/traced")
+    def traced():
+        with span("work", answer=42):
+            engine.execute("SELECT 1").scalar()
+        return "ok"
+
+    @app.route("/untraced")
+    def untraced():
+        return "ok"
+
+    yield app
+    tracer.configure(dict(TRACING=False))
+
+
+def exported_spans(app):
+    assert tracer.exporter.flush()
+    with open(app.config["TRACE_EXPORT_PATH"]) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_tracing(app):
+    client = app.test_client()
+    res = client.get("/traced")
+    assert res.headers["X-Trace-Id"]
+    assert "X-Trace-Id" not in client.get("/untraced").headers
+
+    # continue a sampled trace from upstream
+    traceparent = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+    res = client.get("/untraced", headers={"traceparent": traceparent})
+    assert res.headers["X-Trace-Id"] == TRACE_ID
+
+    spans = exported_spans(app)
+    request, work, query = spans[:3]
+    assert request["name"] == "request"
+    assert request["attributes"]["status"] == 200
+    assert work["parent_id"] == request["span_id"]
+    assert work["attributes"] == dict(answer=42)
+    assert query["name"] == "db.query"
+    assert query["parent_id"] == work["span_id"]
+    assert spans[3]["trace_id"] == TRACE_ID
+    assert spans[3]["parent_id"] == "00f067aa0ba902b7"
+
+
+def test_sample_rate(app):
+    tracer.rates = {"Monitoring.*": 0.0, "Auth*": 0.5}
+    tracer._endpoint_rates = {}
+    assert tracer.sample_rate("Monitoring.Ready") == 0.0
+    assert tracer.sample_rate("Authentication.login") == 0.5
+    assert tracer.sample_rate("Users.get") == 1.0
+
+
+def test_reconfigure_stops_exporter(app):
+    client = app.test_client()
+    client.get("/traced")
+    old = tracer.exporter
+    init_tracing(app)
+    assert tracer.exporter is not old
+    # the old exporter exported what it had and stopped
+    assert old._thread is not None and not old._thread.is_alive()
+    assert exported_spans(app)
@@ -0,0 +1,34 @@
+import time
+
+from TEMPLATE.cache import LRUCache
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts least recently used "b"
+    assert cache.get("b") is None
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_user_cache(app, client, user, db_session):
+    user_cache = app.extensions["user_cache"]
+    user_cache.cache.clear()
+
+    for _ in range(3):
+        assert client.get("/api/auth/check").status_code == 200
+    assert user_cache.stats()["hits"] >= 2
+
+    metrics = client.get("/api/monitoring/metrics").json["metrics"]
+    assert metrics["user_cache"]["size"] == 1
+
+    # updating the user drops it from the cache
+    user.name = "Updated"
+    db_session.commit()
+    assert user_cache.stats()["size"] == 0
@@ -0,0 +1,166 @@
+"""Cache of verified JWTs.
+
+flask_jwt_extended decodes and verifies the bearer token on every authenticated request.
+With the cache, a token that was verified before is looked up by its SHA-256 digest instead.
+Entries expire when the token does, or after `JWT_TOKEN_CACHE_TTL` seconds
+(default `JWT_ACCESS_TOKEN_EXPIRES`), whichever comes first.
+
+Only the signature and claim checks are cached: the token type and blacklist checks
+(`token_in_blacklist_loader`) still run on every request, so revoked tokens are rejected
+as usual. When tokens are revoked some other way, e.g. by rotating keys, drop them with
+`invalidate_tokens()`. Tokens of deleted users are dropped automatically.
+
+The current user is cached separately, see `user_cache`.
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Hashable, Optional, Tuple
+
+import flask_jwt_extended
+import flask_jwt_extended.view_decorators
+from flask import current_app
+from flask_jwt_extended.config import config as jwt_config
+from flask_jwt_extended.utils import decode_token, get_unverified_jwt_headers
+from sqlalchemy import event
+
+from TEMPLATE.cache import LRUCache
+from TEMPLATE.config import ConfigurationInvalidError
+from TEMPLATE.metrics import register_metrics
+from TEMPLATE.model.user import User
+
+Entry = Tuple[dict, dict]  # claims, headers
+
+
+def token_digest(encoded_token: str, csrf_value: Optional[str] = None) -> bytes:
+    """Key a token by digest, so raw credentials aren't kept in memory."""
+    digest = hashlib.sha256(encoded_token.encode())
+    if csrf_value:
+        digest.update(b"\0" + csrf_value.encode())
+    return digest.digest()
+
+
+class TokenCache:
+    """In-process cache of decoded, verified tokens."""
+
+    def __init__(self, maxsize: int, max_ttl: Optional[float]):
+        self.cache = LRUCache(maxsize=maxsize)
+        self.max_ttl = max_ttl
+        # headers are asked for right after decoding, keep them at hand
+        self._last = threading.local()
+
+    def ttl(self, claims: dict) -> Optional[float]:
+        """Get how long a token may be cached."""
+        ttl = self.max_ttl
+        if claims.get("exp") is not None:
+            remaining = claims["exp"] - time.time()
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        return ttl
+
+    def decode(self, encoded_token: str, csrf_value: Optional[str] = None) -> dict:
+        """Get the claims of a token, verifying it if not cached."""
+        key = token_digest(encoded_token, csrf_value)
+        entry: Optional[Entry] = self.cache.get(key)
+        if entry is None:
+            claims = decode_token(encoded_token, csrf_value)
+            entry = (claims, get_unverified_jwt_headers(encoded_token))
+            ttl = self.ttl(claims)
+            if ttl is None or ttl > 0:
+                self.cache.set(key, entry, ttl=ttl)
+        self._last.token, self._last.entry = encoded_token, entry
+        # copied, callers get to modify their own
+        return dict(entry[0])
+
+    def headers(self, encoded_token: str) -> dict:
+        """Get the headers of the token last decoded in this thread."""
+        if getattr(self._last, "token", None) != encoded_token:
+            return get_unverified_jwt_headers(encoded_token)
+        return dict(self._last.entry[1])
+
+    def invalidate(self, identity: Optional[Hashable] = None) -> None:
+        """Forget cached tokens of a user, or all tokens."""
+        if identity is None:
+            self.cache.clear()
+            return
+        claim = jwt_config.identity_claim_key
+        self.cache.delete_where_value(lambda entry: entry[0].get(claim) == identity)
+
+    def stats(self) -> dict:
+        """Get hit/miss statistics."""
+        return self.cache.stats()
+
+
+def get_token_cache() -> Optional[TokenCache]:
+    return current_app.extensions.get("token_cache")
+
+
+def cached_decode_token(
+    encoded_token: str, csrf_value: Optional[str] = None, allow_expired: bool = False
+) -> dict:
+    """Drop-in for flask_jwt_extended's `decode_token`, using the token cache if enabled."""
+    token_cache = get_token_cache()
+    if token_cache is None or allow_expired:
+        return decode_token(encoded_token, csrf_value, allow_expired)
+    return token_cache.decode(encoded_token, csrf_value)
+
+
+def cached_unverified_jwt_headers(encoded_token: str) -> dict:
+    """Drop-in for flask_jwt_extended's `get_unverified_jwt_headers`."""
+    token_cache = get_token_cache()
+    if token_cache is None:
+        return get_unverified_jwt_headers(encoded_token)
+    return token_cache.headers(encoded_token)
+
+
+# flask_jwt_extended 3.x has no hook for decoding tokens: its view decorators (jwt_required etc.,
+# also used by jetkit's auth views) call decode_token and get_unverified_jwt_headers from their
+# own module. Those are replaced once, here, with versions using the cache, which behave like
+# the originals in apps without one. 4.x is organized differently, hence the version check.
+PATCHED = flask_jwt_extended.__version__.startswith("3.")
+if PATCHED:
+    flask_jwt_extended.view_decorators.decode_token = cached_decode_token
+    flask_jwt_extended.view_decorators.get_unverified_jwt_headers = (
+        cached_unverified_jwt_headers
+    )
+
+
+def invalidate_tokens(identity: Optional[Hashable] = None) -> None:
+    """Force tokens of a user (or all users) to be verified again on their next use."""
+    token_cache = get_token_cache()
+    if token_cache:
+        token_cache.invalidate(identity)
+
+
+def _seconds(value: Any) -> Optional[float]:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if value is False or value is None:
+        return None
+    return float(value)
+
+
+def init_token_cache(app) -> Optional[TokenCache]:
+    if not app.config.get("JWT_TOKEN_CACHE_ENABLED"):
+        return None
+    if not PATCHED:
+        raise ConfigurationInvalidError(
+            f"JWT_TOKEN_CACHE_ENABLED needs flask-jwt-extended 3.x, "
+            f"not {flask_jwt_extended.__version__}."
+        )
+    max_ttl = app.config.get("JWT_TOKEN_CACHE_TTL")
+    if max_ttl is None:
+        max_ttl = app.config.get("JWT_ACCESS_TOKEN_EXPIRES")
+    token_cache = TokenCache(
+        maxsize=app.config["JWT_TOKEN_CACHE_SIZE"], max_ttl=_seconds(max_ttl)
+    )
+    app.extensions["token_cache"] = token_cache
+    register_metrics(app, "token_cache", token_cache.stats)
+    return token_cache
+
+
+@event.listens_for(User, "after_delete", propagate=True)
+def _invalidate_user_tokens(mapper, connection, target):
+    token_cache = current_app.extensions.get("token_cache") if current_app else None
+    if token_cache:
+        token_cache.invalidate(target.id)
@@ -0,0 +1,401 @@
+"""Sampled request tracing.
+
+A lighter alternative to X-Ray (`XRAY`): with `TRACING` on, a fraction of requests is traced,
+decided when the request starts (head-based sampling). Unsampled requests cost a thread-local
+lookup here and there.
+
+`TRACE_SAMPLE_RATE` is the fraction of requests traced; `TRACE_SAMPLE_RATES` overrides it by
+endpoint, with wildcards:
+
+    TRACE_SAMPLE_RATES = {"Monitoring.*": 0, "Authentication.login": 0.5}
+
+Requests with a W3C `traceparent` header marked as sampled are always traced, continuing the
+caller's trace. Sampled responses have an `X-Trace-Id` header.
+
+A trace has a span for the request, with spans inside it for database queries, response
+serialization, Secrets Manager fetches and anything wrapped in `span()`:
+
+    with span("geocode", address=address):
+        ...
+
+App initialization is traced too, as a "startup" trace with a span per phase.
+
+Finished traces are exported in batches from a background thread by `TRACE_EXPORTER_CLASS`:
+`StdoutExporter` (JSON lines, e.g. to CloudWatch) or `FileExporter` (to `TRACE_EXPORT_PATH`).
+On Lambda the thread is frozen between invocations, so spans may be exported on the next one.
+"""
+import atexit
+import fnmatch
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from flask import request
+from sqlalchemy import event
+from werkzeug.utils import import_string
+
+log = logging.getLogger(__name__)
+
+# statements are truncated to this length in spans
+STATEMENT_LENGTH = 200
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """A timed operation."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    def as_dict(self, trace_id: str) -> dict:
+        """Get the span for exporting."""
+        return dict(
+            name=self.name,
+            trace_id=trace_id,
+            span_id=self.span_id,
+            parent_id=self.parent_id,
+            start=self.start,
+            duration_ms=round(((self.end or self.start) - self.start) * 1000, 3),
+            attributes=self.attributes,
+        )
+
+
+class Trace:
+    """Spans of a traced request (or other unit of work)."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or _new_id(128)
+        self.spans: List[Span] = []
+        self._open: List[Span] = []
+
+    def start_span(
+        self, name: str, parent_id: Optional[str] = None, **attributes
+    ) -> Span:
+        """Start a span inside the innermost open one."""
+        if parent_id is None and self._open:
+            parent_id = self._open[-1].span_id
+        span = Span(name, parent_id, attributes)
+        self.spans.append(span)
+        self._open.append(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        """Finish a span."""
+        span.end = time.time()
+        if span in self._open:
+            self._open.remove(span)
+
+    def add_span(self, name: str, start: float, end: float, **attributes) -> None:
+        """Record an operation timed elsewhere."""
+        parent_id = self._open[-1].span_id if self._open else None
+        span = Span(name, parent_id, attributes)
+        span.start, span.end = start, end
+        self.spans.append(span)
+
+    def as_dicts(self) -> List[dict]:
+        """Get all spans for exporting."""
+        return [span.as_dict(self.trace_id) for span in self.spans]
+
+
+class _Current(threading.local):
+    def __init__(self):
+        self.trace: Optional[Trace] = None
+
+
+_current = _Current()
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace being recorded in this thread, if any."""
+    return _current.trace
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a span if the current request is being traced."""
+    trace = _current.trace
+    if trace is None:
+        yield None
+        return
+    recorded = trace.start_span(name, **attributes)
+    try:
+        yield recorded
+    finally:
+        trace.end_span(recorded)
+
+
+# exporters
+
+
+class SpanExporter(ABC):
+    """Base class for exporters.
+
+    Subclass and implement `export`, then set `TRACE_EXPORTER_CLASS` to its import path.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    @abstractmethod
+    def export(self, spans: List[dict]) -> None:
+        """Send a batch of spans somewhere."""
+        raise NotImplementedError()
+
+
+class StdoutExporter(SpanExporter):
+    """Print spans as JSON lines."""
+
+    def export(self, spans):
+        """Print spans."""
+        sys.stdout.write("".join(json.dumps(dict(span=s)) + "\n" for s in spans))
+        sys.stdout.flush()
+
+
+class FileExporter(SpanExporter):
+    """Append spans as JSON lines to `TRACE_EXPORT_PATH`."""
+
+    def export(self, spans):
+        """Write spans."""
+        with open(self.config["TRACE_EXPORT_PATH"], "a") as fh:
+            fh.writelines(json.dumps(s) + "\n" for s in spans)
+
+
+class BatchExporter:
+    """Export spans in batches from a background thread."""
+
+    def __init__(self, exporter: SpanExporter, batch_size: int = 100):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self._queue: "queue.SimpleQueue[Optional[dict]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+
+    def submit(self, spans: List[dict]) -> None:
+        """Queue spans for exporting."""
+        if self._closed:
+            return
+        self._idle.clear()
+        for exported in spans:
+            self._queue.put(exported)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="trace-exporter", daemon=True
+                    )
+                    self._thread.start()
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Wait until queued spans are exported."""
+        return self._idle.wait(timeout)
+
+    def shutdown(self, timeout: float = 5) -> None:
+        """Export queued spans and stop the thread."""
+        self._closed = True
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)  # stop after the spans queued before
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            span = self._queue.get()
+            while span is not None:
+                batch.append(span)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    span = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                stopping = True
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    log.exception(f"Failed to export {len(batch)} spans")
+            if self._queue.empty():
+                self._idle.set()
+
+
+# tracer
+
+
+class Tracer:
+    """Decides which requests to trace and exports their traces."""
+
+    def __init__(self):
+        self.enabled = False
+        self.default_rate = 0.0
+        self.rates: Dict[str, float] = {}
+        self.exporter: Optional[BatchExporter] = None
+        self._endpoint_rates: Dict[Optional[str], float] = {}
+        atexit.register(self.shutdown, 2)
+
+    def configure(self, config) -> None:
+        """Apply settings from app config."""
+        self.enabled = bool(config.get("TRACING"))
+        if not self.enabled:
+            return
+        self.default_rate = config["TRACE_SAMPLE_RATE"]
+        self.rates = dict(config.get("TRACE_SAMPLE_RATES") or {})
+        self._endpoint_rates = {}
+        exporter_class = import_string(config["TRACE_EXPORTER_CLASS"])
+        self.shutdown()
+        self.exporter = BatchExporter(
+            exporter_class(config), batch_size=config["TRACE_BATCH_SIZE"]
+        )
+
+    def shutdown(self, timeout: float = 5) -> None:
+        """Export queued spans and stop exporting."""
+        if self.exporter is not None:
+            self.exporter.shutdown(timeout)
+
+    def sample_rate(self, endpoint: Optional[str]) -> float:
+        """Get the fraction of requests to an endpoint to trace."""
+        rate = self._endpoint_rates.get(endpoint)
+        if rate is None:
+            rate = self.default_rate
+            for pattern, pattern_rate in self.rates.items():
+                if endpoint and fnmatch.fnmatchcase(endpoint, pattern):
+                    rate = pattern_rate
+                    break
+            self._endpoint_rates[endpoint] = rate
+        return rate
+
+    def start_trace(
+        self, name: str, trace_id: Optional[str] = None, parent_id=None, **attributes
+    ) -> Trace:
+        """Start recording a trace in this thread."""
+        trace = Trace(trace_id)
+        trace.start_span(name, parent_id=parent_id, **attributes)
+        _current.trace = trace
+        return trace
+
+    def end_trace(self) -> None:
+        """Finish the current trace and export it."""
+        trace = _current.trace
+        if trace is None:
+            return
+        _current.trace = None
+        now = time.time()
+        for open_span in trace._open:
+            open_span.end = now
+        if self.enabled and self.exporter:
+            self.exporter.submit(trace.as_dicts())
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Trace a block of code, exported if tracing turns out to be enabled."""
+        previous = _current.trace
+        trace = self.start_trace(name, **attributes)
+        try:
+            yield trace
+        finally:
+            if _current.trace is trace:
+                self.end_trace()
+            _current.trace = previous
+
+
+tracer = Tracer()
+
+
+def trace_engine(engine) -> None:
+    """Record a span for each statement executed in a traced request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        if _current.trace is not None:
+            conn.info.setdefault("trace_start", []).append(time.time())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = _current.trace
+        if trace is not None and conn.info.get("trace_start"):
+            start = conn.info["trace_start"].pop()
+            trace.add_span(
+                "db.query", start, time.time(), statement=statement[:STATEMENT_LENGTH]
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("trace_start"):
+            conn.info["trace_start"].pop()
+
+
+def _sampled_parent():
+    """Get (trace_id, parent span id) from a sampled traceparent header."""
+    header = request.headers.get("traceparent")
+    if not header:
+        return None
+    match = TRACEPARENT.match(header.strip())
+    if match and int(match.group(3), 16) & 1:
+        return match.group(1), match.group(2)
+    return None
+
+
+def init_tracing(app) -> None:
+    """Trace a sample of requests."""
+    tracer.configure(app.config)
+    if not tracer.enabled:
+        return
+
+    @app.before_request
+    def start_request_trace():
+        parent = _sampled_parent()
+        if parent is None and random.random() >= tracer.sample_rate(request.endpoint):
+            return
+        trace_id, parent_id = parent or (None, None)
+        tracer.start_trace(
+            "request",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+        )
+
+    @app.after_request
+    def tag_request_trace(response):
+        trace = _current.trace
+        if trace is not None:
+            trace.spans[0].attributes["status"] = response.status_code
+            response.headers["X-Trace-Id"] = trace.trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_trace(exception=None):
+        trace = _current.trace
+        if trace is not None and exception is not None:
+            trace.spans[0].attributes["error"] = repr(exception)
+        tracer.end_trace()
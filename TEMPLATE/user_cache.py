@@ -0,0 +1,132 @@
+"""Cache of users loaded for JWT-authenticated requests.
+
+Avoids looking up the current user in the database on every request.
+Entries are keyed by user identity and token issue time, expire after `USER_CACHE_TTL` seconds,
+and are dropped whenever a user is updated or deleted in this process.
+
+Cached users are stored as a snapshot of their column values and merged into the current session
+without a query, so they behave like normally loaded instances.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import instance_state, set_committed_value
+from werkzeug.utils import import_string
+
+from TEMPLATE.cache import LRUCache
+from TEMPLATE.db import db
+from TEMPLATE.metrics import register_metrics
+from TEMPLATE.model.user import User
+
+Snapshot = Tuple[type, dict]
+
+
+class UserCache(ABC):
+    """Base class for user caches.
+
+    Subclass and implement `get`, `set`, `invalidate` and `stats` to use a different backend,
+    then set `USER_CACHE_CLASS` to its import path.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    @abstractmethod
+    def get(self, identity: Hashable, token_iat: Any) -> Optional[Snapshot]:
+        """Get a cached user snapshot."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, identity: Hashable, token_iat: Any, snapshot: Snapshot) -> None:
+        """Cache a user snapshot."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def invalidate(self, identity: Hashable) -> None:
+        """Forget all cached snapshots of a user."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Get hit/miss statistics."""
+        raise NotImplementedError()
+
+    def load(
+        self, identity: Hashable, token_iat: Any, loader: Callable[[Hashable], Any]
+    ):
+        """Get a user from the cache, or call loader(identity) and cache the result."""
+        snapshot = self.get(identity, token_iat)
+        if snapshot is not None:
+            return restore_user(snapshot)
+        user = loader(identity)
+        if user is not None:
+            self.set(identity, token_iat, snapshot_user(user))
+        return user
+
+
+class LRUUserCache(UserCache):
+    """In-process user cache."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.cache = LRUCache(
+            maxsize=config["USER_CACHE_SIZE"], ttl=config["USER_CACHE_TTL"]
+        )
+
+    def get(self, identity, token_iat):
+        """Get a cached user snapshot."""
+        return self.cache.get((identity, token_iat))
+
+    def set(self, identity, token_iat, snapshot):
+        """Cache a user snapshot."""
+        self.cache.set((identity, token_iat), snapshot)
+
+    def invalidate(self, identity):
+        """Forget all cached snapshots of a user."""
+        self.cache.delete_where(lambda key: key[0] == identity)
+
+    def stats(self):
+        """Get hit/miss statistics."""
+        return self.cache.stats()
+
+
+def snapshot_user(user) -> Snapshot:
+    """Copy loaded column values of a user."""
+    state = instance_state(user)
+    values = {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+    return type(user), values
+
+
+def restore_user(snapshot: Snapshot):
+    """Create a user from a snapshot and attach it to the current session without querying."""
+    cls, values = snapshot
+    user = cls.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def init_user_cache(app) -> Optional[UserCache]:
+    if not app.config.get("USER_CACHE_ENABLED"):
+        return None
+    cache_class = import_string(app.config["USER_CACHE_CLASS"])
+    user_cache = cache_class(app.config)
+    app.extensions["user_cache"] = user_cache
+    register_metrics(app, "user_cache", user_cache.stats)
+    return user_cache
+
+
+@event.listens_for(User, "after_update", propagate=True)
+@event.listens_for(User, "after_delete", propagate=True)
+def _invalidate_user(mapper, connection, target):
+    user_cache = current_app.extensions.get("user_cache") if current_app else None
+    if user_cache:
+        user_cache.invalidate(target.id)
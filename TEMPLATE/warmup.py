@@ -0,0 +1,78 @@
+"""Warming up Lambda containers.
+
+Scheduled ping events (CloudWatch/EventBridge schedules, serverless-plugin-warmup, or
+`{"warmup": true}`) are answered by `warm_up()` instead of being passed to the WSGI app.
+Besides keeping the container alive, it does the work the first real request would
+otherwise pay for:
+
+- configure SQLAlchemy mappers
+- compile response serializers
+- refresh Secrets Manager values before they expire
+- open a database connection (unless `WARMUP_CONNECT_DB` is off, e.g. to let a dev
+  Aurora cluster pause)
+
+Each step is timed; a step failing is logged and doesn't stop the others.
+"""
+import json
+import logging
+from typing import Any
+
+from sqlalchemy.orm import configure_mappers
+
+from TEMPLATE.api.serialization import compile_serializers
+from TEMPLATE.db import db
+from TEMPLATE.secret import get_secrets
+from TEMPLATE.startup import StartupReport
+
+log = logging.getLogger(__name__)
+
+WARMUP_SOURCES = ("aws.events", "serverless-plugin-warmup")
+
+
+def is_warmup_event(event: Any) -> bool:
+    """Check if a Lambda event is a scheduled ping rather than a request."""
+    if not isinstance(event, dict):
+        return False
+    return event.get("source") in WARMUP_SOURCES or bool(event.get("warmup"))
+
+
+def refresh_secrets(app) -> None:
+    from TEMPLATE.create_app import secret_names
+
+    names = secret_names(app.config)
+    if names:
+        get_secrets(names)
+
+
+def connect_db() -> None:
+    db.session.execute("SELECT 1").scalar()
+
+
+def warm_up(app) -> dict:
+    """Prepare the app to serve requests quickly. Returns timings of each step."""
+    report = StartupReport()
+    errors = {}
+    steps = [
+        ("configure_mappers", configure_mappers),
+        ("compile_serializers", compile_serializers),
+        ("refresh_secrets", lambda: refresh_secrets(app)),
+    ]
+    if app.config.get("WARMUP_CONNECT_DB"):
+        steps.append(("connect_db", connect_db))
+
+    with app.app_context():
+        for name, step in steps:
+            try:
+                with report.phase(name):
+                    step()
+            except Exception as ex:
+                log.exception(f"Warm-up step {name} failed")
+                errors[name] = str(ex)
+        db.session.remove()
+    report.finish()
+
+    result = dict(warmup=report.as_dict())
+    if errors:
+        result["errors"] = errors
+    log.info(json.dumps(result))
+    return result
@@ -3,6 +3,7 @@ from __future__ import with_statement
 import logging
 from logging.config import fileConfig
 
+import sqlalchemy as sa
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
@@ -81,11 +82,21 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        lock_timeout = current_app.config.get("MIGRATION_LOCK_TIMEOUT")
+        if lock_timeout and connection.dialect.name == "postgresql":
+            # give up instead of queueing requests behind a migration waiting for a lock
+            connection.execute(
+                sa.text("SELECT set_config('lock_timeout', :value, false)"),
+                value=str(lock_timeout),
+            )
+
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
-            **current_app.extensions["migrate"].configure_args
+            # commit each migration, so locks are held briefly and progress is kept
+            transaction_per_migration=True,
+            **current_app.extensions["migrate"].configure_args,
         )
 
         with context.begin_transaction():
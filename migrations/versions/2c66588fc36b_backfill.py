@@ -0,0 +1,42 @@
+"""Backfill progress table for online data migrations
+
+Revision ID: 2c66588fc36b
+Revises: 5b2f0c9d7a41
+Create Date: 2020-06-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "2c66588fc36b"
+down_revision = "5b2f0c9d7a41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "backfill",
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("table_name", sa.Text(), nullable=False),
+        sa.Column("key_column", sa.Text(), server_default="id", nullable=False),
+        sa.Column("statement", sa.Text(), nullable=False),
+        sa.Column("batch_size", sa.Integer(), server_default="1000", nullable=False),
+        sa.Column("first_key", sa.BigInteger(), nullable=True),
+        sa.Column("last_key", sa.BigInteger(), nullable=True),
+        sa.Column("max_key", sa.BigInteger(), nullable=True),
+        sa.Column("rows", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("seconds", sa.Float(), server_default="0", nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade():
+    op.drop_table("backfill")
@@ -0,0 +1,22 @@
+"""Index user by creation date for keyset pagination
+
+Revision ID: 5b2f0c9d7a41
+Revises: e1e763cb595b
+Create Date: 2020-06-01 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b2f0c9d7a41"
+down_revision = "e1e763cb595b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_user_created_at_id", "user", ["created_at", "id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_user_created_at_id", table_name="user")